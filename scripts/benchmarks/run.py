@@ -0,0 +1,253 @@
+"""
+Benchmarks of the pipeline stages on synthetic data, stored per commit.
+
+Each benchmark is a stage of pipeline.py, run as the pipeline runs it (its
+script in a fresh interpreter, with --no-db where the stage supports it),
+against the data that synthetic.py generates at a given multiple of the
+national size. The data is written once per scale and seed to a workspace
+laid out like the repository (<workspace>/data, with <workspace>/scripts as
+the working directory), so the scripts' ../data paths point at it.
+
+Every stage is run once to warm up (that run also writes the outputs the
+later stages read, and builds the place index cache), then --repeat times.
+Each run records its wall time, its CPU time (user + system) and the peak
+resident memory of the interpreter. The results go to
+scripts/benchmarks/results/<commit>.json, one file per commit (with a -dirty
+suffix for uncommitted changes), merged across scales; --compare checks the
+medians against another commit's file and fails on a regression.
+
+Usage (from anywhere):
+    python scripts/benchmarks/run.py                       # every stage, 1x
+    python scripts/benchmarks/run.py --scale 1 10 100 --repeat 3
+    python scripts/benchmarks/run.py bac en --compare 97f883c
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+WORK_DIR = os.path.join(tempfile.gettempdir(), "romania-educata-benchmarks")
+
+sys.path.insert(0, SCRIPTS_DIR)
+
+from pipeline import STAGES, with_dependencies  # noqa: E402
+
+# In dependency order; school_info writes the tables the others check against
+BENCHMARKS = [
+    "school_info",
+    "bac_json",
+    "bac",
+    "en",
+    "schools_by_county",
+    "demographics",
+]
+
+
+def git(*args):
+    return subprocess.run(
+        ["git", *args], cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def commit_id():
+    """The short hash of HEAD, suffixed -dirty when tracked files changed."""
+    commit = git("rev-parse", "--short", "HEAD")
+    if git("status", "--porcelain", "--untracked-files=no"):
+        commit += "-dirty"
+    return commit
+
+
+def generator_digest():
+    digest = hashlib.sha256()
+    for name in ["synthetic.py", os.path.join("..", "excel_cache.py")]:
+        with open(os.path.join(BENCHMARKS_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def prepare_workspace(scale, seed, root=WORK_DIR):
+    """The workspace for scale and seed, generating its data if out of date."""
+    workspace = os.path.join(root, f"x{scale:g}-seed{seed}")
+    data_dir = os.path.join(workspace, "data")
+    stamp_path = os.path.join(data_dir, "synthetic.json")
+    stamp = {"scale": scale, "seed": seed, "generator": generator_digest()}
+    try:
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            if json.load(f)["generator"] == stamp["generator"]:
+                return workspace
+    except FileNotFoundError:
+        pass
+
+    shutil.rmtree(workspace, ignore_errors=True)
+    os.makedirs(os.path.join(workspace, "scripts"))
+    print(f"Generating the x{scale:g} data in {data_dir}...")
+    # In a child process, so the runner stays small: a child's ru_maxrss
+    # starts from the memory of the process that started it
+    command = [sys.executable, os.path.join(BENCHMARKS_DIR, "synthetic.py")]
+    command += [data_dir, "--scale", f"{scale:g}", "--seed", str(seed)]
+    subprocess.run(command, check=True)
+    with open(stamp_path, "w", encoding="utf-8") as f:
+        json.dump(stamp, f, indent=2)
+    return workspace
+
+
+def run_once(name, workspace):
+    """Run a stage script in the workspace; returns its wall, CPU and memory use."""
+    stage = STAGES[name]
+    command = [sys.executable, os.path.join(SCRIPTS_DIR, stage["script"])]
+    if stage.get("no_db"):
+        command.append("--no-db")
+
+    log_path = os.path.join(workspace, f"{name}.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            command,
+            cwd=os.path.join(workspace, "scripts"),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        # wait4 gives the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"[{name}] exited with {process.returncode}, see {log_path}")
+
+    # ru_maxrss is in KB on Linux, in bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "wall": round(wall, 3),
+        "cpu": round(usage.ru_utime + usage.ru_stime, 3),
+        "max_rss_mb": round(usage.ru_maxrss * rss_unit / 2**20, 1),
+    }
+
+
+def run_benchmarks(names, scale, seed=0, repeat=3):
+    """Time each named stage at scale; returns {stage: {measure: [runs]}}."""
+    workspace = prepare_workspace(scale, seed)
+    needed = with_dependencies(STAGES, names)
+    results = {}
+    for name in [n for n in BENCHMARKS if n in needed]:
+        run_once(name, workspace)
+        if name not in names:
+            continue
+        runs = [run_once(name, workspace) for _ in range(repeat)]
+        results[name] = {key: [run[key] for run in runs] for key in runs[0]}
+        print(
+            f"[x{scale:g}] {name}: {statistics.median(results[name]['wall']):.2f} s"
+            f" (min {min(results[name]['wall']):.2f} s),"
+            f" cpu {statistics.median(results[name]['cpu']):.2f} s,"
+            f" {max(results[name]['max_rss_mb']):.0f} MB"
+        )
+    return results
+
+
+def results_path(commit):
+    return os.path.join(RESULTS_DIR, f"{commit}.json")
+
+
+def load_results(commit):
+    """The results file of a commit, given its full name or a hash prefix."""
+    matches = sorted(glob.glob(results_path(commit + "*")))
+    if not matches:
+        raise FileNotFoundError(f"No results for {commit} in {RESULTS_DIR}")
+    with open(matches[0], "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(commit, scale, seed, repeat, results):
+    """Merge this scale's results into the commit's results file."""
+    path = results_path(commit)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        report = {"commit": commit, "scales": {}}
+    report["date"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    report["machine"] = {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+    entry = report["scales"].setdefault(f"{scale:g}", {})
+    entry.update({"seed": seed, "repeat": repeat})
+    entry.setdefault("benchmarks", {}).update(results)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def compare(report, baseline, threshold):
+    """
+    Print the median wall time ratio of every stage and scale both reports
+    have; returns the (scale, stage, ratio) rows above threshold.
+    """
+    regressions = []
+    for scale, entry in sorted(report["scales"].items(), key=lambda s: float(s[0])):
+        base_entry = baseline["scales"].get(scale, {}).get("benchmarks", {})
+        for name, runs in entry["benchmarks"].items():
+            if name not in base_entry:
+                continue
+            new = statistics.median(runs["wall"])
+            old = statistics.median(base_entry[name]["wall"])
+            ratio = new / old if old else float("inf")
+            flag = ""
+            if ratio > threshold:
+                regressions.append((scale, name, ratio))
+                flag = "  << regression"
+            print(f"x{scale} {name}: {old:.2f} s → {new:.2f} s ({ratio:.2f}x){flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "benchmarks", nargs="*", help=f"any of: {', '.join(BENCHMARKS)}"
+    )
+    parser.add_argument(
+        "--scale", type=float, nargs="+", default=[1.0], help="× the national size"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--compare", help="commit whose results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="median wall time ratio above which --compare fails",
+    )
+    args = parser.parse_args()
+
+    names = args.benchmarks or BENCHMARKS
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    commit = commit_id()
+    for scale in args.scale:
+        results = run_benchmarks(names, scale, args.seed, args.repeat)
+        path = save_results(commit, scale, args.seed, args.repeat, results)
+    print(f"Results written to {path}")
+
+    if args.compare:
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        regressions = compare(report, load_results(args.compare), args.threshold)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,735 @@
+"""
+Seeded synthetic versions of the raw sources, for the benchmarks.
+
+generate() writes, under a data directory, everything the benchmarked
+stages read from ../data, with the sheet layouts and column types of the
+real files:
+
+- a UAT geography: adm2/<CC>.geojson (square UAT polygons) and
+  ro_localitati_punct.geojson (a point per locality, seat and villages)
+- the SIIIR school network, retea-scolara-2024-2025.xlsx, whose towns are
+  mostly UAT names, some villages, misspellings and unknown names
+- the BAC and EN candidate workbooks and the enrollment workbook, over the
+  synthetic schools
+- the three census tables (ethnicity, age, education) over the same UATs
+
+At scale 1 the row counts are those of the 2024 national files; scale 10
+or 100 multiplies every count, geography included. An .xlsx sheet holds at
+most 1,048,576 rows, so the sheets are not written as workbooks: each
+workbook path gets a small placeholder file and the sheet is stored in the
+excel_cache entry the script's read_excel / iter_excel call looks up (see
+excel_cache.prime_cache). The stages then run unchanged, minus the parse.
+
+Usage (from anywhere):
+    python scripts/benchmarks/synthetic.py /tmp/bench/data --scale 10 --seed 0
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_cache import prime_cache  # noqa: E402
+from normalize import normalize_names, normalize_place_names  # noqa: E402
+from school_codes import load_lineage  # noqa: E402
+
+# Row counts of the national files (2024), multiplied by the scale
+NATIONAL = {
+    "uats": 3180,
+    "schools": 18_200,
+    "bac": 150_000,
+    "en": 160_450,
+    "students": 133_838,
+}
+
+# (mnemonic, SIIIR county id, census name), in the order of the census sheets
+COUNTIES = [
+    ("AB", "01", "ALBA"),
+    ("AR", "02", "ARAD"),
+    ("AG", "03", "ARGEȘ"),
+    ("BC", "04", "BACĂU"),
+    ("BH", "05", "BIHOR"),
+    ("BN", "06", "BISTRIȚA-NĂSĂUD"),
+    ("BT", "07", "BOTOȘANI"),
+    ("BR", "09", "BRĂILA"),
+    ("BV", "08", "BRAȘOV"),
+    ("BZ", "10", "BUZĂU"),
+    ("CL", "51", "CĂLĂRAȘI"),
+    ("CS", "11", "CARAȘ-SEVERIN"),
+    ("CJ", "12", "CLUJ"),
+    ("CT", "13", "CONSTANȚA"),
+    ("CV", "14", "COVASNA"),
+    ("DB", "15", "DÂMBOVIȚA"),
+    ("DJ", "16", "DOLJ"),
+    ("GL", "17", "GALAȚI"),
+    ("GR", "52", "GIURGIU"),
+    ("GJ", "18", "GORJ"),
+    ("HR", "19", "HARGHITA"),
+    ("HD", "20", "HUNEDOARA"),
+    ("IL", "21", "IALOMIȚA"),
+    ("IS", "22", "IAȘI"),
+    ("IF", "23", "ILFOV"),
+    ("MM", "24", "MARAMUREȘ"),
+    ("MH", "25", "MEHEDINȚI"),
+    ("MS", "26", "MUREȘ"),
+    ("NT", "27", "NEAMȚ"),
+    ("OT", "28", "OLT"),
+    ("PH", "29", "PRAHOVA"),
+    ("SJ", "31", "SĂLAJ"),
+    ("SM", "30", "SATU MARE"),
+    ("SB", "32", "SIBIU"),
+    ("SV", "33", "SUCEAVA"),
+    ("TR", "34", "TELEORMAN"),
+    ("TM", "35", "TIMIȘ"),
+    ("TL", "36", "TULCEA"),
+    ("VL", "38", "VÂLCEA"),
+    ("VS", "37", "VASLUI"),
+    ("VN", "39", "VRANCEA"),
+    ("B", "40", "MUNICIPIUL BUCUREȘTI"),
+]
+HUNGARIAN_COUNTIES = {"HR", "CV", "MS", "BH", "SM", "SJ", "CJ"}
+
+SYLLABLES = (
+    "ba bu ce cio da dra fă ga gu la li lu ma mi na ne po ra ro ră sa su "
+    "șa ște ta ti ți va vi za zi cu ge ho ar"
+).split()
+NAME_SUFFIXES = ["", "", "", "", " de Sus", " de Jos", " Mare", " Nouă", "-Vale"]
+
+ETHNICITIES = [
+    "Români",
+    "Maghiari",
+    "Romi",
+    "Ucraineni",
+    "Germani",
+    "Turci",
+    "Rusi-Lipoveni",
+    "Tatari",
+    "Sarbi",
+    "Slovaci",
+    "Bulgari",
+    "Croati",
+    "Greci",
+    "Italieni",
+    "Evrei",
+    "Cehi",
+    "Polonezi",
+    "Ruteni",
+    "Armeni",
+    "Albanezi",
+    "Macedoneni",
+    "Alta etnie",
+    "Informatie nedisponibila",
+]
+ETHNICITY_SHARES = np.array(
+    [0.845, 0.02, 0.03, 0.002, 0.001, 0.001, 0.001, 0.001, 0.001, 0.001]
+    + [0.0005] * 11
+    + [0.002, 0.09]
+)
+AGE_SHARES = np.array(
+    [5, 5.3, 5.5, 5.4, 5, 5.8, 6.5, 7.2, 8.3, 8.1, 6.5, 6.9, 6.6, 6, 4.8, 3.1, 2.4, 1.3]
+)
+EDUCATION_COLUMNS = 13
+
+# Value distributions of the real sheets
+BAC_STATUS = {"Promovat": 0.81, "Nepromovat": 0.165, "Absent": 0.02, "Eliminat": 5e-3}
+BAC_PROFILES = {
+    ("Teoretică", "Real"): 0.34,
+    ("Teoretică", "Uman"): 0.26,
+    ("Tehnologică", "Servicii"): 0.16,
+    ("Tehnologică", "Tehnic"): 0.09,
+    ("Tehnologică", "Resurse naturale și protecția mediului"): 0.04,
+    ("Vocațională", "Educație fizică și sport"): 0.033,
+    ("Vocațională", "Artistic"): 0.032,
+    ("Vocațională", "Pedagogic"): 0.023,
+    ("Vocațională", "Teologic"): 0.017,
+    ("Vocațională", "Militar"): 0.005,
+}
+BAC_MINORITY_LANGS = {
+    "maghiară": 0.85,
+    "germană": 0.12,
+    "ucraineană": 0.014,
+    "slovacă": 0.004,
+    "italiană": 0.004,
+    "sârbă": 0.002,
+    "croată": 0.001,
+    "turcă": 0.001,
+}
+FOREIGN_LANGS = {
+    "engleză": 0.963,
+    "franceză": 0.026,
+    "germană modernă": 0.007,
+    "spaniolă": 0.002,
+    "italiană": 0.0015,
+    "rusă": 0.0005,
+}
+FOREIGN_LANG_EXAM = {"Calificativ": 0.8, "Certificat": 0.19, "Absent": 0.01}
+LEVELS = {
+    "Primar": 0.30,
+    "Preșcolar": 0.26,
+    "Gimnazial": 0.21,
+    "Liceal": 0.16,
+    "Profesional": 0.045,
+    "Postliceal": 0.018,
+    "Antepreșcolar": 0.007,
+}
+TEACHING_LANGS = {
+    "română": 0.905,
+    "maghiară": 0.084,
+    "germană": 0.0075,
+    "ucraineană": 0.001,
+    "slovacă": 0.0007,
+    "sârbă": 0.0005,
+    "romani (rromani)": 0.0004,
+    "engleză": 0.0004,
+}
+FINANTARE = {
+    "Buget": 0.937,
+    "Taxă": 0.058,
+    "Sponsorizare": 0.0015,
+    "Contract instituțional": 0.001,
+    "Contract": 0.0007,
+    "Ministerul Apărării Naționale": 0.0006,
+    "Ministerul Afacerilor Interne": 0.0001,
+    "Ministerul Justiției": 0.0001,
+}
+PROPRIETATE = {"Publică de interes naţional şi local": 0.94, "Privată": 0.06}
+SCHOOL_KINDS = {
+    "ȘCOALA GIMNAZIALĂ": 0.45,
+    "GRĂDINIȚA CU PROGRAM PRELUNGIT": 0.25,
+    "GRĂDINIȚA CU PROGRAM NORMAL": 0.15,
+    "LICEUL TEORETIC": 0.06,
+    "LICEUL TEHNOLOGIC": 0.05,
+    "COLEGIUL NAȚIONAL": 0.02,
+    "CLUBUL COPIILOR": 0.02,
+}
+
+
+def choice(rng, weights, size):
+    """Draw size keys of a {value: weight} dict, as an object array."""
+    values = np.empty(len(weights), dtype=object)
+    values[:] = list(weights)
+    p = np.array(list(weights.values()), dtype=float)
+    return values[rng.choice(len(values), size=size, p=p / p.sum())]
+
+
+def grades(rng, size, low=1.0, high=10.0, mean=7.5, sd=1.4):
+    """Exam grades rounded to 2 decimals, clipped to [low, high]."""
+    return np.round(np.clip(rng.normal(mean, sd, size), low, high), 2)
+
+
+def _is_stable(name):
+    # The upper-case census / SIIIR spelling must normalize back to the name
+    upper = name.upper()
+    return normalize_place_names(upper) == name and normalize_names(upper) == name
+
+
+def place_names(rng, size, unique=True):
+    """size Romanian-looking place names, distinct when unique is set."""
+    names = []
+    seen = set()
+    while len(names) < size:
+        word = "".join(rng.choice(SYLLABLES, size=rng.integers(2, 4)))
+        name = word.capitalize() + NAME_SUFFIXES[rng.integers(len(NAME_SUFFIXES))]
+        if (unique and name in seen) or not _is_stable(name):
+            continue
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def misspell(rng, name):
+    """A SIIIR-style variant of name: a dropped diacritic or a doubled letter."""
+    plain = name.translate(str.maketrans("ăâîșțĂÂÎȘȚ", "aaistAAIST"))
+    if plain != name:
+        return plain
+    i = int(rng.integers(1, len(name)))
+    return name[:i] + name[i - 1] + name[i:]
+
+
+def make_geography(rng, scale):
+    """
+    The UATs (one row per UAT) and localities (one row per locality, the
+    UAT's seat first) of every county, with SIRUTA-like codes and points. As
+    in SIRUTA, a UAT and its seat have different codes: the UAT's, then its
+    localities' right after it.
+    """
+    n_uats = max(round(NATIONAL["uats"] * scale), len(COUNTIES))
+    weights = rng.uniform(0.6, 1.4, len(COUNTIES))
+    weights[-1] = 0.1  # Bucharest only has its sectors
+    per_county = np.maximum(rng.multinomial(n_uats, weights / weights.sum()), 1)
+
+    uats, localities = [], []
+    natcode = 1000
+    for k, ((county, county_id, _), n) in enumerate(zip(COUNTIES, per_county)):
+        if county == "B":
+            names = [f"Sector {i + 1}" for i in range(n)]
+        else:
+            names = place_names(rng, n)
+        side = int(np.ceil(np.sqrt(n)))
+        cell = 1.0 / side
+        x0, y0 = 20.0 + (k % 7), 43.0 + (k // 7)
+        urban = rng.random(n) < 0.1
+        urban[0] = True  # the county seat
+        for j, name in enumerate(names):
+            x, y = x0 + (j % side) * cell, y0 + (j // side) * cell
+            uats.append(
+                {
+                    "county": county,
+                    "county_id": county_id,
+                    "name": name,
+                    "natcode": natcode,
+                    "urban": bool(urban[j]),
+                    "bbox": (x, y, x + cell, y + cell),
+                }
+            )
+            n_villages = 0 if county == "B" else rng.poisson(1 if urban[j] else 4)
+            villages = [name] + place_names(rng, n_villages, unique=False)
+            for v, village in enumerate(villages):
+                # the seat at the center, the villages anywhere inside
+                px, py = (0.5, 0.5) if v == 0 else rng.uniform(0.1, 0.9, 2)
+                localities.append(
+                    {
+                        "county": county,
+                        "name": village,
+                        "uat": name,
+                        "natcode": natcode + 1 + v,
+                        "seat": v == 0,
+                        "point": (x + px * cell, y + py * cell),
+                    }
+                )
+            natcode += 1 + len(villages)
+    return pd.DataFrame(uats), pd.DataFrame(localities)
+
+
+def write_geojson(path, features):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"type": "FeatureCollection", "features": features}, f, ensure_ascii=False
+        )
+
+
+def write_geography(data_dir, uats, localities):
+    adm2_dir = os.path.join(data_dir, "adm2")
+    os.makedirs(adm2_dir, exist_ok=True)
+    for county, group in uats.groupby("county", sort=False):
+        features = []
+        for uat in group.itertuples():
+            x0, y0, x1, y1 = uat.bbox
+            ring = [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+            features.append(
+                {
+                    "type": "Feature",
+                    "properties": {
+                        "natcode": str(uat.natcode),
+                        "name": uat.name,
+                        "natLevName": "Municipiu" if uat.urban else "Comuna",
+                        "countyMn": county,
+                    },
+                    "geometry": {"type": "Polygon", "coordinates": [ring]},
+                }
+            )
+        write_geojson(os.path.join(adm2_dir, f"{county}.geojson"), features)
+
+    write_geojson(
+        os.path.join(data_dir, "ro_localitati_punct.geojson"),
+        [
+            {
+                "type": "Feature",
+                "properties": {
+                    "natcode": str(loc.natcode),
+                    "name": loc.name,
+                    "nameSup": loc.uat,
+                    "countyMn": loc.county,
+                },
+                "geometry": {"type": "Point", "coordinates": list(loc.point)},
+            }
+            for loc in localities.itertuples()
+        ],
+    )
+
+
+def make_schools(rng, scale, uats, localities):
+    """The SIIIR network sheet, as read_excel returns it (codes as text)."""
+    n = round(NATIONAL["schools"] * scale)
+    # Schools concentrate in the towns
+    weights = np.where(uats["urban"], 8.0, 1.0)
+    uat = uats.iloc[rng.choice(len(uats), size=n, p=weights / weights.sum())]
+    uat = uat.reset_index(drop=True)
+
+    # The town is the UAT itself, one of its villages, a misspelling of it
+    # or a name that is nowhere in the geography. Its SIRUTA code is the
+    # locality's, except for a few codes that are not in ro_localitati_punct
+    # (localities split or renumbered since), which only the name can place.
+    kind = rng.choice(4, size=n, p=[0.65, 0.30, 0.03, 0.02])
+    n_villages = (
+        localities[~localities["seat"]]
+        .groupby(["county", "uat"])
+        .size()
+        .reindex(pd.MultiIndex.from_frame(uat[["county", "name"]]), fill_value=0)
+        .to_numpy()
+    )
+    village = np.where(
+        (kind == 1) & (n_villages > 0),
+        1 + np.floor(rng.random(n) * n_villages).astype(int),
+        0,
+    )
+    sirutas = uat["natcode"].to_numpy() + 1 + village
+    towns = localities.set_index("natcode")["name"].reindex(sirutas).to_numpy()
+    stale = rng.random(n) < 0.01
+    sirutas[stale] = 900_000 + np.arange(stale.sum())
+    for i in np.flatnonzero(kind == 2):
+        towns[i] = misspell(rng, towns[i])
+    unknown = np.flatnonzero(kind == 3)
+    towns[unknown] = place_names(rng, len(unknown), unique=False)
+    towns = pd.Series(towns).str.upper().to_numpy()
+
+    # county id + 8 digits, avoiding the codes of the lineage table so that
+    # no synthetic code gets resolved to a real school
+    number = 61_000_000 + uat.groupby("county").cumcount().to_numpy() * 13
+    codes = uat["county_id"].to_numpy() + pd.Series(number).map("{:08d}".format)
+    retired = set(load_lineage()["old_code"])
+    while codes.isin(retired).any():
+        number = np.where(codes.isin(retired), number + 1, number)
+        codes = uat["county_id"].to_numpy() + pd.Series(number).map("{:08d}".format)
+
+    school_kind = choice(rng, SCHOOL_KINDS, n)
+    nr = rng.integers(1, 40, size=n)
+    long_names = [f"{s} NR. {i} {t}" for s, i, t in zip(school_kind, nr, towns)]
+    urban = uat["urban"].to_numpy() & (village == 0)
+    mediu = np.where(urban, "URBAN", "RURAL")
+    # Most units are their own PJ; the others are attached to the previous one
+    is_pj = rng.random(n) < 0.6
+    pj_codes = codes.where(is_pj, codes.groupby(uat["county"]).shift(1)).fillna(codes)
+    phone = rng.integers(200_000_000, 400_000_000, size=n).astype(float)
+
+    return pd.DataFrame(
+        {
+            "An": "2024-2025",
+            "Judet PJ": uat["county"],
+            "Localitate PJ": towns,
+            "Cod SIRUTA PJ": sirutas,
+            "Mediu loc. PJ": mediu,
+            "Cod SIIIR PJ": pj_codes.astype("int64"),
+            "Denumire PJ": long_names,
+            "Localitate unitate": towns,
+            "Cod SIRUTA unitate": sirutas,
+            "Mediu loc. unitate": mediu,
+            "Cod SIRUES": pd.Series(rng.integers(1_000_000, 9_999_999, size=n))
+            .astype(str)
+            .where(rng.random(n) < 0.6),
+            "Cod SIIIR unitate": codes,
+            "Denumire scurta unitate": [f"SC {i} {t}" for i, t in zip(nr, towns)],
+            "Denumire lunga unitate": long_names,
+            "Tip unitate": "Unitate de învățământ",
+            "Statut unitate": np.where(is_pj, "PJ", "AR"),
+            "Cod fiscal": pd.Series(rng.integers(1_000_000, 50_000_000, size=n))
+            .astype(str)
+            .where(is_pj),
+            "Mod functionare": choice(
+                rng,
+                {
+                    "Un schimb/zi": 0.6,
+                    "Program prelungit": 0.25,
+                    "Două schimburi/zi": 0.15,
+                },
+                n,
+            ),
+            "Forma finantare": choice(rng, FINANTARE, n),
+            "Forma proprietate": choice(rng, PROPRIETATE, n),
+            "Strada": np.array(place_names(rng, 50))[rng.integers(50, size=n)],
+            "Numar": rng.integers(1, 200, size=n).astype(str),
+            "Cod postal": rng.integers(100_000, 999_999, size=n).astype(float),
+            "Telefon": phone,
+            "Fax": np.where(rng.random(n) < 0.5, phone + 1, np.nan),
+            "Email": [f"scoala{i}@isj.ro" for i in range(n)],
+        }
+    )
+
+
+def candidate_schools(rng, codes, share, size):
+    """Draw size school codes from a share of codes, with uneven school sizes."""
+    schools = codes[rng.random(len(codes)) < share]
+    weights = rng.lognormal(0, 0.8, len(schools))
+    return schools[rng.choice(len(schools), size=size, p=weights / weights.sum())]
+
+
+def make_bac(rng, scale, codes):
+    """The BAC workbook sheet (codes as text, as iter_excel reads them)."""
+    n = round(NATIONAL["bac"] * scale)
+    status = choice(rng, BAC_STATUS, n)
+    passed = status == "Promovat"
+    present = (status == "Promovat") | (status == "Nepromovat")
+    profile = choice(rng, BAC_PROFILES, n)
+    minority = rng.random(n) < 0.05
+    subiect_eb = np.where(
+        minority,
+        "Limba " + choice(rng, BAC_MINORITY_LANGS, n) + " (Limba maternă)",
+        None,
+    )
+
+    def exam_grade(mean, taken=present):
+        g = grades(rng, n, mean=mean)
+        return np.where(taken, g, np.nan)
+
+    def contest(grade, share):
+        bumped = np.minimum(grade + np.round(rng.uniform(-0.5, 1.0, n), 2), 10)
+        return np.where(rng.random(n) < share, bumped, np.nan)
+
+    ea, eb = exam_grade(7.2), exam_grade(8.0, present & minority)
+    ec, ed = exam_grade(6.9), exam_grade(7.6)
+    medie = np.where(passed, grades(rng, n, low=6.0, mean=7.9, sd=1.0), np.nan)
+    medie = np.where((status == "Nepromovat") & (rng.random(n) < 0.12), 5.5, medie)
+
+    return pd.DataFrame(
+        {
+            "Promoție": np.where(rng.random(n) < 0.8, "2023-2024", "2022-2023"),
+            "Unitate (SIIIR)": candidate_schools(rng, codes, 0.08, n),
+            "Sex": np.where(rng.random(n) < 0.55, "F", "M"),
+            "Subiect eb": subiect_eb,
+            "Profil": [p for _, p in profile],
+            "Fileira": [f for f, _ in profile],
+            "Limba modernă": "Limba " + choice(rng, FOREIGN_LANGS, n),
+            "STATUS_C": choice(rng, FOREIGN_LANG_EXAM, n),
+            "NOTA_EA": ea,
+            "NOTA_CONTESTATIE_EA": contest(ea, 0.1),
+            "NOTA_EB": eb,
+            "NOTA_CONTESTATIE_EB": contest(eb, 0.05),
+            "NOTA_EC": ec,
+            "NOTA_CONTESTATIE_EC": contest(ec, 0.1),
+            "NOTA_ED": ed,
+            "NOTA_CONTESTATIE_ED": contest(ed, 0.05),
+            "Medie": medie,
+            "STATUS": status,
+        }
+    )
+
+
+def make_en(rng, scale, codes):
+    """The EN workbook sheet (codes as text, as iter_excel reads them)."""
+    n = round(NATIONAL["en"] * scale)
+    present = rng.random(n) < 0.95
+    minority = rng.random(n) < 0.06
+
+    def exam_grade(mean, taken=present):
+        return np.where(taken, grades(rng, n, mean=mean, sd=1.8), np.nan)
+
+    ro, math = exam_grade(6.8), exam_grade(6.0)
+    mat = exam_grade(7.5, present & minority)
+    contested = rng.random(n) < 0.09
+    mean = np.where(minority, (ro + math + mat) / 3, (ro + math) / 2)
+    return pd.DataFrame(
+        {
+            " COD SIIIR": candidate_schools(rng, codes, 0.33, n),
+            "SEX": np.where(rng.random(n) < 0.5, "F", "M"),
+            "MEDIA V-VIII": grades(rng, n, low=5.0, mean=8.8, sd=0.8),
+            "NOTA ROMANA": ro,
+            "NOTA CONTESTATIE ROMANA": np.where(
+                contested, np.minimum(ro + 0.25, 10), np.nan
+            ),
+            "NOTA LIMBA MATERNA": mat,
+            "NOTA CONTESTATIE LB MATERNA": np.where(contested & minority, mat, np.nan),
+            "NOTA MATEMATICA": math,
+            "NOTA CONTESTATIE MATEMATICA": np.where(
+                contested, np.minimum(math + 0.25, 10), np.nan
+            ),
+            "MEDIA": np.round(mean, 2),
+        }
+    )
+
+
+def make_students(rng, scale, schools):
+    """The enrollment sheet, one row per unit × level × teaching language."""
+    n = round(NATIONAL["students"] * scale)
+    rows = rng.choice(len(schools), size=n)
+    return pd.DataFrame(
+        {
+            "Judet": schools["Judet PJ"].to_numpy()[rows],
+            "Cod unitate PJ": schools["Cod SIIIR PJ"].to_numpy()[rows],
+            "Cod Unitate Plan": schools["Cod SIIIR unitate"].to_numpy()[rows],
+            "Nivel": choice(rng, LEVELS, n),
+            "Forma de invatamant": "Zi",
+            "Limba predare": "Limba " + choice(rng, TEACHING_LANGS, n),
+            "Elevi exist anterior-asoc": rng.negative_binomial(2, 0.12, size=n),
+        }
+    )
+
+
+def _census_frame(rows, width):
+    return pd.DataFrame(rows, columns=[f"Unnamed: {i}" for i in range(width)])
+
+
+def _masked(values, rng):
+    """Census cells: "-" for none and "*" for a few confidential small counts."""
+    cells = values.astype(object)
+    cells[values == 0] = "-"
+    cells[(values > 0) & (values < 3) & (rng.random(values.shape) < 0.3)] = "*"
+    return cells
+
+
+def census_places(uats, rng):
+    """The census spelling of every UAT, with the municipality/town prefixes."""
+    prefix = np.where(
+        uats["urban"], np.where(rng.random(len(uats)) < 0.4, "MUNICIPIUL ", "ORAȘ "), ""
+    )
+    return prefix + uats["name"].str.upper()
+
+
+def make_census(rng, uats):
+    """The ethnicity, age and education sheets, as read_excel returns them."""
+    uats = uats[uats["county"] != "B"].reset_index(drop=True)
+    population = np.round(rng.lognormal(8.3, 0.9, len(uats))).astype(int) + 50
+    shares = np.tile(ETHNICITY_SHARES / ETHNICITY_SHARES.sum(), (len(uats), 1))
+    hungarian = uats["county"].isin(HUNGARIAN_COUNTIES).to_numpy()
+    shares[hungarian, 0], shares[hungarian, 1] = 0.4, 0.465
+    ethnicity = rng.multinomial(population, shares)
+    age = rng.multinomial(population, AGE_SHARES / AGE_SHARES.sum())
+    names = census_places(uats, rng)
+    bucharest = np.round(ETHNICITY_SHARES * 1_716_961).astype(int)
+
+    eth_rows = [
+        ["ROMÂNIA", float(ethnicity.sum() + bucharest.sum())]
+        + list(ethnicity.sum(axis=0) + bucharest)
+        + ["ROMÂNIA"],
+        [None] * 26,
+    ]
+    age_rows = []
+    for county, _, census_name in COUNTIES[:-1]:
+        block = (uats["county"] == county).to_numpy()
+        eth, ages = ethnicity[block], age[block]
+        eth_rows.append(
+            [census_name, float(eth.sum())] + list(eth.sum(axis=0)) + [census_name]
+        )
+        age_name = census_name.translate(str.maketrans("ĂÂÎȘȚ", "AAIST"))
+        age_rows.append(
+            [age_name, int(ages.sum())] + list(ages.sum(axis=0)) + [age_name]
+        )
+        for name, e, a in zip(names[block], eth, ages):
+            eth_rows.append([name, float(e.sum())] + list(_masked(e, rng)) + [name])
+            age_rows.append([name, int(a.sum())] + list(_masked(a, rng)) + [name])
+        eth_rows.append([None] * 26)
+        age_rows.append([None] * 21)
+    eth_rows = eth_rows[:-1]
+    eth_rows += [[None] * 26] + [
+        ["MUNICIPIUL BUCUREȘTI", float(bucharest.sum())]
+        + list(bucharest)
+        + ["MUNICIPIUL BUCUREȘTI"]
+    ] * 2
+    bucharest_age = np.round(AGE_SHARES / AGE_SHARES.sum() * 1_716_961).astype(int)
+    age_rows = age_rows[:-1] + [
+        [None] * 21,
+        ["MUNICIPIUL BUCURESTI", int(bucharest_age.sum())]
+        + list(bucharest_age)
+        + ["MUNICIPIUL BUCURESTI"],
+        [None] * 21,
+        [None] * 21,
+        ["Sursa: INS, Recensământul Populației și Locuințelor 2021"] + [None] * 20,
+        ["* - valoare confidentiala"] + [None] * 20,
+    ]
+
+    edu_rows = []
+    for census_name in ["ROMÂNIA"] + [c for _, _, c in COUNTIES]:
+        counts = rng.integers(100, 100_000, size=(len(ETHNICITIES) + 1, 13))
+        counts[:, 1] += counts[:, 2]  # graduates include the undergraduates
+        edu_rows.append([census_name] + list(counts[0]) + [census_name])
+        edu_rows.append(["ETNIA"] + [None] * 14)
+        for ethnicity_name, row in zip(ETHNICITIES, counts[1:]):
+            edu_rows.append([ethnicity_name] + list(row) + [ethnicity_name])
+        edu_rows.append([None] * 15)
+    edu_rows += [
+        [None] * 15,
+        ["Sursa: INS, Recensământul Populației și Locuințelor 2021"] + [None] * 14,
+        ["* - valoare confidentiala"] + [None] * 14,
+    ]
+    return (
+        _census_frame(eth_rows, 26),
+        _census_frame(age_rows, 21),
+        _census_frame(edu_rows, EDUCATION_COLUMNS + 2),
+    )
+
+
+def write_placeholder(path, label, scale, seed):
+    """A stand-in workbook; its content keys the primed cache entries."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"synthetic {label}, scale {scale:g}, seed {seed}\n")
+    return path
+
+
+def generate(data_dir, scale=1.0, seed=0):
+    """
+    Write every synthetic source under data_dir (the scripts' ../data) and
+    prime its excel cache; returns the row count of each sheet.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    cache_dir = os.path.join(data_dir, ".cache", "excel")
+
+    def workbook(name, label):
+        return write_placeholder(os.path.join(data_dir, name), label, scale, seed)
+
+    uats, localities = make_geography(rng, scale)
+    write_geography(data_dir, uats, localities)
+
+    schools = make_schools(rng, scale, uats, localities)
+    path = workbook("retea-scolara-2024-2025.xlsx", "school network")
+    prime_cache(
+        path,
+        schools,
+        cache_dir,
+        sheet_name=0,
+        skiprows=3,
+        dtype={"Cod SIIIR unitate": str},
+    )
+    codes = schools["Cod SIIIR unitate"].to_numpy()
+
+    # process_bac.py reads the codes as numbers, create_bac_db.py as text
+    bac = make_bac(rng, scale, codes)
+    path = workbook("2024.09.30_bac_date-deschise_2024-ses1.xlsx", "BAC")
+    prime_cache(path, bac, cache_dir, stream=True, dtype={"Unitate (SIIIR)": str})
+    bac["Unitate (SIIIR)"] = bac["Unitate (SIIIR)"].astype("int64")
+    prime_cache(path, bac, cache_dir)
+
+    en = make_en(rng, scale, codes)
+    path = workbook("2024.09.30_evnat_2024_date-deschise.xlsx", "EN")
+    prime_cache(path, en, cache_dir, stream=True, dtype={" COD SIIIR": str})
+
+    # create_students_db.py reads the unit codes as text,
+    # join_network_with_students.py as numbers
+    students = make_students(rng, scale, schools)
+    path = workbook("elevi-inmatriculati-2024-2025.xlsx", "enrollment")
+    prime_cache(path, students, cache_dir, dtype={"Cod Unitate Plan": str})
+    students["Cod Unitate Plan"] = students["Cod Unitate Plan"].astype("int64")
+    prime_cache(path, students, cache_dir)
+
+    ethnicity, age, education = make_census(rng, uats)
+    path = workbook("Tabel-2.02.1-si-Tabel-2.02.2.xlsx", "census ethnicity")
+    prime_cache(path, ethnicity, cache_dir, sheet_name="Tab 2.2.2", skiprows=5)
+    path = workbook("Tabel-1.03_1.3.1-si-1.03.2.xls", "census age")
+    prime_cache(path, age, cache_dir, sheet_name="TAB. 1.03.2_RPL2021", skiprows=7)
+    path = workbook("Tabel-2.12.1-si-Tabel-2.12.2.xlsx", "census education")
+    prime_cache(path, education, cache_dir, sheet_name="Tab. 2.12.2", skiprows=7)
+
+    return {
+        "uats": len(uats),
+        "localities": len(localities),
+        "schools": len(schools),
+        "bac": len(bac),
+        "en": len(en),
+        "students": len(students),
+        "census_rows": len(ethnicity),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("data_dir", help="written as the scripts' ../data")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(args.data_dir, args.scale, args.seed)
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()))
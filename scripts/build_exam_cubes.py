@@ -0,0 +1,169 @@
+"""
+Pre-aggregated exam results ("cubes") for the map views.
+
+The exam views group bac_<year> / en_<year> joined with school_info by
+county or town, filtered by sex, language and urban/rural; the cubes answer
+them without the candidate rows. This reads the tables exported by
+to_duckdb.py and writes one Parquet file per exam and level:
+
+    ../data/cubes/<table>_<level>.parquet    level: county, town or school
+
+with one row per key × sex × language × mediu (EN records no language, so
+its cubes have no language column; for BAC, non_romanian_lang is NULL for
+candidates who only took the Romanian exam, as in bac_<year>). Every measure
+is additive, so any coarser view is the SUM over the matching rows:
+
+- candidates, absent, passed (NULL for EN, which has no pass mark: the EN
+  views only count candidates and average their grades)
+- graded, grade_sum, grade_sum_sq over mean_grade:
+  mean = grade_sum / graded, std = sqrt(grade_sum_sq / graded - mean²)
+- grade_1 .. grade_9, a histogram of mean_grade: grade_k counts [k, k + 1),
+  grade_1 also the grades below 1 and grade_9 the 10s
+
+Rows are sorted by the level keys, so a county's rows are contiguous and
+DuckDB can skip the others from the Parquet statistics.
+
+Usage (from scripts/):
+    python build_exam_cubes.py --year 2024
+"""
+
+import argparse
+import os
+
+import duckdb
+
+import instrument
+
+DATA_DIR = "../data"
+CUBES_DIR = "../data/cubes"
+
+# Expressions over e (the exam table) and si (school_info)
+EXAMS = {
+    "bac": {
+        "dimensions": {
+            "sex": "e.sex",
+            "non_romanian_lang": "e.non_romanian_lang",
+            "mediu": "si.mediu",
+        },
+        "passed": "e.result = 'Promovat'",
+        "absent": "e.result = 'Absent'",
+    },
+    "en": {
+        "dimensions": {"sex": "e.sex", "mediu": "si.mediu"},
+        "passed": None,
+        "absent": "e.mean_grade IS NULL",
+    },
+}
+
+LEVELS = {
+    "school": ["judet", "localitate", "school_id"],
+    "town": ["judet", "localitate"],
+    "county": ["judet"],
+}
+
+HISTOGRAM_BINS = range(1, 10)
+MEASURES = [
+    "candidates",
+    "absent",
+    "passed",
+    "graded",
+    "grade_sum",
+    "grade_sum_sq",
+    *(f"grade_{k}" for k in HISTOGRAM_BINS),
+]
+
+
+def school_cube_sql(table, exam):
+    """Aggregate the candidate rows per school and dimension values."""
+    dimensions = exam["dimensions"]
+    # GREATEST skips NULLs, so the ungraded rows are filtered out explicitly
+    grade_bin = "LEAST(GREATEST(FLOOR(e.mean_grade), 1), 9)"
+    if exam["passed"] is None:
+        passed = "NULL::INTEGER AS passed"
+    else:
+        passed = f"COUNT(*) FILTER (WHERE {exam['passed']})::INTEGER AS passed"
+    histogram = ",\n".join(
+        f"COUNT(e.mean_grade) FILTER (WHERE {grade_bin} = {k})::INTEGER"
+        f" AS grade_{k}"
+        for k in HISTOGRAM_BINS
+    )
+    return f"""
+        SELECT
+            si.judet,
+            si.localitate,
+            e.school_id,
+            {", ".join(f"{expr} AS {name}" for name, expr in dimensions.items())},
+            COUNT(*)::INTEGER AS candidates,
+            COUNT(*) FILTER (WHERE {exam["absent"]})::INTEGER AS absent,
+            {passed},
+            COUNT(e.mean_grade)::INTEGER AS graded,
+            -- The grades are REAL; the sums are accumulated as DOUBLE
+            COALESCE(SUM(e.mean_grade::DOUBLE), 0) AS grade_sum,
+            COALESCE(SUM(e.mean_grade::DOUBLE * e.mean_grade), 0) AS grade_sum_sq,
+            {histogram}
+        FROM read_parquet('{os.path.join(DATA_DIR, table)}.parquet') e
+        JOIN read_parquet('{os.path.join(DATA_DIR, "school_info")}.parquet') si
+            ON si.id = e.school_id
+        GROUP BY ALL
+    """
+
+
+def rollup_sql(source, keys, dimensions):
+    """Sum a finer cube up to keys × dimensions, all measures being additive."""
+    columns = ", ".join(keys + dimensions)
+    sums = ", ".join(
+        f"SUM({m})::{'DOUBLE' if m.startswith('grade_sum') else 'INTEGER'} AS {m}"
+        for m in MEASURES
+    )
+    return f"SELECT {columns}, {sums} FROM {source} GROUP BY ALL"
+
+
+def write_cube(con, query, keys, path):
+    """COPY a query sorted by keys into a ZSTD Parquet file, atomically."""
+    tmp_path = path + ".tmp"
+    order = ", ".join(f"{k} NULLS LAST" for k in keys)
+    con.execute(
+        f"COPY ({query} ORDER BY {order}) TO '{tmp_path}'"
+        " (FORMAT PARQUET, COMPRESSION ZSTD)"
+    )
+    os.replace(tmp_path, path)
+    rows = con.execute(f"SELECT COUNT(*) FROM read_parquet('{path}')").fetchone()[0]
+    return rows, os.path.getsize(path)
+
+
+def build_cubes(con, year, out_dir=CUBES_DIR):
+    """Write every exam × level cube for year; returns (path, rows, bytes) rows."""
+    os.makedirs(out_dir, exist_ok=True)
+    report = []
+    for name, exam in EXAMS.items():
+        table = f"{name}_{year}"
+        dimensions = list(exam["dimensions"])
+
+        # The school cube is the only pass over the candidate rows; the town
+        # and county cubes are rolled up from it
+        with instrument.stage(f"cube_{table}"):
+            con.execute(
+                f"CREATE OR REPLACE TEMP TABLE cube AS {school_cube_sql(table, exam)}"
+            )
+        for level, keys in LEVELS.items():
+            path = os.path.join(out_dir, f"{table}_{level}.parquet")
+            with instrument.stage(f"cube_{table}_{level}") as s:
+                rows, size = write_cube(
+                    con, rollup_sql("cube", keys, dimensions), keys, path
+                )
+                s.rows_out = rows
+            report.append((path, rows, size))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--output", default=CUBES_DIR)
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    instrument.configure(args)
+
+    con = duckdb.connect()
+    for path, rows, size in build_cubes(con, args.year, args.output):
+        print(f"{path}: {rows} rows, {size / 1024:.1f} KB")
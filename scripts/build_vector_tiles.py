@@ -0,0 +1,367 @@
+"""
+Build a vector tile pyramid of the county (ADM1) and UAT (ADM2) boundaries
+with the number of schools baked into every feature, written as a single
+PMTiles archive (../data/romania.pmtiles) the map can read with range
+requests instead of downloading a GeoJSON file per county.
+
+For every zoom the polygons are projected to Web Mercator tile units,
+simplified with a tolerance of --tolerance pixels (so low zooms carry far
+fewer vertices), snapped to the integer tile grid, clipped to each tile plus
+a small buffer and encoded as Mapbox Vector Tiles. School counts come from
+the school network CSV written by validate_school_county_town.py, joined on
+the SIRUTA code of each school's UAT (the natcode of the UAT features).
+
+Usage (from scripts/):
+    python build_vector_tiles.py --min-zoom 4 --max-zoom 10
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import math
+import struct
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+from shapely.geometry.polygon import orient
+
+from pmtiles import write_pmtiles
+from school_codes import SCHOOL_NETWORK_CSV
+
+COUNTIES_PATH = "../data/ro_judete_poligon_simplified.json"
+UAT_GLOB = "../data/adm2/*.geojson"
+OUTPUT_PATH = "../data/romania.pmtiles"
+
+EXTENT = 4096
+BUFFER = 64
+
+# layer name → (properties kept from the GeoJSON and their TileJSON types,
+# property used as the feature id)
+LAYERS = {
+    "counties": (
+        {"name": "String", "mnemonic": "String", "school_count": "Number"},
+        "countyId",
+    ),
+    "uat": (
+        {
+            "name": "String",
+            "countyMn": "String",
+            "natcode": "String",
+            "natLevName": "String",
+            "school_count": "Number",
+        },
+        "natcode",
+    ),
+}
+
+
+# Mapbox Vector Tile encoding (protobuf, written by hand: the format only
+# needs varints, length-delimited fields and doubles)
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return out
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number, payload):
+    """A length-delimited field (wire type 2)."""
+    return _varint((number << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _varint_field(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _packed(number, values):
+    return _field(number, b"".join(_varint(v) for v in values))
+
+
+def encode_value(value):
+    if isinstance(value, str):
+        return _field(1, value.encode("utf-8"))
+    if isinstance(value, (bool, np.bool_)):
+        return _varint_field(7, int(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        if value >= 0:
+            return _varint_field(5, value)
+        return _varint_field(6, _zigzag(value))
+    return _varint((3 << 3) | 1) + struct.pack("<d", float(value))
+
+
+def _ring_commands(ring, cursor):
+    """MoveTo, LineTo... and ClosePath for one ring, relative to cursor."""
+    points = ring[:-1]
+    commands = [(1 << 3) | 1]
+    x, y = cursor
+    for i, (px, py) in enumerate(points):
+        if i == 1:
+            commands.append(((len(points) - 1) << 3) | 2)
+        commands += [_zigzag(px - x), _zigzag(py - y)]
+        x, y = px, py
+    commands.append((1 << 3) | 7)
+    return commands, (x, y)
+
+
+def encode_polygon(geometry):
+    """Command stream of a (Multi)Polygon in integer tile coordinates."""
+    commands = []
+    cursor = (0, 0)
+    polygons = getattr(geometry, "geoms", [geometry])
+    for polygon in polygons:
+        for ring in [polygon.exterior, *polygon.interiors]:
+            coords = [(int(x), int(y)) for x, y in ring.coords]
+            if len(coords) < 4:
+                continue
+            ring_commands, cursor = _ring_commands(coords, cursor)
+            commands += ring_commands
+    return commands
+
+
+def encode_layer(name, features):
+    """features: (id, properties, geometry) tuples, geometry in tile units."""
+    keys, values = {}, {}
+    encoded_features = bytearray()
+    for feature_id, properties, geometry in features:
+        commands = encode_polygon(geometry)
+        if not commands:
+            continue
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value).__name__, value), len(values)))
+        feature = bytearray()
+        if feature_id is not None:
+            feature += _varint_field(1, feature_id)
+        feature += _packed(2, tags)
+        feature += _varint_field(3, 3)  # POLYGON
+        feature += _packed(4, commands)
+        encoded_features += _field(2, bytes(feature))
+
+    if not encoded_features:
+        return b""
+    layer = _varint_field(15, 2) + _field(1, name.encode("utf-8"))
+    layer += encoded_features
+    for key in keys:
+        layer += _field(3, key.encode("utf-8"))
+    for _, value in values:
+        layer += _field(4, bytes(encode_value(value)))
+    layer += _varint_field(5, EXTENT)
+    return _field(3, bytes(layer))
+
+
+# Tiling
+
+
+def project(lon_lat, zoom):
+    """lon/lat → Web Mercator coordinates in tile units (EXTENT per tile) at zoom."""
+    size = EXTENT * (1 << zoom)
+    lon, lat = lon_lat[:, 0], np.radians(lon_lat[:, 1])
+    x = (lon + 180.0) / 360.0 * size
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * size
+    return np.column_stack([x, y])
+
+
+def tile_layer(geometries, zoom, tolerance):
+    """
+    Project and simplify one layer for a zoom level. Returns the geometries
+    in global tile units and an STRtree over them.
+    """
+    projected = shapely.transform(geometries, lambda coords: project(coords, zoom))
+    simplified = shapely.simplify(
+        projected, tolerance * EXTENT / 256, preserve_topology=True
+    )
+    return simplified, shapely.STRtree(simplified)
+
+
+def clip_to_tile(geometry, x, y):
+    """Clip to tile (x, y) plus BUFFER and move to tile-local integer coordinates."""
+    x0, y0 = x * EXTENT, y * EXTENT
+    clipped = shapely.clip_by_rect(
+        geometry, x0 - BUFFER, y0 - BUFFER, x0 + EXTENT + BUFFER, y0 + EXTENT + BUFFER
+    )
+    if clipped.is_empty:
+        return None
+    local = shapely.transform(clipped, lambda coords: coords - [x0, y0])
+    # snapping through GEOS keeps the rings valid on the integer grid
+    local = shapely.set_precision(local, 1.0)
+    local = shapely.force_2d(local)
+    if local.is_empty:
+        return None
+    polygons = [g for g in getattr(local, "geoms", [local]) if g.geom_type == "Polygon"]
+    if not polygons:
+        return None
+    # MVT exterior rings have a positive area in (y-down) tile coordinates
+    return shapely.MultiPolygon([orient(p, sign=1.0) for p in polygons])
+
+
+def load_layers(counties_path, uat_glob, school_network_csv):
+    schools = pd.read_csv(
+        school_network_csv,
+        usecols=["Judet PJ", "Cod SIRUTA UAT"],
+        dtype={"Judet PJ": str, "Cod SIRUTA UAT": "Int32"},
+    )
+    per_county = schools.groupby("Judet PJ").size()
+    per_uat = schools.groupby("Cod SIRUTA UAT").size()
+
+    with open(counties_path, "r", encoding="utf-8") as f:
+        counties = json.load(f)["features"]
+    for feature in counties:
+        props = feature["properties"]
+        props["school_count"] = int(per_county.get(props["mnemonic"], 0))
+
+    uats = []
+    for path in sorted(glob.glob(uat_glob)):
+        with open(path, "r", encoding="utf-8") as f:
+            uats += json.load(f)["features"]
+    for feature in uats:
+        props = feature["properties"]
+        props["school_count"] = int(per_uat.get(int(props["natcode"]), 0))
+
+    return {"counties": counties, "uat": uats}
+
+
+def feature_table(name, features):
+    keep, id_key = LAYERS[name]
+    geometries = np.array([shape(f["geometry"]) for f in features])
+    properties, ids = [], []
+    for feature in features:
+        props = feature["properties"]
+        properties.append(
+            {key: props[key] for key in keep if props.get(key) is not None}
+        )
+        try:
+            ids.append(int(props[id_key]))
+        except (KeyError, TypeError, ValueError):
+            ids.append(None)
+    return geometries, properties, ids
+
+
+def build_tiles(layers, min_zoom, max_zoom, uat_min_zoom, tolerance):
+    tables = {name: feature_table(name, features) for name, features in layers.items()}
+    lon_min, lat_min, lon_max, lat_max = shapely.total_bounds(
+        tables["counties"][0]
+    ).tolist()
+
+    tiles = {}
+    report = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        zoom_layers = {}
+        for name, (geometries, properties, ids) in tables.items():
+            if name == "uat" and zoom < uat_min_zoom:
+                continue
+            zoom_layers[name] = tile_layer(geometries, zoom, tolerance)
+
+        x_min, y_min = (
+            project(np.array([[lon_min, lat_max]]), zoom)[0] // EXTENT
+        ).astype(int)
+        x_max, y_max = (
+            project(np.array([[lon_max, lat_min]]), zoom)[0] // EXTENT
+        ).astype(int)
+
+        zoom_bytes = 0
+        zoom_tiles = 0
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                box = shapely.box(
+                    x * EXTENT - BUFFER,
+                    y * EXTENT - BUFFER,
+                    (x + 1) * EXTENT + BUFFER,
+                    (y + 1) * EXTENT + BUFFER,
+                )
+                encoded = b""
+                for name, (geometries, tree) in zoom_layers.items():
+                    _, properties, ids = tables[name]
+                    features = []
+                    for i in sorted(tree.query(box, predicate="intersects")):
+                        geometry = clip_to_tile(geometries[i], x, y)
+                        if geometry is not None:
+                            features.append((ids[i], properties[i], geometry))
+                    encoded += encode_layer(name, features)
+                if encoded:
+                    tiles[(zoom, x, y)] = gzip.compress(encoded, mtime=0)
+                    zoom_bytes += len(tiles[(zoom, x, y)])
+                    zoom_tiles += 1
+        report.append({"zoom": zoom, "tiles": zoom_tiles, "bytes": zoom_bytes})
+
+    return tiles, report, (lon_min, lat_min, lon_max, lat_max)
+
+
+def tilejson_metadata(min_zoom, max_zoom, uat_min_zoom):
+    return {
+        "name": "romania-educata",
+        "format": "pbf",
+        "vector_layers": [
+            {
+                "id": "counties",
+                "fields": LAYERS["counties"][0],
+                "minzoom": min_zoom,
+                "maxzoom": max_zoom,
+            },
+            {
+                "id": "uat",
+                "fields": LAYERS["uat"][0],
+                "minzoom": uat_min_zoom,
+                "maxzoom": max_zoom,
+            },
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--counties", default=COUNTIES_PATH)
+    parser.add_argument("--uat", default=UAT_GLOB, help="glob of the ADM2 GeoJSON")
+    parser.add_argument("--schools", default=SCHOOL_NETWORK_CSV)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--min-zoom", type=int, default=4)
+    parser.add_argument("--max-zoom", type=int, default=10)
+    parser.add_argument(
+        "--uat-min-zoom",
+        type=int,
+        default=6,
+        help="first zoom with the UAT layer",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.0,
+        help="simplification tolerance in screen pixels (256 per tile)",
+    )
+    args = parser.parse_args()
+
+    layers = load_layers(args.counties, args.uat, args.schools)
+    tiles, report, bounds = build_tiles(
+        layers, args.min_zoom, args.max_zoom, args.uat_min_zoom, args.tolerance
+    )
+    summary = write_pmtiles(
+        args.output,
+        tiles,
+        tilejson_metadata(args.min_zoom, args.max_zoom, args.uat_min_zoom),
+        bounds,
+        args.min_zoom,
+        args.max_zoom,
+        center_zoom=args.min_zoom + 2,
+    )
+
+    print(f"{'zoom':<6}{'tiles':>7}{'bytes':>12}")
+    for row in report:
+        print(f"{row['zoom']:<6}{row['tiles']:>7}{row['bytes']:>12}")
+    print(
+        f"Wrote {args.output}: {summary['tiles']} tiles "
+        f"({summary['unique_tiles']} unique), {summary['bytes']} bytes"
+    )
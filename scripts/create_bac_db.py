@@ -1,127 +1,115 @@
-import json
-from collections import defaultdict, Counter
-import numpy as np
 import pandas as pd
-
-df = pd.read_excel(
-    "../data/2024.09.30_bac_date-deschise_2024-ses1.xlsx",
-    dtype={"Unitate (SIIIR)": str},
-)
-df_2024 = df[df["Promoție"] == "2023-2024"]
-
-# %%
-# Normalize language column
-df_2024["Subiect eb normalized"] = (
-    df_2024["Subiect eb"].str.extract(r"^(Limba [^\(]+)").squeeze().str.strip()
-)
-
-
-def simplify_limba(lang):
-    if isinstance(lang, str) and lang.startswith("Limba "):
-        return lang.replace("Limba ", "").lower()
-    return lang
-
-
-df_2024["Subiect eb normalized"] = df_2024["Subiect eb normalized"].apply(
-    simplify_limba
-)
-
-# rename columns
-df_2024.rename(
-    columns={
-        "Subiect eb normalized": "non_romanian_lang",
-        "Profil": "profil",
-        "Fileira": "filiera",
-        "Unitate (SIIIR)": "school_code",
-        "Limba modernă": "foreign_lang",
-        "Medie": "mean_grade",
-        "STATUS": "result",
-        "STATUS_C": "foreign_lang_exam",
-        "Sex": "sex",
-        "NOTA_EA": "ro_grade",
-        "NOTA_EB": "non_ro_grade",
-        "NOTA_EC": "profil_grade",
-        "NOTA_ED": "choice_grade",
-        "NOTA_CONTESTATIE_EA": "ro_grade_contest",
-        "NOTA_CONTESTATIE_EB": "non_ro_grade_contest",
-        "NOTA_CONTESTATIE_EC": "profil_grade_contest",
-        "NOTA_CONTESTATIE_ED": "choice_grade_contest",
-    },
-    inplace=True,
-)
-
-
-df_2024["foreign_lang"] = df_2024["foreign_lang"].apply(simplify_limba)
-
-# extract just these columns
-df_2024 = df_2024[
-    [
-        "school_code",
-        "sex",
-        "filiera",
-        "profil",
-        "ro_grade",
-        "ro_grade_contest",
-        "non_romanian_lang",
-        "non_ro_grade",
-        "non_ro_grade_contest",
-        "profil_grade",
-        "profil_grade_contest",
-        "choice_grade",
-        "choice_grade_contest",
-        "mean_grade",
-        "result",
-        "foreign_lang",
-        "foreign_lang_exam",
-    ]
-]
-
-from sqlalchemy import create_engine
-
-manual_code_fixes = {
-    "2161100953": "2162100953",
-    "2961301861": "2961201863",
-    "1661305949": "1661205942",
-    "4061304226": "4061204228",
-    "2261306257": "2261206259",
-    "2461100487": "2461100347",  # school merged
+from exam_schema import BAC, arrow_schema, columns_of, sql_types, to_frame
+from excel_cache import iter_excel
+from instrument import stage
+from school_codes import SchoolCodeResolver, county_ids
+from normalize import normalize_column, simplify_limba
+
+SOURCE_PATTERN = "../data/*_bac_date-deschise_{year}-{session}.xlsx"
+
+columns = {
+    "Subiect eb normalized": "non_romanian_lang",
+    "Profil": "profil",
+    "Fileira": "filiera",
+    "Unitate (SIIIR)": "school_code",
+    "Limba modernă": "foreign_lang",
+    "Medie": "mean_grade",
+    "STATUS": "result",
+    "STATUS_C": "foreign_lang_exam",
+    "Sex": "sex",
+    "NOTA_EA": "ro_grade",
+    "NOTA_EB": "non_ro_grade",
+    "NOTA_EC": "profil_grade",
+    "NOTA_ED": "choice_grade",
+    "NOTA_CONTESTATIE_EA": "ro_grade_contest",
+    "NOTA_CONTESTATIE_EB": "non_ro_grade_contest",
+    "NOTA_CONTESTATIE_EC": "profil_grade_contest",
+    "NOTA_CONTESTATIE_ED": "choice_grade_contest",
 }
 
 
-engine = create_engine("postgresql://localhost/romania_edu")
-df_2024["school_code"] = df_2024["school_code"].astype(str)
-df_2024["school_code"] = df_2024["school_code"].replace(manual_code_fixes)
+@stage("clean_batch")
+def clean_batch(df, year, resolver, check):
+    """
+    Filter, rename and project one batch of candidate rows of a `year` exam,
+    with the school_info id of their school (see school_codes.CodeCheck).
+    """
+    # only the candidates graduating that year
+    df = df[df["Promoție"] == f"{year - 1}-{year}"].copy()
+
+    # Normalize language column
+    df["Subiect eb normalized"] = normalize_column(
+        df["Subiect eb"].str.extract(r"^(Limba [^\(]+)", expand=False).str.strip(),
+        simplify_limba,
+    )
+
+    df = df.rename(columns=columns)
+    df["foreign_lang"] = normalize_column(df["foreign_lang"], simplify_limba)
 
+    # A batch where a grade column is empty must not change its type
+    for col in columns_of(BAC, "grade"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
 
-from sqlalchemy import text
+    df["school_code"], resolved = resolver.resolve(df["school_code"].astype(str))
+    df["school_id"], known = check.lookup(df["school_code"])
+    df = df[resolved & known]
 
-with engine.begin() as conn:
-    # 1. Write to a temporary table
-    df_2024.to_sql("bac_2024_raw", conn, index=False, if_exists="replace")
+    # extract just these columns, with their declared types
+    return to_frame(df.assign(county_id=county_ids(df["school_code"])), BAC)
 
-    # 2. Drop the final table if it exists
-    conn.execute(text("DROP TABLE IF EXISTS bac_2024"))
 
-    # 3. Create the final table with FK constraint
-    conn.execute(
-        text(
-            """
-        CREATE TABLE bac_2024 AS
-        SELECT * FROM bac_2024_raw;
-    """
-        )
+schema = arrow_schema(BAC)
+
+
+if __name__ == "__main__":
+    from exam_dataset import PartitionedWriter, exam_args, find_source
+    from school_codes import CodeCheck, school_ids_from_db, school_ids_from_parquet
+
+    args = exam_args("Build the BAC candidate dataset.", default_session="ses1")
+    # school_info is the current network, so the codes of every exam year
+    # resolve to the current codes
+    resolver = SchoolCodeResolver()
+    source = args.source or find_source(
+        SOURCE_PATTERN.format(year=args.year, session=args.session)
     )
 
-    # 4. Add the FK constraint (school_code → school_info.id)
-    conn.execute(
-        text(
-            """
-        ALTER TABLE bac_2024
-        ADD CONSTRAINT fk_school
-        FOREIGN KEY (school_code) REFERENCES school_info(id);
-    """
+    with PartitionedWriter("bac", args.year, args.session, schema) as dataset:
+        if args.no_db:
+            school_ids = school_ids_from_parquet()
+        else:
+            from sqlalchemy import create_engine
+            from pg_loader import load_batches
+
+            engine = create_engine("postgresql://localhost/romania_edu")
+            school_ids = school_ids_from_db(engine)
+
+        # Unknown codes are reported all at once instead of failing the FK
+        check = CodeCheck(
+            school_ids, f"bac_{args.year}", strict=not args.allow_unresolved
         )
-    )
 
-    # (Optional) Drop raw table
-    conn.execute(text("DROP TABLE bac_2024_raw"))
+        # Read and clean one batch at a time; each batch goes to the Parquet
+        # dataset and is COPYed into bac_<year> (or, with --no-db, written to
+        # ../data/bac_<year>.parquet) with the FK (school_id → school_info.id)
+        batches = (
+            clean_batch(df, args.year, resolver, check)
+            for df in iter_excel(source, dtype={"Unitate (SIIIR)": str})
+        )
+        batches = dataset.tee(check.checked(batches))
+        if args.no_db:
+            from parquet_loader import load_batches
+
+            load_batches(
+                batches,
+                f"bac_{args.year}",
+                schema=schema,
+                foreign_keys={"school_id": "school_info(id)"},
+            )
+        else:
+            load_batches(
+                engine,
+                batches,
+                f"bac_{args.year}",
+                column_types=sql_types(BAC),
+                foreign_keys={"school_id": "school_info(id)"},
+            )
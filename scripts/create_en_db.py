@@ -1,108 +1,96 @@
-# %%
-import json
-from collections import defaultdict, Counter
-import numpy as np
 import pandas as pd
-
-# %%
-df_2024 = pd.read_excel(
-    "../data/2024.09.30_evnat_2024_date-deschise.xlsx", dtype={" COD SIIIR": str}
-)
-
-# %%
-# rename columns
-df_2024.rename(
-    columns={
-        " COD SIIIR": "school_code",
-        "MEDIA": "mean_grade",
-        "MEDIA V-VIII": "mean_grade_school",
-        "SEX": "sex",
-        "NOTA ROMANA": "ro_grade",
-        "NOTA LIMBA MATERNA": "non_ro_grade",
-        "NOTA MATEMATICA": "math_grade",
-        "NOTA CONTESTATIE ROMANA": "ro_grade_contest",
-        "NOTA CONTESTATIE LB MATERNA": "non_ro_grade_contest",
-        "NOTA CONTESTATIE MATEMATICA": "math_grade_contest",
-    },
-    inplace=True,
-)
-
-df_2024 = df_2024[
-    [
-        "school_code",
-        "mean_grade",
-        "mean_grade_school",
-        "sex",
-        "ro_grade",
-        "ro_grade_contest",
-        "non_ro_grade",
-        "non_ro_grade_contest",
-        "math_grade",
-        "math_grade_contest",
-    ]
-]
-
-
-from sqlalchemy import create_engine
-
-manual_code_fixes = {
-    "1362101809": "1361101474",  # school merged
-    "1361100966": "1362100966",
-    "4061103107": "4062103107",
-    "3561106141": "3561101543",  # school merged
-    "3562105606": "3561100058",  # school absorbed
-    "2862101419": "2861101627",  # school absorbed
-    "3561101873": "3561106462",  # school merged
-    "2561101681": "2562101681",
-    "0161103364": "0162103364",
-    "0162101905": "0161103269",  # school absorbed
-    "1762102496": "1761104652",
-    "2261105925": "2262105925",
-    "2761102503": "2762102503",
-    "2762103852": "2761100112",  # school absorbed
-    "3261101534": "3262101534",
-    "0362101124": "0361104181",
-    "0461108066": "0462108066",
+from exam_schema import EN, arrow_schema, columns_of, sql_types, to_frame
+from excel_cache import iter_excel
+from instrument import stage
+from school_codes import SchoolCodeResolver, county_ids
+
+SOURCE_PATTERN = "../data/*_evnat_{year}_date-deschise.xlsx"
+
+columns = {
+    " COD SIIIR": "school_code",
+    "MEDIA": "mean_grade",
+    "MEDIA V-VIII": "mean_grade_school",
+    "SEX": "sex",
+    "NOTA ROMANA": "ro_grade",
+    "NOTA LIMBA MATERNA": "non_ro_grade",
+    "NOTA MATEMATICA": "math_grade",
+    "NOTA CONTESTATIE ROMANA": "ro_grade_contest",
+    "NOTA CONTESTATIE LB MATERNA": "non_ro_grade_contest",
+    "NOTA CONTESTATIE MATEMATICA": "math_grade_contest",
 }
 
 
-engine = create_engine("postgresql://localhost/romania_edu")
-df_2024["school_code"] = df_2024["school_code"].astype(str)
-df_2024["school_code"] = df_2024["school_code"].replace(manual_code_fixes)
+@stage("clean_batch")
+def clean_batch(df, resolver, check):
+    """
+    Rename, project and fix the school codes of one batch of candidate rows,
+    then replace them with their school_info id (see school_codes.CodeCheck).
+    """
+    df = df.rename(columns=columns)
+    df = df[list(columns.values())].copy()
 
-# remove non-existing school code (building demolished)
-df_2024 = df_2024[df_2024["school_code"] != "4061102635"]
+    # A batch where a grade column is empty must not change its type
+    for col in columns_of(EN, "grade"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
 
+    # codes without a successor (e.g. building demolished) are dropped
+    df["school_code"], resolved = resolver.resolve(df["school_code"].astype(str))
+    df["school_id"], known = check.lookup(df["school_code"])
+    df = df[resolved & known]
+    return to_frame(df.assign(county_id=county_ids(df["school_code"])), EN)
 
-from sqlalchemy import text
 
-with engine.begin() as conn:
-    # 1. Write to a temporary table
-    df_2024.to_sql("en_2024_raw", conn, index=False, if_exists="replace")
+schema = arrow_schema(EN)
 
-    # 2. Drop the final table if it exists
-    conn.execute(text("DROP TABLE IF EXISTS en_2024"))
 
-    # 3. Create the final table with FK constraint
-    conn.execute(
-        text(
-            """
-        CREATE TABLE en_2024 AS
-        SELECT * FROM en_2024_raw;
-    """
-        )
-    )
-
-    # 4. Add the FK constraint (school_code → school_info.id)
-    conn.execute(
-        text(
-            """
-        ALTER TABLE en_2024
-        ADD CONSTRAINT fk_school
-        FOREIGN KEY (school_code) REFERENCES school_info(id);
-    """
+if __name__ == "__main__":
+    from exam_dataset import PartitionedWriter, exam_args, find_source
+    from school_codes import CodeCheck, school_ids_from_db, school_ids_from_parquet
+
+    # EN has a single session; "ses1" keeps the layout in line with BAC
+    args = exam_args("Build the EN candidate dataset.", default_session="ses1")
+    # school_info is the current network, so the codes of every exam year
+    # resolve to the current codes
+    resolver = SchoolCodeResolver()
+    source = args.source or find_source(SOURCE_PATTERN.format(year=args.year))
+
+    with PartitionedWriter("en", args.year, args.session, schema) as dataset:
+        if args.no_db:
+            school_ids = school_ids_from_parquet()
+        else:
+            from sqlalchemy import create_engine
+            from pg_loader import load_batches
+
+            engine = create_engine("postgresql://localhost/romania_edu")
+            school_ids = school_ids_from_db(engine)
+
+        # Unknown codes are reported all at once instead of failing the FK
+        check = CodeCheck(
+            school_ids, f"en_{args.year}", strict=not args.allow_unresolved
         )
-    )
 
-    # (Optional) Drop raw table
-    conn.execute(text("DROP TABLE en_2024_raw"))
+        # Read and clean one batch at a time; each batch goes to the Parquet
+        # dataset and is COPYed into en_<year> (or, with --no-db, written to
+        # ../data/en_<year>.parquet) with the FK (school_id → school_info.id)
+        batches = (
+            clean_batch(df, resolver, check)
+            for df in iter_excel(source, dtype={" COD SIIIR": str})
+        )
+        batches = dataset.tee(check.checked(batches))
+        if args.no_db:
+            from parquet_loader import load_batches
+
+            load_batches(
+                batches,
+                f"en_{args.year}",
+                schema=schema,
+                foreign_keys={"school_id": "school_info(id)"},
+            )
+        else:
+            load_batches(
+                engine,
+                batches,
+                f"en_{args.year}",
+                column_types=sql_types(EN),
+                foreign_keys={"school_id": "school_info(id)"},
+            )
@@ -1,31 +1,41 @@
-import pandas as pd
+import argparse
 
-students_df = pd.read_excel(
-    "../data/elevi-inmatriculati-2024-2025.xlsx", dtype={"Cod Unitate Plan": str}
+import pandas as pd
+import instrument
+from excel_cache import read_excel
+from normalize import (
+    normalize_column,
+    normalize_columns,
+    normalize_diacritics,
+    simplify_limba,
+)
+from school_codes import (
+    CodeCheck,
+    SchoolCodeResolver,
+    school_ids_from_db,
+    school_ids_from_parquet,
 )
 
+parser = argparse.ArgumentParser(description="Build the student_stats table.")
+parser.add_argument(
+    "--no-db",
+    action="store_true",
+    help="write ../data/student_stats.parquet instead of the PostgreSQL table",
+)
+instrument.add_arguments(parser)
+args = parser.parse_args()
+instrument.configure(args)
 
-def normalize_diacritics(text):
-    if not isinstance(text, str):
-        return text
-    # Replace common incorrect diacritics with proper Romanian ones
-    replacements = {
-        "ş": "ș",  # replace cedilla with comma
-        "Ş": "Ș",
-        "ţ": "ț",
-        "Ţ": "Ț",
-        "š": "ș",
-    }
-
-    for wrong, correct in replacements.items():
-        text = text.replace(wrong, correct)
-
-    return text
+with instrument.stage("read_workbook") as s:
+    students_df = read_excel(
+        "../data/elevi-inmatriculati-2024-2025.xlsx", dtype={"Cod Unitate Plan": str}
+    )
+    s.rows_out = len(students_df)
 
 
 # apply normalization to all string columns
-for col in students_df.select_dtypes(include=["object"]).columns:
-    students_df[col] = students_df[col].apply(normalize_diacritics)
+with instrument.stage("normalize", rows_in=len(students_df)):
+    normalize_columns(students_df, normalize_diacritics)
 
 students_df = students_df.rename(
     columns={
@@ -38,52 +48,44 @@ students_df = students_df.rename(
 
 
 # Simplify limba_de_predare column by removing the word 'Limba'
-def simplify_limba(lang):
-    if isinstance(lang, str) and lang.startswith("Limba "):
-        return lang.replace("Limba ", "").lower()
-    return lang
-
-
-students_df["limba_de_predare"] = students_df["limba_de_predare"].apply(simplify_limba)
-
-students_df["cod_siiir_unitate"] = students_df["cod_siiir_unitate"].astype(str)
-
-students_df = students_df[
-    ["cod_siiir_unitate", "nivel", "limba_de_predare", "numar_elevi"]
-]
+students_df["limba_de_predare"] = normalize_column(
+    students_df["limba_de_predare"], simplify_limba
+)
 
 # %%
-from sqlalchemy import create_engine, text
-
-engine = create_engine("postgresql://localhost/romania_edu")
-
-with engine.begin() as conn:
-    # Step 1: Save raw table
-    students_df.to_sql("student_stats_raw", conn, index=False, if_exists="replace")
+if args.no_db:
+    from parquet_loader import load_batches
+
+    school_ids = school_ids_from_parquet()
+else:
+    from sqlalchemy import create_engine
+    from pg_loader import load_batches
+
+    engine = create_engine("postgresql://localhost/romania_edu")
+    school_ids = school_ids_from_db(engine)
+
+# Unknown codes are reported all at once instead of failing the FK
+check = CodeCheck(school_ids, "student_stats")
+with instrument.stage("resolve_codes", rows_in=len(students_df)) as s:
+    codes, resolved = SchoolCodeResolver().resolve(
+        students_df["cod_siiir_unitate"].astype(str)
+    )
+    students_df["school_id"], known = check.lookup(codes)
+    students_df = students_df[resolved & known]
+    s.rows_out = len(students_df)
 
-    # Step 2: Drop final version if exists
-    conn.execute(text("DROP TABLE IF EXISTS student_stats"))
+students_df = students_df[["school_id", "nivel", "limba_de_predare", "numar_elevi"]]
 
-    # Step 3: Create final table from raw
-    conn.execute(
-        text(
-            """
-        CREATE TABLE student_stats AS
-        SELECT * FROM student_stats_raw;
-    """
-        )
+if args.no_db:
+    load_batches(
+        check.checked([students_df]),
+        "student_stats",
+        foreign_keys={"school_id": "school_info(id)"},
     )
-
-    # Step 4: Add FK constraint
-    conn.execute(
-        text(
-            """
-        ALTER TABLE student_stats
-        ADD CONSTRAINT fk_student_school
-        FOREIGN KEY (cod_siiir_unitate) REFERENCES school_info(id);
-    """
-        )
+else:
+    load_batches(
+        engine,
+        check.checked([students_df]),
+        "student_stats",
+        foreign_keys={"school_id": "school_info(id)"},
     )
-
-    # Step 5: Drop raw table
-    conn.execute(text("DROP TABLE student_stats_raw"))
@@ -0,0 +1,116 @@
+"""
+Helpers shared by the exam builders (create_bac_db.py, create_en_db.py).
+
+Candidate rows of every exam year and session go into one Hive-partitioned
+Parquet dataset per exam:
+
+    ../data/exams/<exam>/year=<year>/session=<session>/county=<id>/part-0.parquet
+
+where county is the two-digit county id that starts every SIIIR school code
+(the county_id column of the rows).
+Rebuilding a year/session replaces just that directory, so older years stay
+in place, and DuckDB can prune partitions with hive_partitioning=true.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+
+import pyarrow.parquet as pq
+
+import instrument
+from instrument import stage
+from parquet_loader import to_arrow
+
+DATASET_DIR = "../data/exams"
+
+
+def partition_path(exam, year, session, root=DATASET_DIR):
+    return os.path.join(root, exam, f"year={year}", f"session={session}")
+
+
+class PartitionedWriter:
+    """
+    Writes DataFrame batches of one exam year/session into per-county Parquet
+    files with a fixed schema. Use as a context manager: the files are
+    written to a temporary directory that replaces the year/session
+    partition only when the writer closes without an error.
+    """
+
+    def __init__(self, exam, year, session, schema, root=DATASET_DIR):
+        self.schema = schema
+        self.path = partition_path(exam, year, session, root)
+        self.tmp_path = self.path + ".tmp"
+        self.writers = {}
+        self.rows = 0
+
+    def __enter__(self):
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        return self
+
+    def _to_table(self, df):
+        return to_arrow(df, self.schema)
+
+    def _writer(self, county):
+        if county not in self.writers:
+            directory = os.path.join(self.tmp_path, f"county={county}")
+            os.makedirs(directory)
+            self.writers[county] = pq.ParquetWriter(
+                os.path.join(directory, "part-0.parquet"), self.schema
+            )
+        return self.writers[county]
+
+    @stage("write_dataset")
+    def write(self, df):
+        for county, part in df.groupby("county_id", sort=False):
+            self._writer(f"{county:02d}").write_table(self._to_table(part))
+        self.rows += len(df)
+
+    def tee(self, batches):
+        """Write each batch while passing it on (e.g. to pg_loader.load_batches)."""
+        for df in batches:
+            self.write(df)
+            yield df
+
+    def __exit__(self, exc_type, exc, tb):
+        for writer in self.writers.values():
+            writer.close()
+        if exc_type is not None:
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+            return False
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+        print(f"Wrote {self.rows} rows to {self.path}")
+        return False
+
+
+def find_source(pattern):
+    """The most recently published workbook matching a glob pattern."""
+    matches = sorted(glob.glob(pattern))
+    if not matches:
+        raise FileNotFoundError(f"No source workbook matches {pattern}")
+    return matches[-1]
+
+
+def exam_args(description, default_session):
+    """Command line shared by the exam builders."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--session", default=default_session)
+    parser.add_argument("--source", help="workbook path (default: derived from year)")
+    parser.add_argument(
+        "--no-db",
+        action="store_true",
+        help="write ../data/<exam>_<year>.parquet instead of the PostgreSQL table",
+    )
+    parser.add_argument(
+        "--allow-unresolved",
+        action="store_true",
+        help="skip rows whose school code is not in school_info instead of failing",
+    )
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    instrument.configure(args)
+    return args
@@ -0,0 +1,83 @@
+"""
+Column types of the candidate-level exam tables, bac_<year> and en_<year>.
+
+Every column is declared once, with a kind that fixes its type in the
+cleaned DataFrames, in the Parquet files and in PostgreSQL:
+
+- key: the school_info id of the school (see school_codes.py); int32 and
+  INTEGER
+- county: the county id that starts the school's SIIIR code; int16 and
+  SMALLINT
+- category: text with a handful of values (sex, profile, result, languages);
+  a pandas categorical, a dictionary-encoded Arrow string and TEXT
+- grade: a grade from 1 to 10 with two decimals; float32 and REAL, which
+  keep the two decimals and take half the space of float64
+
+to_frame projects and types a cleaned batch, arrow_schema gives the schema of
+the Parquet dataset and of ../data/<table>.parquet, and sql_types the column
+types of the PostgreSQL table (instead of to_sql's TEXT / DOUBLE PRECISION).
+"""
+
+import pyarrow as pa
+
+KINDS = {
+    # kind: (pandas dtype, Arrow type, PostgreSQL type)
+    "key": ("int32", pa.int32(), "INTEGER"),
+    "county": ("int16", pa.int16(), "SMALLINT"),
+    "category": ("category", pa.dictionary(pa.int32(), pa.string()), "TEXT"),
+    "grade": ("float32", pa.float32(), "REAL"),
+}
+
+BAC = {
+    "school_id": "key",
+    "county_id": "county",
+    "sex": "category",
+    "filiera": "category",
+    "profil": "category",
+    "ro_grade": "grade",
+    "ro_grade_contest": "grade",
+    "non_romanian_lang": "category",
+    "non_ro_grade": "grade",
+    "non_ro_grade_contest": "grade",
+    "profil_grade": "grade",
+    "profil_grade_contest": "grade",
+    "choice_grade": "grade",
+    "choice_grade_contest": "grade",
+    "mean_grade": "grade",
+    "result": "category",
+    "foreign_lang": "category",
+    "foreign_lang_exam": "category",
+}
+
+EN = {
+    "school_id": "key",
+    "county_id": "county",
+    "mean_grade": "grade",
+    "mean_grade_school": "grade",
+    "sex": "category",
+    "ro_grade": "grade",
+    "ro_grade_contest": "grade",
+    "non_ro_grade": "grade",
+    "non_ro_grade_contest": "grade",
+    "math_grade": "grade",
+    "math_grade_contest": "grade",
+}
+
+
+def columns_of(columns, kind):
+    return [name for name, k in columns.items() if k == kind]
+
+
+def to_frame(df, columns):
+    """The declared columns of df, in order, with their pandas types."""
+    return df[list(columns)].astype(
+        {name: KINDS[kind][0] for name, kind in columns.items()}
+    )
+
+
+def arrow_schema(columns):
+    return pa.schema([(name, KINDS[kind][1]) for name, kind in columns.items()])
+
+
+def sql_types(columns):
+    return {name: KINDS[kind][2] for name, kind in columns.items()}
@@ -0,0 +1,261 @@
+"""
+Drop-in replacement for pd.read_excel that parses each workbook sheet once.
+
+The parsed sheet is stored as an Arrow IPC file under ../data/.cache/excel,
+keyed by the workbook content hash and the read options (sheet, skiprows,
+dtype, ...). Later reads memory-map that file instead of going through
+openpyxl/xlrd again. Editing the workbook changes its hash, so stale entries
+are never served; they can be removed with clear_cache().
+
+Columns keep the values and dtypes read_excel gave them. Excel columns often
+mix numbers and text (e.g. "-" placeholders in the census sheets), which an
+Arrow column cannot hold; those are stored as pickled values instead and
+come back as the same Python objects.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+CACHE_DIR = "../data/.cache/excel"
+
+_digests = {}
+
+
+def file_digest(path):
+    """sha256 of a file, memoized per process on (path, size, mtime)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def cache_key(path, **options):
+    options = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha256(f"{file_digest(path)}|{options}".encode("utf-8")).hexdigest()
+
+
+def _is_mixed(column):
+    """Whether an object column holds values Arrow would coerce to one type."""
+    if column.dtype != object:
+        return False
+    if column.dropna().map(type).nunique() > 1:
+        return True
+    try:
+        pa.array(column, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return True
+    return False
+
+
+def _to_arrow(df):
+    pickled = [col for col in df.columns if _is_mixed(df[col])]
+    for col in pickled:
+        df[col] = [pickle.dumps(value) for value in df[col]]
+
+    # Arrow reads the missing values of a text column back as None, where
+    # read_excel has NaN
+    nan_text = [
+        i
+        for i, col in enumerate(df.columns)
+        if df[col].dtype == object
+        and col not in pickled
+        and df[col].map(lambda v: isinstance(v, float) and v != v).any()
+    ]
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Arrow only allows string column names; keep the originals (e.g. numeric
+    # headers) so the frame comes back exactly as read_excel returned it.
+    columns = json.dumps(list(df.columns), default=str, ensure_ascii=False)
+    positions = [list(df.columns).index(col) for col in pickled]
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"excel_cache.columns"] = columns.encode("utf-8")
+    metadata[b"excel_cache.pickled"] = json.dumps(positions).encode("utf-8")
+    metadata[b"excel_cache.nan_text"] = json.dumps(nan_text).encode("utf-8")
+    return table.replace_schema_metadata(metadata)
+
+
+def _column_list(schema, key):
+    return json.loads((schema.metadata or {}).get(key, b"[]"))
+
+
+def _pickled_columns(schema):
+    return _column_list(schema, b"excel_cache.pickled")
+
+
+def _from_arrow(table):
+    df = table.to_pandas()
+    for i in _pickled_columns(table.schema):
+        values = [pickle.loads(v) for v in df.iloc[:, i]]
+        df.isetitem(i, pd.Series(values, index=df.index, dtype=object))
+    for i in _column_list(table.schema, b"excel_cache.nan_text"):
+        column = df.iloc[:, i]
+        df.isetitem(i, column.where(column.notna(), np.nan))
+    columns = (table.schema.metadata or {}).get(b"excel_cache.columns")
+    if columns is not None:
+        df.columns = json.loads(columns)
+    return df
+
+
+def _write_cache(cache_path, table):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, cache_path)
+
+
+def read_excel(path, sheet_name=0, **kwargs):
+    """
+    Same signature as pd.read_excel for a single sheet, served from the cache
+    when the workbook and options have been seen before.
+    """
+    cache_path = os.path.join(
+        CACHE_DIR, cache_key(path, sheet_name=sheet_name, **kwargs) + ".arrow"
+    )
+
+    if not os.path.exists(cache_path):
+        df = pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+        _write_cache(cache_path, _to_arrow(df))
+
+    # Always return what the cache holds, so the first run sees the same
+    # frame as every later one.
+    with pa.memory_map(cache_path, "r") as source:
+        return _from_arrow(pa.ipc.open_file(source).read_all())
+
+
+def _read_sheet_rows(path, sheet_name, skiprows, dtype, batch_rows):
+    """Parse an .xlsx sheet with openpyxl's read-only iterator, batch_rows at a time."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            sheet = workbook.worksheets[sheet_name]
+        else:
+            sheet = workbook[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        for _ in range(skiprows):
+            next(rows, None)
+        header = next(rows, ())
+        columns = [
+            f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)
+        ]
+
+        batch = []
+        for row in rows:
+            # read_excel skips blank rows as well
+            if all(value is None for value in row):
+                continue
+            batch.append(row[: len(columns)])
+            if len(batch) == batch_rows:
+                yield _rows_to_frame(batch, columns, dtype)
+                batch = []
+        if batch:
+            yield _rows_to_frame(batch, columns, dtype)
+    finally:
+        workbook.close()
+
+
+def _rows_to_frame(rows, columns, dtype):
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for col, col_type in (dtype or {}).items():
+        if col_type is str:
+            df[col] = df[col].map(lambda v: v if v is None else str(v))
+        else:
+            df[col] = df[col].astype(col_type)
+    return df
+
+
+def iter_excel(path, sheet_name=0, skiprows=0, dtype=None, batch_rows=50_000):
+    """
+    Yield an .xlsx sheet as DataFrames of at most batch_rows rows, so callers
+    can filter and write each batch without holding the whole sheet.
+
+    The first pass streams the sheet through openpyxl in read-only mode and
+    writes the batches to the cache; later passes slice the memory-mapped
+    cache file. Batches are typed independently when parsed, so callers should
+    not rely on the dtype of columns that can be entirely empty in a batch.
+    """
+    cache_path = os.path.join(
+        CACHE_DIR,
+        cache_key(
+            path, sheet_name=sheet_name, skiprows=skiprows, dtype=dtype, stream=True
+        )
+        + ".arrow",
+    )
+
+    if os.path.exists(cache_path):
+        with pa.memory_map(cache_path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            for offset in range(0, table.num_rows, batch_rows):
+                yield _from_arrow(table.slice(offset, batch_rows))
+        return
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    writer = schema = None
+    try:
+        for df in _read_sheet_rows(path, sheet_name, skiprows, dtype, batch_rows):
+            if writer is not None:
+                try:
+                    table = _to_arrow(df.copy())
+                    if _pickled_columns(table.schema) != _pickled_columns(schema):
+                        raise ValueError("the mixed-type columns differ")
+                    table = table.cast(schema)
+                except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError):
+                    # The batch doesn't fit the types of the first one;
+                    # keep streaming but give up on caching this sheet.
+                    writer.close()
+                    writer = False
+                    os.remove(tmp_path)
+            elif writer is None:
+                table = _to_arrow(df.copy())
+                schema = table.schema
+                writer = pa.ipc.new_file(tmp_path, schema)
+            if writer:
+                writer.write_table(table)
+            yield df
+    except BaseException:
+        if writer:
+            writer.close()
+            os.remove(tmp_path)
+        raise
+
+    if writer:
+        writer.close()
+        os.replace(tmp_path, cache_path)
+
+
+def prime_cache(path, df, cache_dir=CACHE_DIR, stream=False, **options):
+    """
+    Store df as the parsed sheet of the file at path, for the read_excel
+    (or, with stream=True, iter_excel) call with these options, so that call
+    returns df without parsing path. Used by the benchmarks to feed the
+    scripts synthetic sheets larger than an .xlsx file can hold.
+    """
+    options.setdefault("sheet_name", 0)
+    if stream:
+        options.setdefault("skiprows", 0)
+        options.setdefault("dtype", None)
+        options["stream"] = True
+    cache_path = os.path.join(cache_dir, cache_key(path, **options) + ".arrow")
+    _write_cache(cache_path, _to_arrow(df.copy()))
+
+
+def clear_cache():
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for name in os.listdir(CACHE_DIR):
+        os.remove(os.path.join(CACHE_DIR, name))
@@ -0,0 +1,223 @@
+"""
+Per-stage measurements for the data scripts, written as JSON lines.
+
+A stage is a named step of a script, used as a context manager or a
+decorator:
+
+    from instrument import stage
+
+    with stage("read_workbook") as s:
+        df = read_excel(...)
+        s.rows_out = len(df)
+
+    @stage("clean_batch")      # rows in/out from the first DataFrame
+    def clean_batch(df): ...   # argument and the returned DataFrame
+
+Every stage appends one line to ../data/stage_metrics.jsonl with the run
+(script and start time), the stage and its enclosing stage, wall and CPU
+seconds, the peak RSS of the process so far, rows in and out, and whether it
+failed. Streamed stages count their batches with s.count_in / s.count_out.
+CPU time is the whole process's, so it includes DuckDB's and other threads.
+
+Scripts add the options below to their command line (add_arguments) and
+apply them with configure:
+
+- --trace-memory also records the peak of Python/NumPy allocations per stage
+  with tracemalloc (slow: several times the run time)
+- --profile STAGE runs the stages matching STAGE (a glob) under cProfile,
+  writes ../data/profiles/<script>-<stage>.prof and prints the top functions
+"""
+
+import atexit
+import cProfile
+import fnmatch
+import functools
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+METRICS_PATH = "../data/stage_metrics.jsonl"
+PROFILES_DIR = "../data/profiles"
+
+_config = {
+    "script": os.path.basename(sys.argv[0]),
+    "run": f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}",
+    "metrics_path": METRICS_PATH,
+    "profile": None,
+}
+_profilers = {}
+# Stages nest per thread (to_duckdb.py exports tables from a thread pool)
+_local = threading.local()
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--profile",
+        metavar="STAGE",
+        help="profile the stages matching STAGE with cProfile",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="record the peak Python memory of every stage (slow)",
+    )
+
+
+def configure(args=None, script=None, metrics_path=None):
+    """Apply the --profile / --trace-memory options of a parsed command line."""
+    if script:
+        _config["script"] = script
+    if metrics_path:
+        _config["metrics_path"] = metrics_path
+    if args is not None:
+        _config["profile"] = args.profile
+        if args.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def _open_stages():
+    if not hasattr(_local, "stages"):
+        _local.stages = []
+    return _local.stages
+
+
+def _fold_peak():
+    """Credit the traced peak so far to every open stage, then reset it."""
+    if not tracemalloc.is_tracing():
+        return
+    peak = tracemalloc.get_traced_memory()[1]
+    for open_stage in _open_stages():
+        open_stage.py_peak = max(open_stage.py_peak, peak)
+    tracemalloc.reset_peak()
+
+
+def _max_rss_mb():
+    # ru_maxrss is in KB on Linux, in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2**20, 1)
+
+
+def _rows(value):
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+
+def _write(record):
+    path = _config["metrics_path"]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # One write per line in append mode, so concurrent stages don't interleave
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _profiler(name):
+    """The profiler of a stage name when --profile selects it, else None."""
+    pattern = _config["profile"]
+    if not pattern or not fnmatch.fnmatchcase(name, pattern):
+        return None
+    if name not in _profilers:
+        if not _profilers:
+            atexit.register(_dump_profiles)
+        _profilers[name] = cProfile.Profile()
+    return _profilers[name]
+
+
+def _dump_profiles():
+    """Write the profile of every profiled stage, summed over its runs."""
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    script = os.path.splitext(_config["script"])[0]
+    for name, profiler in _profilers.items():
+        path = os.path.join(PROFILES_DIR, f"{script}-{name}.prof")
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+        print(f"\nProfile of {name} ({path}):\n{out.getvalue()}")
+
+
+class Stage:
+    """One measured step; see the module docstring."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.py_peak = 0
+
+    def __enter__(self):
+        _fold_peak()
+        stages = _open_stages()
+        self.parent = stages[-1].name if stages else None
+        stages.append(self)
+        self.profiler = _profiler(self.name)
+        if any(outer.profiler for outer in stages[:-1]):
+            self.profiler = None  # already inside a profiled stage
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler:
+            self.profiler.disable()
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        _fold_peak()
+        _open_stages().pop()
+
+        record = {
+            "run": _config["run"],
+            "script": _config["script"],
+            "stage": self.name,
+            "parent": self.parent,
+            "started": self.started,
+            "wall": round(wall, 3),
+            "cpu": round(cpu, 3),
+            "max_rss_mb": _max_rss_mb(),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "status": "ok" if exc_type is None else "error",
+        }
+        if tracemalloc.is_tracing():
+            record["py_peak_mb"] = round(self.py_peak / 2**20, 1)
+        _write(record)
+        return False
+
+    def __call__(self, func):
+        """Measure every call of func as a fresh stage with this name."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            frames = [a for a in args if _rows(a) is not None]
+            with Stage(self.name, _rows(frames[0]) if frames else None) as s:
+                result = func(*args, **kwargs)
+                s.rows_out = _rows(result)
+                return result
+
+        return wrapper
+
+    def count_in(self, batches):
+        """Pass DataFrame batches through, adding their rows to rows_in."""
+        self.rows_in = self.rows_in or 0
+        for df in batches:
+            self.rows_in += len(df)
+            yield df
+
+    def count_out(self, batches):
+        """Pass DataFrame batches through, adding their rows to rows_out."""
+        self.rows_out = self.rows_out or 0
+        for df in batches:
+            self.rows_out += len(df)
+            yield df
+
+
+def stage(name, rows_in=None):
+    return Stage(name, rows_in)
@@ -1,34 +1,32 @@
+import argparse
+
 import pandas as pd
+import instrument
+from excel_cache import read_excel
+from normalize import (
+    normalize_column,
+    normalize_columns,
+    normalize_diacritics,
+    simplify_limba,
+)
 import json
 
-network_df = pd.read_csv("../data/retea-scolara-2024-2025.csv")
-students_df = pd.read_excel("../data/elevi-inmatriculati-2024-2025.xlsx")
-
-
-def normalize_diacritics(text):
-    if not isinstance(text, str):
-        return text
-    # Replace common incorrect diacritics with proper Romanian ones
-    replacements = {
-        "ş": "ș",  # replace cedilla with comma
-        "Ş": "Ș",
-        "ţ": "ț",
-        "Ţ": "Ț",
-        "š": "ș",
-    }
-
-    for wrong, correct in replacements.items():
-        text = text.replace(wrong, correct)
+parser = argparse.ArgumentParser(description="Build schools_by_county.json.")
+instrument.add_arguments(parser)
+instrument.configure(parser.parse_args())
 
-    return text
+with instrument.stage("read_sources") as s:
+    network_df = pd.read_csv(
+        "../data/retea-scolara-2024-2025.csv", dtype={"Cod SIRUTA UAT": "Int32"}
+    )
+    students_df = read_excel("../data/elevi-inmatriculati-2024-2025.xlsx")
+    s.rows_out = len(students_df)
 
 
 # apply normalization to all string columns
-for col in students_df.select_dtypes(include=["object"]).columns:
-    students_df[col] = students_df[col].apply(normalize_diacritics)
-
-for col in network_df.select_dtypes(include=["object"]).columns:
-    network_df[col] = network_df[col].apply(normalize_diacritics)
+with instrument.stage("normalize", rows_in=len(students_df)):
+    normalize_columns(students_df, normalize_diacritics)
+    normalize_columns(network_df, normalize_diacritics)
 
 students_df = students_df.rename(
     columns={
@@ -42,78 +40,63 @@ students_df = students_df.rename(
 
 
 # Simplify limba_de_predare column by removing the word 'Limba'
-def simplify_limba(lang):
-    if isinstance(lang, str) and lang.startswith("Limba "):
-        return lang.replace("Limba ", "").lower()
-    return lang
-
-
-students_df["limba_de_predare"] = students_df["limba_de_predare"].apply(simplify_limba)
+students_df["limba_de_predare"] = normalize_column(
+    students_df["limba_de_predare"], simplify_limba
+)
 
 students_df["cod_siiir_unitate"] = students_df["cod_siiir_unitate"].astype(str)
 
 network_df["Cod SIIIR unitate"] = network_df["Cod SIIIR unitate"].astype(str)
 network_df = network_df.rename(columns={"Cod SIIIR unitate": "cod_siiir_unitate"})
 
-student_counts = (
-    students_df.groupby("cod_siiir_unitate")["numar_elevi"].sum().reset_index()
-)
 
-langs_levels = (
-    students_df.groupby("cod_siiir_unitate")
-    .agg(
-        {
-            "limba_de_predare": lambda x: sorted(set(x.dropna())),
-            "nivel_invatamant": lambda x: sorted(set(x.dropna())),
-        }
-    )
-    .reset_index()
-)
+def sorted_unique(df, key, column):
+    """The sorted distinct non-null values of column for each key, as lists."""
+    pairs = df[[key, column]].dropna().drop_duplicates().sort_values([key, column])
+    return pairs.groupby(key, sort=False)[column].agg(list)
 
-num_classes = (
-    students_df.groupby("cod_siiir_unitate")["numar_elevi"].count().reset_index()
-)
-num_classes = num_classes.rename(
-    columns={"numar_elevi": "numar_formatiuni"}
-)  # optional
-
-from functools import reduce
-
-# Merge all
-dfs_to_merge = [student_counts, langs_levels, num_classes]
-unit_agg = reduce(
-    lambda l, r: pd.merge(l, r, on="cod_siiir_unitate", how="outer"), dfs_to_merge
-)
 
+# One pass for the counts; the language and level lists come from the
+# distinct (unit, value) pairs, sorted once, instead of a Python set per group
+with instrument.stage("aggregate", rows_in=len(students_df)) as s:
+    unit_agg = students_df.groupby("cod_siiir_unitate").agg(
+        numar_elevi=("numar_elevi", "sum"),
+        numar_formatiuni=("numar_elevi", "count"),
+    )
+    for column in ["limba_de_predare", "nivel_invatamant"]:
+        lists = sorted_unique(students_df, "cod_siiir_unitate", column)
+        lists = lists.reindex(unit_agg.index)
+        # units whose values are all missing get an empty list
+        empty = pd.Series([[]] * len(lists), index=lists.index)
+        unit_agg[column] = lists.where(lists.notna(), empty)
+    unit_agg = unit_agg[
+        ["numar_elevi", "limba_de_predare", "nivel_invatamant", "numar_formatiuni"]
+    ]
+    s.rows_out = len(unit_agg)
 
 # Merge into network data
-unit_full = network_df.merge(unit_agg, on="cod_siiir_unitate", how="left")
-unit_full.to_csv("../data/aggregated.csv", index=False)
+with instrument.stage("join_network", rows_in=len(network_df)) as s:
+    unit_full = network_df.join(unit_agg, on="cod_siiir_unitate")
+    unit_full.to_csv("../data/aggregated.csv", index=False)
+    s.rows_out = len(unit_full)
 
 # Filter out rows with 0 or missing subunits
-filtered = unit_full[unit_full["numar_formatiuni"].fillna(0) > 0].copy()
-grouped = filtered.groupby("Judet PJ")
-
+filtered = unit_full[unit_full["numar_formatiuni"].fillna(0) > 0]
 
-# Define a custom function to handle NaN values
-def nan_to_null(obj):
-    if isinstance(obj, float) and pd.isna(obj):
-        return None
-    return obj
+with instrument.stage("write_json", rows_in=len(filtered)):
+    # NaN → None for the whole frame at once, so json.dump writes null
+    records = filtered.drop(columns=["Judet PJ"])
+    records = records.astype(object).where(records.notna(), None)
 
+    county_data = {
+        judet: group.to_dict(orient="records")
+        for judet, group in records.groupby(filtered["Judet PJ"])
+    }
 
-county_data = {}
-for judet, group in grouped:
-    records = group.drop(columns=["Judet PJ"]).to_dict(orient="records")
-    for record in records:
-        for key, value in record.items():
-            record[key] = nan_to_null(value)
-    county_data[judet] = records
-
-# Save
-pj_json_path = "../data/schools_by_county.json"
-with open(pj_json_path, "w", encoding="utf-8") as f:
-    json.dump(county_data, f, ensure_ascii=False, indent=None)
+    # Save
+    pj_json_path = "../data/schools_by_county.json"
+    with open(pj_json_path, "w", encoding="utf-8") as f:
+        json.dump(county_data, f, ensure_ascii=False, indent=None)
 
 """
 conflicting_mediu = (
@@ -0,0 +1,112 @@
+"""
+Text normalization shared by the scripts (diacritics, place names, languages).
+
+School, town and language columns repeat a few thousand distinct values over
+hundreds of thousands of rows, so the column helpers normalize each distinct
+value once and map the result back onto the column.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Cedilla forms (and the odd š) → the comma-below forms used in Romanian
+DIACRITICS_TABLE = str.maketrans(
+    {
+        "ş": "ș",
+        "Ş": "Ș",
+        "ţ": "ț",
+        "Ţ": "Ț",
+        "š": "ș",
+    }
+)
+
+PREPOSITIONS = ["De", "La", "Din", "Lui", "Pe", "Cu", "În", "Sub", "Cel"]
+
+# Prepositions are lowercased unless they start the name, follow " (" or
+# follow a hyphen, e.g. "Valea De Sus" → "Valea de Sus", but "De Jos" stays.
+PREPOSITIONS_RE = re.compile(
+    r"(?<!\A)(?<!\s\()(?<!\-)(?:" + "|".join(PREPOSITIONS) + r")\b"
+)
+
+# Only the title-cased forms can match, since the prefixes are stripped after
+# str.title(); the census sheets use "Municipiul X" and "Oraș X".
+PLACE_PREFIXES = ["Oraș ", "Municipiul "]
+
+WORD_INITIAL_A_RE = re.compile(r"\b[Ââ]")
+HYPHEN_SPACES_RE = re.compile(r"\s*-\s*")
+
+
+def normalize_diacritics(text):
+    if not isinstance(text, str):
+        return text
+    return text.translate(DIACRITICS_TABLE)
+
+
+def _lower_preposition(match):
+    return match.group().lower()
+
+
+@lru_cache(maxsize=None)
+def _normalize_names(text):
+    text = text.translate(DIACRITICS_TABLE).title().strip()
+    return PREPOSITIONS_RE.sub(_lower_preposition, text)
+
+
+def normalize_names(text):
+    """Fix diacritics and title-case a SIIIR name, keeping prepositions lowercase."""
+    if not isinstance(text, str):
+        return text
+    return _normalize_names(text)
+
+
+@lru_cache(maxsize=None)
+def _normalize_place_names(text):
+    text = text.translate(DIACRITICS_TABLE).title().strip()
+
+    for prefix in PLACE_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix) :]
+
+    # Word-initial Â/â is written Î/î in Romanian orthography
+    text = WORD_INITIAL_A_RE.sub(lambda m: "Î" if m.group() == "Â" else "î", text)
+    text = HYPHEN_SPACES_RE.sub("-", text)
+    return PREPOSITIONS_RE.sub(_lower_preposition, text)
+
+
+def normalize_place_names(text):
+    """
+    normalize_names for census locality names: also drops the "Municipiul" /
+    "Oraș" prefix, fixes word-initial Â and removes spaces around hyphens.
+    """
+    if not isinstance(text, str):
+        return text
+    return _normalize_place_names(text)
+
+
+@lru_cache(maxsize=None)
+def strip_diacritics(text):
+    return "".join(
+        c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
+    )
+
+
+def simplify_limba(lang):
+    """Drop the "Limba " prefix: "Limba maghiară" → "maghiară"."""
+    if isinstance(lang, str) and lang.startswith("Limba "):
+        return lang.replace("Limba ", "").lower()
+    return lang
+
+
+def normalize_column(series, func):
+    """Apply func to every distinct value of series and map the results back."""
+    uniques = series.dropna().unique()
+    return series.map(dict(zip(uniques, map(func, uniques))))
+
+
+def normalize_columns(df, func, exclude=()):
+    """Apply func to all string columns of df (in place), except `exclude`."""
+    for col in df.select_dtypes(include=["object"]).columns:
+        if col not in exclude:
+            df[col] = normalize_column(df[col], func)
+    return df
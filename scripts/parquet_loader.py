@@ -0,0 +1,195 @@
+"""
+Parquet counterpart of pg_loader.py, for building the tables without a
+PostgreSQL server (the --no-db mode of the stage scripts).
+
+load_batches collects the batches in an in-process DuckDB table, checks the
+primary key (no NULL or duplicate keys) and the foreign keys (an anti-join
+against the referenced table's Parquet file) as PostgreSQL would, and
+writes ../data/<table>.parquet, the same file to_duckdb.py exports from
+PostgreSQL. The DuckDB database is a temporary file next to the output, so
+a year larger than memory spills to disk, and the sorted rows are streamed
+to the Parquet file. The file layout (clustering sort, row groups,
+compression) is defined here and shared with to_duckdb.py.
+"""
+
+import os
+import re
+import tempfile
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrument import stage
+
+DATA_DIR = "../data"
+
+# Small enough that a county's schools span a few row groups, large enough
+# that the footer and the per-group overhead stay small
+ROW_GROUP_SIZE = 16_384
+COMPRESSION_LEVEL = 9
+# Rows fetched from DuckDB at a time when streaming; a multiple of the row
+# group size, so every row group but the last is full
+STREAM_BATCH_ROWS = 64 * ROW_GROUP_SIZE
+
+# School ids are numbered in SIIIR code order, and the codes start with the
+# county id, so sorting on the id mostly clusters the rows by county too
+CLUSTER_KEYS = {
+    "school_info": ["judet", "id"],
+    "student_stats": ["school_id"],
+    "school_code_lineage": ["old_code"],
+    "siruta_uat": ["siruta"],
+}
+CLUSTER_KEY_PREFIXES = {
+    "bac_": ["county_id", "school_id"],
+    "en_": ["county_id", "school_id"],
+}
+
+REFERENCE_RE = re.compile(r"^(\w+)\((\w+)\)$")
+
+
+def cluster_key(table):
+    if table in CLUSTER_KEYS:
+        return CLUSTER_KEYS[table]
+    for prefix, key in CLUSTER_KEY_PREFIXES.items():
+        if table.startswith(prefix):
+            return key
+    return []
+
+
+def write_parquet(data, path):
+    """
+    Write an Arrow table, or the batches of a RecordBatchReader, with the
+    export settings, atomically. Returns the number of row groups.
+    """
+    strings = [
+        field.name
+        for field in data.schema
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+    ]
+    tmp_path = path + ".tmp"
+    with pq.ParquetWriter(
+        tmp_path,
+        data.schema,
+        compression="zstd",
+        compression_level=COMPRESSION_LEVEL,
+        use_dictionary=strings,
+        write_statistics=True,
+    ) as writer:
+        if isinstance(data, pa.Table):
+            writer.write_table(data, row_group_size=ROW_GROUP_SIZE)
+        else:
+            for batch in data:
+                writer.write_batch(batch, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+    return pq.ParquetFile(path).metadata.num_row_groups
+
+
+def to_arrow(df, schema=None):
+    """A DataFrame as an Arrow table, with a fixed schema if one is given."""
+    if schema is None:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    df = df[schema.names].copy()
+    for field in schema:
+        # Mixed object columns (codes read as numbers in some batches) become
+        # text; categoricals are converted by Arrow as they are
+        if pa.types.is_string(field.type) and df[field.name].dtype == object:
+            col = df[field.name]
+            df[field.name] = col.where(col.isna(), col.astype(str))
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def check_primary_key(con, table, primary_key):
+    keys = [primary_key] if isinstance(primary_key, str) else primary_key
+    columns = ", ".join(keys)
+    nulls = con.execute(
+        "SELECT COUNT(*) FROM loaded WHERE " + " OR ".join(f"{k} IS NULL" for k in keys)
+    ).fetchone()[0]
+    duplicates = con.execute(
+        f"SELECT {columns} FROM loaded GROUP BY ALL HAVING COUNT(*) > 1"
+    ).fetchall()
+    if nulls or duplicates:
+        raise ValueError(
+            f"[{table}] primary key ({columns}): {nulls} NULL keys,"
+            f" {len(duplicates)} duplicated keys, e.g. {duplicates[:5]}"
+        )
+
+
+def check_foreign_key(con, table, column, reference, out_dir):
+    """Every non-NULL value of column must be in the referenced Parquet table."""
+    ref_table, ref_column = REFERENCE_RE.match(reference).groups()
+    ref_path = os.path.join(out_dir, f"{ref_table}.parquet")
+    missing = con.execute(
+        f"""
+        SELECT DISTINCT r.{column}
+        FROM loaded r
+        ANTI JOIN read_parquet('{ref_path}') ref ON r.{column} = ref.{ref_column}
+        WHERE r.{column} IS NOT NULL
+        ORDER BY 1
+    """
+    ).fetchall()
+    if missing:
+        raise ValueError(
+            f"[{table}] {len(missing)} values of {column} are not in {reference}: "
+            + ", ".join(str(value) for (value,) in missing[:20])
+        )
+
+
+def load_table(df, table, **kwargs):
+    """Write df as `table`; see load_batches for the options."""
+    load_batches([df], table, **kwargs)
+
+
+def load_batches(
+    batches, table, schema=None, primary_key=None, foreign_keys=None, out_dir=DATA_DIR
+):
+    """
+    Replace ../data/<table>.parquet with the rows of an iterable of
+    DataFrames. The columns come from schema (a pyarrow schema) or else from
+    the first batch. primary_key and foreign_keys take the same values as in
+    pg_loader.load_batches; the referenced tables are read from their
+    Parquet files in out_dir. Nothing is written when a check fails.
+    """
+    # The database and DuckDB's spill files go next to the output rather
+    # than in the system temp directory, which can be a RAM disk
+    with stage(f"load_{table}") as s, tempfile.TemporaryDirectory(
+        prefix=f".{table}-", dir=out_dir
+    ) as tmp_dir:
+        con = duckdb.connect(os.path.join(tmp_dir, f"{table}.duckdb"))
+        con.execute(f"SET temp_directory = '{tmp_dir}'")
+        columns = schema.names if schema is not None else None
+        created = False
+        for df in s.count_in(batches):
+            if columns is None:
+                columns = list(df.columns)
+            batch = to_arrow(df[columns], schema)
+            if created:
+                con.execute("INSERT INTO loaded SELECT * FROM batch")
+            else:
+                con.execute("CREATE TABLE loaded AS SELECT * FROM batch")
+                created = True
+        if not created:
+            if schema is None:
+                raise ValueError(f"[{table}] no rows and no schema to write")
+            batch = schema.empty_table()
+            con.execute("CREATE TABLE loaded AS SELECT * FROM batch")
+
+        with stage("check_keys"):
+            if primary_key:
+                check_primary_key(con, table, primary_key)
+            for column, reference in (foreign_keys or {}).items():
+                check_foreign_key(con, table, column, reference, out_dir)
+
+        with stage("write_parquet") as w:
+            query = "SELECT * FROM loaded"
+            key = cluster_key(table)
+            if key:
+                query += " ORDER BY " + ", ".join(f"{col} NULLS LAST" for col in key)
+            reader = con.execute(query).to_arrow_reader(STREAM_BATCH_ROWS)
+            path = os.path.join(out_dir, f"{table}.parquet")
+            write_parquet(reader, path)
+            con.close()
+
+            rows = pq.ParquetFile(path).metadata.num_rows
+            w.rows_in = w.rows_out = s.rows_out = rows
+    print(f"Wrote {rows} rows to {path}")
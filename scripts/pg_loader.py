@@ -0,0 +1,199 @@
+"""
+Bulk loader for the PostgreSQL tables built by the create_*_db.py scripts.
+
+Instead of to_sql into a *_raw table followed by CREATE TABLE AS, ALTER TABLE
+and DROP, the final table is created with its columns, primary key and foreign
+keys declared up front and the DataFrame is streamed into it with
+COPY ... FROM STDIN in CSV chunks.
+
+With staging=True (the default) the rows go into <table>_staging, which is
+then swapped in with a rename in the same transaction, so readers never see
+a half-loaded table. Because the table is created in the loading transaction,
+PostgreSQL can also skip WAL for the COPY when wal_level is minimal.
+"""
+
+from itertools import chain
+
+import pandas as pd
+from sqlalchemy import text
+
+from instrument import stage
+
+NULL = r"\N"
+
+
+def sql_type(dtype):
+    """The column type to_sql would have picked for a pandas dtype."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        if dtype.itemsize <= 2:
+            return "SMALLINT"
+        return "INTEGER" if dtype.itemsize == 4 else "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL" if dtype == "float32" else "DOUBLE PRECISION"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def iter_chunks(frames, chunk_rows):
+    for df in frames:
+        for offset in range(0, len(df), chunk_rows):
+            yield df.iloc[offset : offset + chunk_rows]
+
+
+class CsvStream:
+    """File-like object that renders DataFrames to CSV lazily, chunk by chunk."""
+
+    def __init__(self, frames, chunk_rows=50_000):
+        self.chunks = iter_chunks(frames, chunk_rows)
+        self.chunk = b""
+        self.pos = 0
+        self.rows = 0
+
+    def _next_chunk(self):
+        rows = next(self.chunks, None)
+        if rows is None:
+            return False
+        self.rows += len(rows)
+        self.chunk = rows.to_csv(index=False, header=False, na_rep=NULL).encode("utf-8")
+        self.pos = 0
+        return True
+
+    def read(self, size=-1):
+        while self.pos >= len(self.chunk):
+            if not self._next_chunk():
+                return b""
+        end = len(self.chunk) if size < 0 else self.pos + size
+        data = self.chunk[self.pos : end]
+        self.pos += len(data)
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def create_table_sql(table, df, column_types=None, primary_key=None, foreign_keys=None):
+    column_types = column_types or {}
+    definitions = [
+        f"{quote(col)} {column_types.get(col) or sql_type(df[col].dtype)}"
+        for col in df.columns
+    ]
+    if primary_key:
+        keys = [primary_key] if isinstance(primary_key, str) else primary_key
+        definitions.append(
+            f"CONSTRAINT {quote(table + '_pkey')} "
+            f"PRIMARY KEY ({', '.join(quote(k) for k in keys)})"
+        )
+    for col, reference in (foreign_keys or {}).items():
+        definitions.append(
+            f"CONSTRAINT {quote('fk_' + table + '_' + col)} "
+            f"FOREIGN KEY ({quote(col)}) REFERENCES {reference}"
+        )
+    return f"CREATE TABLE {quote(table)} (\n    " + ",\n    ".join(definitions) + "\n)"
+
+
+def copy_into(conn, table, columns, frames, chunk_rows=50_000):
+    """
+    Stream DataFrames into an existing table with COPY FROM STDIN (psycopg2).
+    Returns the number of rows copied.
+    """
+    stream = CsvStream(frames, chunk_rows)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {quote(table)} ({', '.join(quote(col) for col in columns)}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '{NULL}')",
+            stream,
+            size=1 << 20,
+        )
+    finally:
+        cursor.close()
+    return stream.rows
+
+
+def load_table(engine, df, table, **kwargs):
+    """Replace `table` with the rows of df; see load_batches for the options."""
+    load_batches(engine, [df], table, **kwargs)
+
+
+def load_batches(
+    engine,
+    batches,
+    table,
+    column_types=None,
+    primary_key=None,
+    foreign_keys=None,
+    staging=True,
+    chunk_rows=50_000,
+):
+    """
+    Replace `table` with the rows of an iterable of DataFrames, which is
+    consumed lazily so only one batch is in memory at a time. The column
+    names and (unless given in column_types) the SQL types come from the
+    first batch, so later batches must have the same columns. Without any
+    batch, the table is created empty with the columns of column_types.
+
+    column_types overrides the SQL type per column, primary_key is a column
+    name or list of names, and foreign_keys maps a column to its reference,
+    e.g. {"school_id": "school_info(id)"}. The old table is dropped with
+    CASCADE, so foreign keys pointing at it from other tables go away until
+    those tables are reloaded (the pipeline reruns them after school_info).
+    """
+    target = f"{table}_staging" if staging else table
+    with stage(f"load_{table}") as s:
+        batches = iter(s.count_in(batches))
+        first = next(batches, None)
+        if first is None:
+            # e.g. every row filtered out: an empty table, if its columns are known
+            if not column_types:
+                raise ValueError(f"[{table}] no rows and no column types to create")
+            first = pd.DataFrame(columns=list(column_types))
+
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {quote(target)} CASCADE"))
+            conn.execute(
+                text(
+                    create_table_sql(
+                        target, first, column_types, primary_key, foreign_keys
+                    )
+                )
+            )
+            columns = list(first.columns)
+            frames = chain([first], (batch[columns] for batch in batches))
+            # The keys are checked row by row during the COPY
+            with stage("copy") as c:
+                rows = c.rows_out = s.rows_out = copy_into(
+                    conn, target, columns, frames, chunk_rows
+                )
+
+            if staging:
+                with stage("swap"):
+                    conn.execute(text(f"DROP TABLE IF EXISTS {quote(table)} CASCADE"))
+                    conn.execute(
+                        text(f"ALTER TABLE {quote(target)} RENAME TO {quote(table)}")
+                    )
+                    # Constraint names were derived from the staging name; the
+                    # primary key index name has to be free for the next load.
+                    if primary_key:
+                        conn.execute(
+                            text(
+                                f"ALTER TABLE {quote(table)} RENAME CONSTRAINT "
+                                f"{quote(target + '_pkey')} TO {quote(table + '_pkey')}"
+                            )
+                        )
+                    for col in foreign_keys or {}:
+                        conn.execute(
+                            text(
+                                f"ALTER TABLE {quote(table)} RENAME CONSTRAINT "
+                                f"{quote('fk_' + target + '_' + col)} "
+                                f"TO {quote('fk_' + table + '_' + col)}"
+                            )
+                        )
+
+    print(f"Loaded {rows} rows into {table}")
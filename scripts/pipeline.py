@@ -0,0 +1,304 @@
+"""
+Incremental runner for the data scripts in this directory.
+
+Each stage is one of the existing scripts, run in its own interpreter with
+scripts/ as the working directory (the scripts use ../data relative paths).
+A stage is rebuilt only when its fingerprint changed: the content hash of its
+input files, of its own source, and the fingerprints of the stages it depends
+on. Independent stages run in parallel.
+
+Usage (from anywhere):
+    python scripts/pipeline.py              # rebuild what is out of date
+    python scripts/pipeline.py bac en       # only these stages (+ their deps)
+    python scripts/pipeline.py --force bac  # rebuild even if unchanged
+    python scripts/pipeline.py --dry-run    # show what would run
+    python scripts/pipeline.py --no-db      # build the Parquet tables directly,
+                                            # without a PostgreSQL server
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = "../data"
+STATE_PATH = os.path.join(DATA_DIR, ".pipeline_state.json")
+
+# Helper modules imported by the stage scripts; editing one reruns every stage.
+SHARED_SOURCES = [
+    "excel_cache.py",
+    "exam_dataset.py",
+    "exam_schema.py",
+    "instrument.py",
+    "normalize.py",
+    "parquet_loader.py",
+    "pg_loader.py",
+    "place_index.py",
+    "place_matcher.py",
+    "pmtiles.py",
+    "school_code_lineage.csv",
+    "school_codes.py",
+    "uat_index.py",
+]
+
+# Paths are relative to scripts/. "deps" must finish before a stage starts:
+# school_info carries the PK that en_2024, bac_2024 and student_stats
+# reference, and it also writes the CSV read by join_network_with_students.
+# With --no-db, the "no_db" stages get --no-db and write their tables to
+# ../data/<table>.parquet themselves, and the "db_only" stages are skipped.
+STAGES = {
+    "school_info": {
+        "script": "validate_school_county_town.py",
+        "inputs": [
+            "../data/retea-scolara-2024-2025.xlsx",
+            "../data/ro_localitati_punct.geojson",
+            "../data/adm2",
+        ],
+        "deps": [],
+        "no_db": True,
+    },
+    "students": {
+        "script": "create_students_db.py",
+        "inputs": ["../data/elevi-inmatriculati-2024-2025.xlsx"],
+        "deps": ["school_info"],
+        "no_db": True,
+    },
+    "en": {
+        "script": "create_en_db.py",
+        "inputs": ["../data/2024.09.30_evnat_2024_date-deschise.xlsx"],
+        "deps": ["school_info"],
+        "no_db": True,
+    },
+    "bac": {
+        "script": "create_bac_db.py",
+        "inputs": ["../data/2024.09.30_bac_date-deschise_2024-ses1.xlsx"],
+        "deps": ["school_info"],
+        "no_db": True,
+    },
+    "bac_json": {
+        "script": "process_bac.py",
+        "inputs": ["../data/2024.09.30_bac_date-deschise_2024-ses1.xlsx"],
+        "deps": [],
+    },
+    "schools_by_county": {
+        "script": "join_network_with_students.py",
+        "inputs": ["../data/elevi-inmatriculati-2024-2025.xlsx"],
+        "deps": ["school_info"],
+    },
+    "demographics": {
+        "script": "process_adm2_demographic_data.py",
+        "inputs": [
+            "../data/Tabel-2.02.1-si-Tabel-2.02.2.xlsx",
+            "../data/Tabel-1.03_1.3.1-si-1.03.2.xls",
+            "../data/Tabel-2.12.1-si-Tabel-2.12.2.xlsx",
+            "../data/adm2",
+        ],
+        "deps": [],
+    },
+    "tiles": {
+        "script": "build_vector_tiles.py",
+        "inputs": ["../data/ro_judete_poligon_simplified.json", "../data/adm2"],
+        "deps": ["school_info"],
+    },
+    "export": {
+        "script": "to_duckdb.py",
+        "inputs": [],
+        "deps": ["school_info", "students", "en", "bac"],
+        "db_only": True,
+    },
+    "cubes": {
+        "script": "build_exam_cubes.py",
+        "inputs": [],
+        "deps": ["export"],
+    },
+}
+
+
+def hash_path(path, digest):
+    """Feed the content of a file, or of every file under a directory, into digest."""
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+                hash_path(file_path, digest)
+        return
+
+    if not os.path.exists(path):
+        # A missing input still gets a stable fingerprint, so the stage runs
+        # (and fails loudly) instead of being silently skipped.
+        digest.update(b"<missing>")
+        return
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+
+def compute_fingerprints(stages, no_db=False):
+    """
+    Fingerprint every stage from its script, inputs and upstream fingerprints,
+    and from the mode for the stages that write PostgreSQL or Parquet.
+    """
+    fingerprints = {}
+
+    def visit(name):
+        if name in fingerprints:
+            return fingerprints[name]
+        stage = stages[name]
+        digest = hashlib.sha256()
+        for path in [stage["script"]] + SHARED_SOURCES:
+            hash_path(path, digest)
+        for path in stage["inputs"]:
+            digest.update(path.encode("utf-8"))
+            hash_path(path, digest)
+        if no_db and stage.get("no_db"):
+            digest.update(b"--no-db")
+        for dep in stage["deps"]:
+            digest.update(visit(dep).encode("utf-8"))
+        fingerprints[name] = digest.hexdigest()
+        return fingerprints[name]
+
+    for name in stages:
+        visit(name)
+    return fingerprints
+
+
+def with_dependencies(stages, selected):
+    """Return the selected stage names plus everything they depend on."""
+    needed = set()
+    stack = list(selected)
+    while stack:
+        name = stack.pop()
+        if name not in stages:
+            raise ValueError(f"Unknown stage: {name}")
+        if name not in needed:
+            needed.add(name)
+            stack.extend(stages[name]["deps"])
+    return needed
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_stage(name, stage, no_db=False):
+    command = [sys.executable, stage["script"]]
+    if no_db and stage.get("no_db"):
+        command.append("--no-db")
+    print(f"[{name}] running {' '.join(command[1:])}")
+    completed = subprocess.run(command, cwd=SCRIPTS_DIR)
+    return completed.returncode
+
+
+def run_pipeline(selected=None, force=False, jobs=None, dry_run=False, no_db=False):
+    """
+    Run the stages in dependency order, skipping those whose fingerprint matches
+    the last successful run. Returns the set of stages that failed.
+    """
+    stages = STAGES
+    needed = with_dependencies(stages, selected or stages)
+    fingerprints = compute_fingerprints(stages, no_db)
+    state = load_state()
+
+    # Their output is already written by the --no-db stages
+    not_needed = {n for n in needed if no_db and stages[n].get("db_only")}
+    for name in sorted(not_needed):
+        print(f"[{name}] not needed with --no-db, skipping")
+    needed -= not_needed
+
+    stale = {
+        name
+        for name in needed
+        if (force and (not selected or name in selected))
+        or state.get(name) != fingerprints[name]
+    }
+    for name in sorted(needed - stale):
+        print(f"[{name}] up to date, skipping")
+
+    if dry_run:
+        for name in sorted(stale):
+            print(f"[{name}] would run {stages[name]['script']}")
+        return set()
+
+    done = needed - stale
+    failed = set()
+    # The skipped stages go through the queue too, so the stages after them
+    # still wait for what they depend on (cubes reads the Parquet of the
+    # stages export depends on)
+    pending = stale | not_needed
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        while pending or running:
+            # Drop stages whose upstream failed; they would hit missing tables.
+            for name in sorted(pending):
+                if any(dep in failed for dep in stages[name]["deps"]):
+                    print(f"[{name}] skipped, a dependency failed")
+                    pending.discard(name)
+                    failed.add(name)
+
+            ready = [
+                name
+                for name in sorted(pending)
+                if all(dep in done for dep in stages[name]["deps"])
+            ]
+            for name in ready:
+                pending.discard(name)
+                if name in not_needed:
+                    done.add(name)
+                else:
+                    running[pool.submit(run_stage, name, stages[name], no_db)] = name
+            if not_needed.intersection(ready):
+                continue  # the stages after a skipped one may be ready now
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.result() == 0:
+                    done.add(name)
+                    state[name] = fingerprints[name]
+                    save_state(state)
+                    print(f"[{name}] done")
+                else:
+                    failed.add(name)
+                    print(f"[{name}] failed with exit code {future.result()}")
+
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the data artifacts.")
+    parser.add_argument("stages", nargs="*", help=f"any of: {', '.join(STAGES)}")
+    parser.add_argument("--force", action="store_true", help="ignore fingerprints")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel stages")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--no-db",
+        action="store_true",
+        help="write the tables straight to Parquet, without PostgreSQL",
+    )
+    args = parser.parse_args()
+
+    os.chdir(SCRIPTS_DIR)
+    failed = run_pipeline(args.stages, args.force, args.jobs, args.dry_run, args.no_db)
+    sys.exit(1 if failed else 0)
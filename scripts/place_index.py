@@ -0,0 +1,124 @@
+"""
+Lookup tables for placing SIIIR towns in ADM2 units, built in one pass.
+
+- town_mappings: (countyMn, locality name) → nameSup, the commune or city the
+  locality belongs to, from ro_localitati_punct
+- place_names: countyMn → set of ADM2 (UAT) names, from the per-county files
+- town_uats: (countyMn, locality name) → UAT containing the locality's point
+  (see uat_index.py)
+- siruta_uats: SIRUTA code (natcode) of a locality → natcode of its UAT
+- uat_sirutas: (countyMn, UAT name) → natcode of the UAT
+
+Building them means parsing the national localitati file and every ADM2
+file and running the point-in-polygon pass, so the index is stored as JSON
+under ../data/.cache/places, keyed by the content hash of those files, and
+only rebuilt when one of them changes.
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+from excel_cache import file_digest
+from uat_index import ADM2_DIR, UatIndex, locality_uats, siruta_uats
+
+LOCALITATI_PATH = "../data/ro_localitati_punct.geojson"
+CACHE_DIR = "../data/.cache/places"
+# Bump when the content or layout of the index changes
+INDEX_VERSION = 2
+
+
+class PlaceIndex:
+    def __init__(self, town_mappings, place_names, town_uats, siruta_uats, uat_sirutas):
+        self.town_mappings = town_mappings
+        self.place_names = place_names
+        self.town_uats = town_uats
+        self.siruta_uats = siruta_uats
+        self.uat_sirutas = uat_sirutas
+
+    @classmethod
+    def build(cls, localitati_path=LOCALITATI_PATH, adm2_dir=ADM2_DIR):
+        with open(localitati_path, "r", encoding="utf-8") as f:
+            localitati = json.load(f)
+
+        town_mappings = {}
+        for feature in localitati["features"]:
+            props = feature.get("properties", {})
+            name, name_sup = props.get("name"), props.get("nameSup")
+            if name and name_sup:
+                town_mappings[(props.get("countyMn"), name)] = name_sup
+
+        uats = []
+        place_names = {}
+        for path in _adm2_paths(adm2_dir):
+            county = os.path.splitext(os.path.basename(path))[0]
+            with open(path, "r", encoding="utf-8") as f:
+                features = json.load(f)["features"]
+            uats += features
+            place_names[county] = {
+                f["properties"]["name"]
+                for f in features
+                if f.get("properties", {}).get("name")
+            }
+
+        index = UatIndex(uats)
+        uat_sirutas = dict(
+            zip(
+                zip(index.counties.tolist(), index.names.tolist()),
+                index.natcodes.tolist(),
+            )
+        )
+        town_uats = locality_uats(localitati, index)
+        parents = siruta_uats(localitati, index)
+        return cls(town_mappings, place_names, town_uats, parents, uat_sirutas)
+
+    def to_json(self):
+        return {
+            "town_mappings": [
+                [*key, value] for key, value in self.town_mappings.items()
+            ],
+            "place_names": {c: sorted(names) for c, names in self.place_names.items()},
+            "town_uats": [[*key, value] for key, value in self.town_uats.items()],
+            "siruta_uats": [[code, uat] for code, uat in self.siruta_uats.items()],
+            "uat_sirutas": [[*key, value] for key, value in self.uat_sirutas.items()],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            {(c, name): sup for c, name, sup in data["town_mappings"]},
+            {c: set(names) for c, names in data["place_names"].items()},
+            {(c, name): uat for c, name, uat in data["town_uats"]},
+            {siruta: uat for siruta, uat in data["siruta_uats"]},
+            {(c, name): siruta for c, name, siruta in data["uat_sirutas"]},
+        )
+
+
+def _adm2_paths(adm2_dir):
+    return sorted(glob.glob(os.path.join(adm2_dir, "*.geojson")))
+
+
+def index_key(localitati_path, adm2_dir):
+    digest = hashlib.sha256(f"v{INDEX_VERSION}|".encode("utf-8"))
+    digest.update(file_digest(localitati_path).encode("utf-8"))
+    for path in _adm2_paths(adm2_dir):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        digest.update(file_digest(path).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_place_index(localitati_path=LOCALITATI_PATH, adm2_dir=ADM2_DIR):
+    """The PlaceIndex for these files, from the cache when it is up to date."""
+    cache_path = os.path.join(CACHE_DIR, index_key(localitati_path, adm2_dir) + ".json")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return PlaceIndex.from_json(json.load(f))
+
+    index = PlaceIndex.build(localitati_path, adm2_dir)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_json(), f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return index
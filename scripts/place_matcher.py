@@ -0,0 +1,108 @@
+"""
+Fuzzy matching of place names against the canonical ADM2 (UAT) names.
+
+Census and SIIIR names differ from the ADM2 layer mostly in spelling:
+missing or cedilla diacritics, î/â ("Pîrșcoveni" / "Pârșcoveni"), hyphens
+and dropped letters ("Neajlov" / "Neajlovu"). Names are compared on a key
+with diacritics, case and punctuation folded away; a key that matches
+exactly is a match with score 1. Otherwise the candidates are the names
+sharing the most character trigrams with the key (from a per-county
+inverted index), scored with difflib's ratio on the keys.
+
+A fuzzy match is only accepted when it scores at least `threshold` and
+beats the runner-up by `margin`, so a name halfway between two UATs is
+left unmatched rather than guessed.
+"""
+
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from normalize import strip_diacritics
+
+NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+def name_key(name):
+    """Diacritic-, case- and punctuation-insensitive form of a place name."""
+    # î and â are the same letter in Romanian spelling
+    name = name.lower().replace("î", "â")
+    return NON_ALNUM_RE.sub(" ", strip_diacritics(name)).strip()
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaceMatcher:
+    def __init__(self, place_names, threshold=0.8, margin=0.1):
+        """place_names: {county: iterable of canonical names}."""
+        self.threshold = threshold
+        self.margin = margin
+        self.names = {}
+        self.exact = {}
+        self.postings = {}
+        for county, names in place_names.items():
+            names = sorted(names)
+            keys = [name_key(n) for n in names]
+            exact = defaultdict(set)
+            postings = defaultdict(list)
+            for i, (name, key) in enumerate(zip(names, keys)):
+                exact[key].add(name)
+                for gram in trigrams(key):
+                    postings[gram].append(i)
+            self.names[county] = list(zip(names, keys))
+            # a key shared by two different UATs is not an exact match
+            self.exact[county] = {
+                k: next(iter(v)) for k, v in exact.items() if len(v) == 1
+            }
+            self.postings[county] = postings
+
+    def candidates(self, county, name, limit=3):
+        """The best `limit` (canonical name, score) pairs for name in county."""
+        key = name_key(name)
+        if key in self.exact.get(county, {}):
+            return [(self.exact[county][key], 1.0)]
+
+        postings = self.postings.get(county)
+        if not postings:
+            return []
+        shared = Counter()
+        for gram in trigrams(key):
+            shared.update(postings.get(gram, ()))
+
+        scored = []
+        for i, _ in shared.most_common(limit * 5):
+            canonical, canonical_key = self.names[county][i]
+            scored.append(
+                (canonical, SequenceMatcher(None, key, canonical_key).ratio())
+            )
+        scored.sort(key=lambda c: (-c[1], c[0]))
+        return scored[:limit]
+
+    def match(self, county, name):
+        """(canonical name, score), or (None, best score) when not confident."""
+        scored = self.candidates(county, name, limit=2)
+        if not scored:
+            return None, 0.0
+        best, score = scored[0]
+        runner_up = scored[1][1] if len(scored) > 1 else 0.0
+        if score == 1.0 or (
+            score >= self.threshold and score - runner_up >= self.margin
+        ):
+            return best, score
+        return None, score
+
+    def match_many(self, counties, names):
+        """
+        Match parallel arrays of counties and names, each distinct pair once.
+        Returns a DataFrame with the county, name, match (or None) and score.
+        """
+        pairs = pd.DataFrame({"county": counties, "name": names}).drop_duplicates()
+        results = [self.match(c, n) for c, n in zip(pairs["county"], pairs["name"])]
+        pairs["match"] = [m for m, _ in results]
+        pairs["score"] = [s for _, s in results]
+        return pairs.reset_index(drop=True)
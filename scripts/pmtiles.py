@@ -0,0 +1,175 @@
+"""
+Writer for PMTiles v3 archives: every tile of a pyramid in one static file
+that a map client reads with HTTP range requests.
+
+Layout: 127-byte header, root directory, JSON metadata, leaf directories,
+tile data. Tiles are addressed by their position on a Hilbert curve
+(zxy_to_tileid), identical tiles (e.g. empty land inside a county) are
+stored once, and directories are gzip-compressed. Only what build_vector_tiles
+needs is implemented: gzip-compressed MVT tiles, written in one go.
+
+Spec: https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import struct
+
+HEADER_SIZE = 127
+# The header and the root directory must fit in the first 16 KiB
+ROOT_SIZE_LIMIT = 16_384 - HEADER_SIZE
+
+COMPRESSION_GZIP = 2
+TILE_TYPE_MVT = 1
+
+
+def zxy_to_tileid(z, x, y):
+    """Tiles of lower zooms first, then the Hilbert index within zoom z."""
+    tile_id = ((1 << (2 * z)) - 1) // 3
+    n = 1 << z
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        tile_id += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x, y = n - 1 - x, n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return tile_id
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return out
+
+
+def serialize_directory(entries):
+    """entries: sorted (tile_id, offset, length, run_length) tuples."""
+    out = bytearray(_varint(len(entries)))
+    last_id = 0
+    for tile_id, _, _, _ in entries:
+        out += _varint(tile_id - last_id)
+        last_id = tile_id
+    for entry in entries:
+        out += _varint(entry[3])
+    for entry in entries:
+        out += _varint(entry[2])
+    for i, (_, offset, _, _) in enumerate(entries):
+        previous = entries[i - 1] if i else None
+        if previous and offset == previous[1] + previous[2]:
+            out += _varint(0)
+        else:
+            out += _varint(offset + 1)
+    return gzip.compress(bytes(out), mtime=0)
+
+
+def build_directories(entries):
+    """
+    The root directory, and the leaf directories it points to when all the
+    entries don't fit in the root (run_length 0 marks a leaf pointer).
+    """
+    root = serialize_directory(entries)
+    if len(root) <= ROOT_SIZE_LIMIT:
+        return root, b""
+
+    leaf_size = 4096
+    while True:
+        leaves = bytearray()
+        root_entries = []
+        for start in range(0, len(entries), leaf_size):
+            chunk = entries[start : start + leaf_size]
+            leaf = serialize_directory(chunk)
+            root_entries.append((chunk[0][0], len(leaves), len(leaf), 0))
+            leaves += leaf
+        root = serialize_directory(root_entries)
+        if len(root) <= ROOT_SIZE_LIMIT:
+            return root, bytes(leaves)
+        leaf_size *= 2
+
+
+def write_pmtiles(path, tiles, metadata, bounds, min_zoom, max_zoom, center_zoom):
+    """
+    Write {(z, x, y): gzip-compressed MVT bytes} to path, atomically.
+    bounds is (min_lon, min_lat, max_lon, max_lat). Returns a summary dict.
+    """
+    by_id = sorted((zxy_to_tileid(z, x, y), data) for (z, x, y), data in tiles.items())
+
+    data = bytearray()
+    offsets = {}
+    entries = []
+    for tile_id, tile in by_id:
+        digest = hashlib.sha256(tile).digest()
+        if digest not in offsets:
+            offsets[digest] = len(data)
+            data += tile
+        offset = offsets[digest]
+        last = entries[-1] if entries else None
+        # consecutive ids with the same content become one run
+        if last and last[1] == offset and last[0] + last[3] == tile_id:
+            entries[-1] = (last[0], last[1], last[2], last[3] + 1)
+        else:
+            entries.append((tile_id, offset, len(tile), 1))
+
+    root, leaves = build_directories(entries)
+    metadata = gzip.compress(
+        json.dumps(metadata, ensure_ascii=False).encode("utf-8"), mtime=0
+    )
+
+    root_offset = HEADER_SIZE
+    metadata_offset = root_offset + len(root)
+    leaves_offset = metadata_offset + len(metadata)
+    data_offset = leaves_offset + len(leaves)
+
+    def e7(degrees):
+        return int(round(degrees * 10_000_000))
+
+    min_lon, min_lat, max_lon, max_lat = bounds
+    header = b"PMTiles" + struct.pack(
+        "<BQQQQQQQQQQQBBBBBBiiiiBii",
+        3,
+        root_offset,
+        len(root),
+        metadata_offset,
+        len(metadata),
+        leaves_offset,
+        len(leaves),
+        data_offset,
+        len(data),
+        len(by_id),
+        len(entries),
+        len(offsets),
+        1,  # clustered: tile data is in tile id order
+        COMPRESSION_GZIP,
+        COMPRESSION_GZIP,
+        TILE_TYPE_MVT,
+        min_zoom,
+        max_zoom,
+        e7(min_lon),
+        e7(min_lat),
+        e7(max_lon),
+        e7(max_lat),
+        center_zoom,
+        e7((min_lon + max_lon) / 2),
+        e7((min_lat + max_lat) / 2),
+    )
+    assert len(header) == HEADER_SIZE
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for part in (header, root, metadata, leaves, data):
+            f.write(part)
+    os.replace(tmp_path, path)
+
+    return {
+        "tiles": len(by_id),
+        "unique_tiles": len(offsets),
+        "bytes": data_offset + len(data),
+    }
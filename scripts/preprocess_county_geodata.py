@@ -1,18 +1,264 @@
+"""
+Split the national UAT polygons into one GeoJSON per county (data/adm2/<CODE>).
+
+Counties are processed in parallel. The coordinates of each county are
+snapped to a fixed number of decimals (5 decimals is about 1 m, well below
+what the map can show at county zoom) and the county is encoded as a
+topology (see topology.py): every border is cut into arcs at the points
+where UATs meet and stored once, and the arcs are simplified with
+Douglas-Peucker. The GeoJSON is decoded from those simplified arcs, so
+neighbouring communes still meet exactly, without the gaps and slivers of
+simplifying each polygon on its own; a UAT whose simplified rings would be
+invalid keeps its arcs unsimplified. A per-county report of features,
+vertices and bytes is printed and written to data/adm2_report.csv.
+
+With --topojson the same topology is also written as data/adm2/<CODE>.topojson,
+and the county layer as data/ro_judete.topojson. With --check, every TopoJSON
+file is also decoded again and checked against its source features before
+the run succeeds.
+
+Usage (from the repository root):
+    python scripts/preprocess_county_geodata.py --tolerance 0.0002 --precision 5
+    python scripts/preprocess_county_geodata.py --topojson --check
+"""
+
+import argparse
+import csv
 import json
+import os
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from shapely import set_precision
+from shapely.geometry import mapping, shape
+from topology import check_round_trip, from_topology, to_topology
+
+
+def count_vertices(coordinates):
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        return 1
+    return sum(count_vertices(c) for c in coordinates)
+
+
+def round_coordinates(coordinates, precision):
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        return [round(coordinates[0], precision), round(coordinates[1], precision)]
+    return [round_coordinates(c, precision) for c in coordinates]
+
+
+def snap_geometry(geometry, precision):
+    """
+    Snap a geometry to the grid through GEOS, which keeps the rings valid
+    where plain rounding does not; the rounding afterwards only trims float
+    noise. A polygon smaller than the grid collapses to an empty geometry,
+    which no arc can represent, so the feature is kept without a geometry.
+    """
+    if geometry is None:
+        return None
+    geom = set_precision(shape(geometry), 10**-precision)
+    if geom.is_empty:
+        return None
+    geometry = mapping(geom)
+    return {
+        "type": geometry["type"],
+        "coordinates": round_coordinates(geometry["coordinates"], precision),
+    }
+
+
+def is_valid_geometry(geometry):
+    return shape(geometry).is_valid
+
+
+def encode(features, object_name, tolerance, precision):
+    """
+    Snap the features to the grid and encode them as a topology whose arcs
+    are simplified by tolerance; returns the snapped features and the topology.
+    """
+    snapped = {
+        "type": "FeatureCollection",
+        "features": [
+            {**f, "geometry": snap_geometry(f["geometry"], precision)} for f in features
+        ],
+    }
+    topology = to_topology(
+        snapped, object_name, precision, tolerance, is_valid=is_valid_geometry
+    )
+    return snapped, topology
+
+
+def write_topojson(snapped, topology, path, object_name, check=False):
+    """Write the topology as TopoJSON (checked against snapped if check)."""
+    if check:
+        check_round_trip(snapped, topology, object_name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(topology, f, ensure_ascii=False, separators=(",", ":"))
+    return os.path.getsize(path)
+
+
+def write_county(
+    county_code,
+    features,
+    output_dir,
+    tolerance,
+    precision,
+    topojson=False,
+    check=False,
+):
+    vertices_in = sum(
+        count_vertices(f["geometry"]["coordinates"]) for f in features if f["geometry"]
+    )
+    # The GeoJSON is decoded from the simplified arcs, so shared borders
+    # are simplified once and stay identical on both sides
+    snapped, topology = encode(features, "uat", tolerance, precision)
+    simplified = []
+    decoded = from_topology(topology, "uat")["features"]
+    for feature, decoded_feature in zip(features, decoded):
+        geometry = decoded_feature["geometry"]
+        if geometry is not None:
+            geometry = {
+                "type": geometry["type"],
+                "coordinates": round_coordinates(geometry["coordinates"], precision),
+            }
+        simplified.append({**feature, "geometry": geometry})
+    vertices_out = sum(
+        count_vertices(f["geometry"]["coordinates"])
+        for f in simplified
+        if f["geometry"]
+    )
+
+    path = os.path.join(output_dir, f"{county_code}.geojson")
+    sliced = {"type": "FeatureCollection", "features": simplified}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(sliced, f, ensure_ascii=False, separators=(",", ":"))
+
+    report = {
+        "county": county_code,
+        "features": len(features),
+        "vertices_in": vertices_in,
+        "vertices_out": vertices_out,
+        "bytes": os.path.getsize(path),
+    }
+    if topojson:
+        report["topojson_bytes"] = write_topojson(
+            snapped,
+            topology,
+            os.path.join(output_dir, f"{county_code}.topojson"),
+            "uat",
+            check,
+        )
+    return report
+
+
+def split_counties(
+    source,
+    output_dir,
+    tolerance,
+    precision,
+    report_path=None,
+    workers=None,
+    topojson=False,
+    check=False,
+):
+    with open(source, "r", encoding="utf-8") as f:
+        full_geojson = json.load(f)
+
+    # Group features by county mnemonic
+    features_by_county = defaultdict(list)
+    for feature in full_geojson["features"]:
+        county = feature["properties"]["countyMn"]
+        features_by_county[county].append(feature)
+
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                write_county,
+                county,
+                features,
+                output_dir,
+                tolerance,
+                precision,
+                topojson,
+                check,
+            )
+            for county, features in features_by_county.items()
+        ]
+        report = sorted((f.result() for f in futures), key=lambda r: r["county"])
+
+    topo_header = f"{'topojson':>11}" if topojson else ""
+    print(
+        f"{'county':<7}{'features':>9}{'vertices in':>13}{'out':>9}{'bytes':>11}"
+        + topo_header
+    )
+    for row in report:
+        print(
+            f"{row['county']:<7}{row['features']:>9}{row['vertices_in']:>13}"
+            f"{row['vertices_out']:>9}{row['bytes']:>11}"
+            + (f"{row['topojson_bytes']:>11}" if topojson else "")
+        )
+    print(
+        f"{'total':<7}{sum(r['features'] for r in report):>9}"
+        f"{sum(r['vertices_in'] for r in report):>13}"
+        f"{sum(r['vertices_out'] for r in report):>9}"
+        f"{sum(r['bytes'] for r in report):>11}"
+        + (f"{sum(r['topojson_bytes'] for r in report):>11}" if topojson else "")
+    )
+
+    if report_path:
+        with open(report_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(report[0]))
+            writer.writeheader()
+            writer.writerows(report)
+
+    return report
 
-with open("data/ro_uat_poligon.geojson", "r", encoding="utf-8") as f:
-    full_geojson = json.load(f)
 
-# Group features by county mnemonic
-features_by_county = defaultdict(list)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default="data/ro_uat_poligon.geojson")
+    parser.add_argument("--output-dir", default="data/adm2")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.0002,
+        help="simplification tolerance in degrees (0 keeps every vertex)",
+    )
+    parser.add_argument(
+        "--precision", type=int, default=5, help="decimals kept per coordinate"
+    )
+    parser.add_argument("--report", default="data/adm2_report.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--topojson",
+        action="store_true",
+        help="also write TopoJSON for every county and for the county layer",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="decode every TopoJSON file again and compare it with its source",
+    )
+    parser.add_argument("--counties", default="data/ro_judete_poligon_simplified.json")
+    parser.add_argument("--counties-output", default="data/ro_judete.topojson")
+    args = parser.parse_args()
 
-for feature in full_geojson["features"]:
-    county = feature["properties"]["countyMn"]
-    features_by_county[county].append(feature)
+    split_counties(
+        args.source,
+        args.output_dir,
+        args.tolerance,
+        args.precision,
+        args.report,
+        args.workers,
+        args.topojson,
+        args.check,
+    )
 
-# Write one GeoJSON per county
-for county_code, features in features_by_county.items():
-    sliced = {"type": "FeatureCollection", "features": features}
-    with open(f"data/adm2/{county_code}.geojson", "w", encoding="utf-8") as f:
-        json.dump(sliced, f, ensure_ascii=False)
+    if args.topojson:
+        with open(args.counties, "r", encoding="utf-8") as f:
+            counties = json.load(f)["features"]
+        # the county layer is simplified already, it only gets quantized
+        snapped, topology = encode(counties, "counties", 0, args.precision)
+        size = write_topojson(
+            snapped, topology, args.counties_output, "counties", args.check
+        )
+        print(f"Wrote {args.counties_output} ({size} bytes)")
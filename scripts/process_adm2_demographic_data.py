@@ -1,15 +1,23 @@
+import argparse
+
 import pandas as pd
-import re
+import instrument
+from excel_cache import read_excel
+from normalize import normalize_column, normalize_place_names, strip_diacritics
+from place_matcher import PlaceMatcher
+from uat_index import read_uats
 import os
 import json
-import unicodedata
-
+import gzip
 
-def strip_diacritics(text):
-    return "".join(
-        c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
-    )
+try:
+    import brotli
+except ImportError:  # the .br shards are optional
+    brotli = None
 
+parser = argparse.ArgumentParser(description="Build the demographics JSON files.")
+instrument.add_arguments(parser)
+instrument.configure(parser.parse_args())
 
 output_dir = "../data/demographics/"
 os.makedirs(output_dir, exist_ok=True)
@@ -64,69 +72,29 @@ stripped_county_code_mapping = {
 }
 
 
-def normalize_names(text):
-    if not isinstance(text, str):
-        return text
-    # Replace common incorrect diacritics with proper Romanian ones
-    replacements = {
-        "ş": "ș",  # replace cedilla with comma
-        "Ş": "Ș",
-        "ţ": "ț",
-        "Ţ": "Ț",
-        "š": "ș",
-    }
-
-    for wrong, correct in replacements.items():
-        text = text.replace(wrong, correct)
-
-    text = text.title().strip()
-
-    for prefix in ["Oraș ", "Municipiul ", "MUNICIPIUL ", "ORAS ", "ORAȘ "]:
-        if text.startswith(prefix):
-            text = text.replace(prefix, "", 1)
-
-    # Replace word-initial Â/â with Î/î as per Romanian orthography
-    text = re.sub(r"\bÂ", "Î", text)
-    text = re.sub(r"\bâ", "î", text)
-
-    # Remove spaces before and after hyphens
-    text = re.sub(r"\s*-\s*", "-", text)
-
-    # Fix prepositions to be lowercase when they're not at the beginning
-    prepositions = [
-        "De",
-        "La",
-        "Din",
-        "Lui",
-        "Pe",
-        "Cu",
-        "În",
-        "Sub",
-        "Cel",
-    ]
-    for prep in prepositions:
-        # Replace only when not at the beginning of the text
-        text = re.sub(r"(?<!\A)(?<!\s\()(?<!\-)" + prep + r"\b", prep.lower(), text)
-
-    return text
-
-
-def split(dataframe):
-    groups = []
-    current = []
-    for _, row in dataframe.iterrows():
-        if pd.isna(row["raw_locality"]):
-            if current:
-                groups.append(pd.DataFrame(current))
-                current = []
+def parse_blocks(df, keys, county_code_of):
+    """
+    Turn a census sheet made of blocks separated by empty rows (a county row
+    followed by its localities) into
+    {county code: {"__county__": {key: n}, locality: {key: n}, ...}}.
+
+    The blocks are numbered with a cumulative sum over the separator rows
+    and every count column is converted in a single to_numeric pass.
+    """
+    separator = df["raw_locality"].isna()
+    rows = df[~separator]
+    is_county = ~separator.cumsum()[~separator].duplicated()
+    counts = rows[keys].apply(pd.to_numeric, errors="coerce").fillna(0).astype(int)
+    names = normalize_column(rows["raw_locality"], normalize_place_names)
+
+    lookup = {}
+    for name, county_row, values in zip(names, is_county, counts.to_numpy().tolist()):
+        record = dict(zip(keys, values))
+        if county_row:
+            current = lookup[county_code_of(name)] = {"__county__": record}
         else:
-            current.append(row)
-
-    # Append last group if any
-    if current:
-        groups.append(pd.DataFrame(current))
-
-    return groups
+            current[name] = record
+    return lookup
 
 
 ethnicity_columns = {
@@ -157,8 +125,9 @@ ethnicity_columns = {
 }
 
 
+@instrument.stage("ethnicity_table")
 def create_ethnicity_lookup():
-    df = pd.read_excel(
+    df = read_excel(
         "../data/Tabel-2.02.1-si-Tabel-2.02.2.xlsx", sheet_name="Tab 2.2.2", skiprows=5
     )
 
@@ -175,32 +144,12 @@ def create_ethnicity_lookup():
     df_cleaned = df.iloc[:-3].copy().reset_index(drop=True)
     df_bucharest = df.iloc[[-2]].copy()
 
-    groups = split(df_cleaned)
-
-    for group in groups:
-        group.iloc[:, 1:] = (
-            pd.to_numeric(group.iloc[:, 1:].stack(), errors="coerce")
-            .unstack()
-            .fillna(0)
-            .astype(int)
-        )
-
     ethnicity_keys = [v for k, v in ethnicity_columns.items() if v != "total"]
-    ethnicity_lookup = {}
-
-    for group in groups:
-        county_row = group.iloc[0]
-        county_name = normalize_names(county_row["raw_locality"])
-        county_code = county_code_mapping.get(county_name.upper(), None)
-
-        county_ethnicity = {k: int(county_row[k]) for k in ethnicity_keys}
-        ethnicity_lookup[county_code] = {"__county__": county_ethnicity}
-
-        for _, row in group.iloc[1:].iterrows():
-            city_name = normalize_names(row["raw_locality"])
-            ethnicity_lookup[county_code][city_name] = {
-                k: int(row[k]) for k in ethnicity_keys
-            }
+    ethnicity_lookup = parse_blocks(
+        df_cleaned,
+        ethnicity_keys,
+        lambda county_name: county_code_mapping.get(county_name.upper(), None),
+    )
 
     # Add Romania-level data
     ethnicity_lookup["ROU"] = {
@@ -215,29 +164,16 @@ def create_ethnicity_lookup():
     return ethnicity_lookup
 
 
-def validate_lookup_against_geojson(
-    lookup, geojson_dir="../data/adm2", label="ethnicity"
-):
-    import json
-    from collections import defaultdict
-
-    def load_geojson(filepath):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading {filepath}: {e}")
-            return None
-
-    def extract_place_names(geojson_data):
-        if not geojson_data or "features" not in geojson_data:
-            return set()
-        return {
-            f["properties"]["name"]
-            for f in geojson_data["features"]
-            if "name" in f.get("properties", {})
-        }
-
+@instrument.stage("key_by_siruta")
+def key_by_siruta(lookup, uat_codes, label="ethnicity"):
+    """
+    Re-key the localities of every county of lookup by the SIRUTA code
+    (natcode) of their UAT, so the tables are joined on integers. The census
+    sheets only carry names, so each name is matched once: exactly against
+    the county's UAT names, else by spelling (place_matcher). Names that
+    match no UAT are reported and left out; the counties without an ADM2
+    file keep their census names.
+    """
     results = {
         "counties_processed": 0,
         "cities_validated": 0,
@@ -245,62 +181,44 @@ def validate_lookup_against_geojson(
         "missing_details": [],
     }
 
-    # some manual patches
-    manual_patch = {
-        ("CJ", "Rișca"): "Râșca",
-    }
-
     for county_code, data in lookup.items():
         if county_code == "ROU" or county_code == "B":
             continue
-        geojson_path = os.path.join(geojson_dir, f"{county_code}.geojson")
-        geojson_data = load_geojson(geojson_path)
-        if not geojson_data:
+        codes = uat_codes.get(county_code)
+        if not codes:
+            print(f"[{label}] Warning: no UATs for {county_code} in ../data/adm2")
             continue
-
-        valid_places = extract_place_names(geojson_data)
-
-        stripped_valid_map = {strip_diacritics(name): name for name in valid_places}
         results["counties_processed"] += 1
 
-        to_patch = []
+        cities = [city_name for city_name in data if city_name != "__county__"]
+        results["cities_validated"] += len(cities)
+        keyed = {codes[name]: data[name] for name in cities if name in codes}
 
-        for city_name in list(data.keys()):
-            # all good here
-            if city_name == "__county__":
-                continue
-            results["cities_validated"] += 1
-            if city_name in valid_places:
-                continue
+        # something's off: resolve the unknown names by spelling, in one go
+        unknown = [city_name for city_name in cities if city_name not in codes]
+        matcher = PlaceMatcher({county_code: set(codes)})
+        matches = matcher.match_many([county_code] * len(unknown), unknown)
 
-            # something's off
-            if city_name not in valid_places:
-                # try to find by stripping diacritics
-                city_stripped = strip_diacritics(city_name)
-                correct_name = stripped_valid_map.get(city_stripped)
-            if correct_name:
-                to_patch.append((city_name, correct_name))
+        for city_name, correct_name, score in zip(
+            matches["name"], matches["match"], matches["score"]
+        ):
+            # never let two census names land on the same UAT
+            siruta = codes.get(correct_name) if correct_name else None
+            if siruta is not None and siruta not in keyed:
+                keyed[siruta] = data[city_name]
                 print(
-                    f"[{label}] Patched: '{city_name}' → '{correct_name}' in {county_code}"
+                    f"[{label}] Patched: '{city_name}' → '{correct_name}' in {county_code} ({score:.2f})"
                 )
             else:
-                correct_name = manual_patch.get((county_code, city_name))
-                if correct_name:
-                    to_patch.append((city_name, correct_name))
-                    print(
-                        f"[{label}] Manually patched: '{city_name}' → '{correct_name}' in {county_code}"
-                    )
-                else:
-                    results["cities_missing"] += 1
-                    results["missing_details"].append(
-                        {"county": county_code, "city": city_name}
-                    )
-                    print(
-                        f"[{label}] Warning: City '{city_name}' not found in {county_code}.geojson"
-                    )
-
-        for old, new in to_patch:
-            data[new] = data.pop(old)
+                results["cities_missing"] += 1
+                results["missing_details"].append(
+                    {"county": county_code, "city": city_name}
+                )
+                print(
+                    f"[{label}] Warning: City '{city_name}' not found in {county_code}.geojson"
+                )
+
+        lookup[county_code] = {"__county__": data["__county__"], **keyed}
 
     print(f"\n[{label.upper()} VALIDATION SUMMARY]")
     print(f"Counties processed: {results['counties_processed']}")
@@ -318,14 +236,24 @@ def validate_lookup_against_geojson(
             print(f"  - {item['city']}")
 
 
+# The UATs of the ADM2 files: (county, name) → natcode for the census names,
+# natcode → name for the keys of the output
+with instrument.stage("read_uats") as s:
+    uats = read_uats()
+    s.rows_out = len(uats)
+uat_codes = {
+    county: dict(zip(group["name"], group["natcode"].tolist()))
+    for county, group in uats.groupby("countyMn")
+}
+uat_names = dict(zip(uats["natcode"].tolist(), uats["name"]))
+
 ethnicity_lookup = create_ethnicity_lookup()
-validate_lookup_against_geojson(
-    ethnicity_lookup,
-)
+key_by_siruta(ethnicity_lookup, uat_codes)
 
 
+@instrument.stage("age_table")
 def create_age_lookup():
-    age_df = pd.read_excel(
+    age_df = read_excel(
         "../data/Tabel-1.03_1.3.1-si-1.03.2.xls",
         sheet_name="TAB. 1.03.2_RPL2021",
         skiprows=7,
@@ -367,34 +295,15 @@ def create_age_lookup():
     # Drop Bucharest and the preceding row (keep everything up to -7)
     age_df_cleaned = age_df.iloc[:-6].copy().reset_index(drop=True)
 
-    groups = split(age_df_cleaned)
-    # check there are no NaN values and convert to int
-    for group in groups:
-        group.iloc[:, 1:] = (
-            pd.to_numeric(group.iloc[:, 1:].stack(), errors="coerce")
-            .unstack()
-            .fillna(0)
-            .astype(int)
-        )
-
-    age_lookup = {}
-    for group in groups:
-        county_row = group.iloc[0]
-        county_name = normalize_names(county_row["raw_locality"])
+    def county_code_of(county_name):
         county_code = county_code_mapping.get(county_name.upper(), None)
-
         if county_code is None:
             county_code = stripped_county_code_mapping.get(
                 strip_diacritics(county_name.upper())
             )
+        return county_code
 
-        county_age = {k: int(county_row[k]) for k in age_groups}
-        age_lookup[county_code] = {"__county__": county_age}
-
-        for _, row in group.iloc[1:].iterrows():
-            city_name = normalize_names(row["raw_locality"])
-            # fix, fix, fix
-            age_lookup[county_code][city_name] = {k: int(row[k]) for k in age_groups}
+    age_lookup = parse_blocks(age_df_cleaned, age_groups, county_code_of)
 
     # Add Bucharest
     age_lookup["B"] = {
@@ -405,14 +314,12 @@ def create_age_lookup():
 
 
 age_lookup = create_age_lookup()
-validate_lookup_against_geojson(
-    age_lookup,
-    label="age",
-)
+key_by_siruta(age_lookup, uat_codes, label="age")
 
 
+@instrument.stage("education_table")
 def create_education_lookup():
-    df = pd.read_excel(
+    df = read_excel(
         "../data/Tabel-2.12.1-si-Tabel-2.12.2.xlsx",
         sheet_name="Tab. 2.12.2",
         skiprows=7,
@@ -437,42 +344,24 @@ def create_education_lookup():
         "under_2",
     ]
 
-    rows = []
-    current_county = None
-    recording_ethnicities = False
-
-    for _, row in df.iterrows():
-        name = row["raw_locality"]
-
-        if pd.isna(name):
-            recording_ethnicities = False
-            continue
-
-        name_str = str(name).strip()
-
-        if name_str.upper() == "ETNIA":
-            recording_ethnicities = True
-            continue
-
-        if not recording_ethnicities:
-            current_county = name_str
-            rows.append(
-                {
-                    "county": current_county,
-                    "ethnicity": "TOTAL",
-                    **row.drop("raw_locality").to_dict(),
-                }
-            )
-        else:
-            rows.append(
-                {
-                    "county": current_county,
-                    "ethnicity": name_str,
-                    **row.drop("raw_locality").to_dict(),
-                }
-            )
-
-    cleaned_df = pd.DataFrame(rows)
+    # Each county block is a county row, then an "ETNIA" row followed by one
+    # row per ethnicity, until the next empty row. A row belongs to the
+    # ethnicities when an ETNIA row came before it in the same block.
+    separator = df["raw_locality"].isna()
+    names = df["raw_locality"].astype(str).str.strip()
+    is_etnia = (names.str.upper() == "ETNIA") & ~separator
+    recording = is_etnia.groupby(separator.cumsum()).cummax()
+    keep = ~separator & ~is_etnia
+
+    cleaned_df = pd.DataFrame(
+        {
+            "county": names.where(~recording & ~separator).ffill()[keep],
+            "ethnicity": names.where(recording, "TOTAL")[keep],
+        }
+    )
+    cleaned_df = pd.concat(
+        [cleaned_df, df[keep].drop(columns="raw_locality")], axis=1
+    ).reset_index(drop=True)
 
     # Normalize columns
     numeric_cols = cleaned_df.columns.difference(["county", "ethnicity"])
@@ -488,7 +377,7 @@ def create_education_lookup():
     # Create lookup
     edu_lookup = {}
     for county, group in cleaned_df.groupby("county"):
-        norm_county = normalize_names(county)
+        norm_county = normalize_place_names(county)
         county_code = county_code_mapping.get(
             norm_county.upper()
         ) or stripped_county_code_mapping.get(strip_diacritics(norm_county.upper()))
@@ -505,8 +394,9 @@ def create_education_lookup():
 
         edu_lookup[county_code] = {}
 
-        for _, row in group.iterrows():
-            raw_ethnicity = str(row["ethnicity"]).strip()
+        for raw_ethnicity, values in zip(
+            group["ethnicity"].str.strip(), group[numeric_cols].to_numpy().tolist()
+        ):
             mapped_ethnicity = (
                 ethnicity_columns.get(
                     raw_ethnicity, raw_ethnicity.lower().replace(" ", "_")
@@ -515,17 +405,17 @@ def create_education_lookup():
                 else "__county__"
             )
 
-            edu_lookup[county_code][mapped_ethnicity] = {
-                k: int(row[k]) for k in numeric_cols
-            }
+            edu_lookup[county_code][mapped_ethnicity] = dict(zip(numeric_cols, values))
 
     return edu_lookup
 
 
+@instrument.stage("combine")
 def create_total_demographics(
     ethnicity_lookup,
     age_lookup,
     education_lookup,
+    uat_names,
     out="../data/demographics/total.json",
 ):
     combined = {"name": "ROU", "population": {}, "cities": {}}
@@ -560,15 +450,21 @@ def create_total_demographics(
         }
 
         # ---- cities (education not available) ----
+        # keyed by UAT name for the map, joined on the UAT's SIRUTA code; the
+        # localities of a county without an ADM2 file keep their census name
         cities = {}
-        for city in set(eth_c) - {"__county__"}:
-            cities[city] = {
+        for key, ethnicity in eth_c.items():
+            if key == "__county__":
+                continue
+            siruta = key if key in uat_names else None
+            cities[uat_names.get(key, key)] = {
+                "siruta": siruta,
                 "population": {
-                    "total": sum(eth_c[city].values()),
-                    "ethnicity": eth_c[city],
-                    "age": age_c.get(city, {}),
+                    "total": sum(ethnicity.values()),
+                    "ethnicity": ethnicity,
+                    "age": age_c.get(key, {}),
                     # no education field here
-                }
+                },
             }
 
         combined["cities"][c] = {"population": county_pop, "cities": cities}
@@ -577,13 +473,60 @@ def create_total_demographics(
         json.dump(combined, f, ensure_ascii=False)
 
     print(f"✅ Combined demographics written to {out}")
+    return combined
+
+
+@instrument.stage("write_shards")
+def write_demographic_shards(combined, out_dir=output_dir, compress=("gz", "br")):
+    """
+    Split the combined demographics into one <CODE>.json per county and an
+    index.json manifest. The manifest has the shape of total.json without
+    the localities: the national population and each county's population,
+    plus the shard file to fetch for the county's localities. Merging a
+    shard into its manifest entry gives back the total.json entry.
+
+    Each shard is also written pre-compressed (.gz, and .br when the brotli
+    module is installed) for servers that serve precompressed files.
+    """
+    if "br" in compress and brotli is None:
+        print("⚠️ brotli is not installed, skipping the .br shards")
+        compress = tuple(c for c in compress if c != "br")
+
+    index = {"name": combined["name"], "population": combined["population"]}
+    index["cities"] = {}
+    for code, county in combined["cities"].items():
+        shard = {"name": code, **county}
+        raw = json.dumps(shard, ensure_ascii=False).encode("utf-8")
+        path = os.path.join(out_dir, f"{code}.json")
+        with open(path, "wb") as f:
+            f.write(raw)
+        if "gz" in compress:
+            with open(path + ".gz", "wb") as f:
+                # mtime=0 keeps the bytes stable between runs
+                f.write(gzip.compress(raw, compresslevel=9, mtime=0))
+        if "br" in compress:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(raw, quality=11))
+
+        index["cities"][code] = {
+            "population": county["population"],
+            "shard": f"{code}.json",
+            "bytes": len(raw),
+        }
+
+    index_path = os.path.join(out_dir, "index.json")
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+
+    print(f"✅ {len(index['cities'])} county shards and {index_path} written")
 
 
 education_lookup = create_education_lookup()
-# validate_lookup_against_geojson(education_lookup, label="education")
 
-create_total_demographics(
+combined = create_total_demographics(
     ethnicity_lookup,
     age_lookup,
     education_lookup,
+    uat_names,
 )
+write_demographic_shards(combined)
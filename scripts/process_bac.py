@@ -1,120 +1,145 @@
+import argparse
 import json
-from collections import defaultdict, Counter
+import math
+from collections import defaultdict
 import numpy as np
 import pandas as pd
+import instrument
+from excel_cache import read_excel
 
-df = pd.read_excel("../data/2024.09.30_bac_date-deschise_2024-ses1.xlsx")
-df_2024 = df[df["Promoție"] == "2023-2024"]
+parser = argparse.ArgumentParser(description="Build bac.json from the BAC workbook.")
+instrument.add_arguments(parser)
+instrument.configure(parser.parse_args())
+
+with instrument.stage("read_workbook") as s:
+    df = read_excel("../data/2024.09.30_bac_date-deschise_2024-ses1.xlsx")
+    s.rows_out = len(df)
+df_2024 = df[df["Promoție"] == "2023-2024"].copy()
 
 # %%
-# Normalize language column
-df_2024["Subiect eb normalized"] = (
-    df_2024["Subiect eb"].str.extract(r"^(Limba [^\(]+)").squeeze().str.strip()
-)
-df_2024["Subiect eb normalized"] = df_2024["Subiect eb normalized"].fillna(
-    "Limba română"
-)
-
-df_2024["Sex"] = df_2024["Sex"].str.lower()
-
-# Language code mapping
-lang_map = {
-    "Limba română": "RO",
-    "Limba maghiară": "HU",
-    "Limba germană": "DE",
-    "Limba slovacă": "SK",
-    "Limba ucraineană": "UA",
-    "Limba sârbă": "SR",
-    "Limba croată": "HR",
-    "Limba turcă": "TR",
-    "Limba italiană": "IT",
-}
-df_2024["lang_code"] = df_2024["Subiect eb normalized"].map(lang_map)
-
-# assert all languages are mapped
-if df_2024["lang_code"].isna().any():
-    raise ValueError("Some languages are not mapped in lang_map")
-
-# Create empty result dict
-bac_json = {}
-
-for (unitate, sex), group in df_2024.groupby(["Unitate (SIIIR)", "Sex"]):
-    passed_mask = group["STATUS"] == "Promovat"
-    lang_counts = Counter(group["lang_code"])
-
-    if unitate not in bac_json:
-        bac_json[unitate] = {
+with instrument.stage("prepare", rows_in=len(df_2024)):
+    # Normalize language column
+    df_2024["Subiect eb normalized"] = (
+        df_2024["Subiect eb"].str.extract(r"^(Limba [^\(]+)").squeeze().str.strip()
+    )
+    df_2024["Subiect eb normalized"] = df_2024["Subiect eb normalized"].fillna(
+        "Limba română"
+    )
+
+    df_2024["Sex"] = df_2024["Sex"].str.lower()
+
+    # Language code mapping
+    lang_map = {
+        "Limba română": "RO",
+        "Limba maghiară": "HU",
+        "Limba germană": "DE",
+        "Limba slovacă": "SK",
+        "Limba ucraineană": "UA",
+        "Limba sârbă": "SR",
+        "Limba croată": "HR",
+        "Limba turcă": "TR",
+        "Limba italiană": "IT",
+    }
+    df_2024["lang_code"] = df_2024["Subiect eb normalized"].map(lang_map)
+
+    # assert all languages are mapped
+    if df_2024["lang_code"].isna().any():
+        raise ValueError("Some languages are not mapped in lang_map")
+
+    df_2024["passed"] = df_2024["STATUS"] == "Promovat"
+    df_2024["absent"] = df_2024["STATUS"] == "Absent"
+    df_2024["failed"] = df_2024["STATUS"] == "Nepromovat"
+    # mean/std are over the grades of candidates who passed. The grades have
+    # two decimals, so in hundredths their sums and sums of squares are exact
+    # integers (as floats, well below 2**53) whatever the summation order
+    grade = np.rint(df_2024["Medie"] * 100).where(df_2024["passed"])
+    df_2024["grade"] = grade
+    df_2024["grade_sq"] = grade**2
+
+with instrument.stage("aggregate", rows_in=len(df_2024)) as s:
+    keys = ["Unitate (SIIIR)", "Sex"]
+    by_sex = df_2024.groupby(keys).agg(
+        graduating=("passed", "size"),
+        passed=("passed", "sum"),
+        absent=("absent", "sum"),
+        failed=("failed", "sum"),
+        grade_count=("grade", "count"),
+        grade_sum=("grade", "sum"),
+        grade_sq_sum=("grade_sq", "sum"),
+    )
+    # in order of first appearance, as the languages were always listed
+    lang_by_sex = df_2024.groupby(keys + ["lang_code"], sort=False).size()
+    by_school = by_sex.groupby(level=0).sum()
+    s.rows_out = len(by_school)
+
+
+def mean_std(row):
+    """
+    Population mean/std from the grade sums in hundredths, None when there is
+    nothing to report. The mean is rounded half to even on the exact quotient,
+    so a mean that ends in .xx5 always rounds the same way (a float mean of
+    the grades lands on either side of it depending on the summation order).
+    """
+    count = int(row.grade_count)
+    if count == 0:
+        return None, None
+    total = int(row.grade_sum)
+    cents, remainder = divmod(total, count)
+    if 2 * remainder > count or (2 * remainder == count and cents % 2):
+        cents += 1
+    if count <= 1:
+        return cents / 100, None
+    variance = (count * int(row.grade_sq_sum) - total**2) / count**2
+    return cents / 100, round(math.sqrt(variance) / 100, 2)
+
+
+langs_by_sex = defaultdict(dict)
+for (*key, lang), count in lang_by_sex.items():
+    langs_by_sex[tuple(key)][lang] = int(count)
+
+# the school totals list the languages of the girls, then the new ones of the boys
+langs_by_school = defaultdict(dict)
+for key in by_sex.index:
+    total = langs_by_school[key[0]]
+    for lang, count in langs_by_sex[key].items():
+        total[lang] = total.get(lang, 0) + count
+
+
+with instrument.stage("build_json", rows_in=len(by_sex)):
+    bac_json = {}
+
+    for row in by_school.itertuples():
+        mean, std = mean_std(row)
+        bac_json[str(row.Index)] = {
             "f": {},
             "m": {},
             "total": {
-                "lang": defaultdict(int),
-                "graduating": 0,
-                "passed": 0,
-                "absent": 0,
-                "medie_list": [],
+                "lang": langs_by_school[row.Index],
+                "graduating": int(row.graduating),
+                "passed": int(row.passed),
+                # every candidate who did not pass, as the totals always counted
+                "absent": int(row.graduating - row.passed),
+                "mean": mean,
+                "std": std,
             },
         }
 
-    # Fill current stats
-    bac_json[unitate][sex] = {
-        "lang": dict(lang_counts),
-        "graduating": len(group),
-        "passed": passed_mask.sum(),
-        "absent": (group["STATUS"] == "Absent").sum(),
-        "failed": (group["STATUS"] == "Nepromovat").sum(),
-        "mean": (
-            round(group.loc[passed_mask, "Medie"].mean(), 2)
-            if passed_mask.any()
-            else None
-        ),
-        "std": (
-            round(group.loc[passed_mask, "Medie"].std(ddof=0), 2)
-            if passed_mask.sum() > 1
-            else None
-        ),
-    }
-
-    # Accumulate into 'total'
-    total = bac_json[unitate]["total"]
-    for lang, count in lang_counts.items():
-        total["lang"][lang] += count
-    total["graduating"] += len(group)
-    total["passed"] += passed_mask.sum()
-    total["absent"] += len(group) - passed_mask.sum()
-    total.setdefault("medie_list", []).extend(group.loc[passed_mask, "Medie"].tolist())
-
-
-# Finalize total mean/std
-for data in bac_json.values():
-    total = data["total"]
-    grades = total.pop("medie_list", [])
-    if grades:
-        total["mean"] = round(np.mean(grades), 2)
-        total["std"] = round(np.std(grades, ddof=0), 2) if len(grades) > 1 else None
-    else:
-        total["mean"] = None
-        total["std"] = None
-    total["lang"] = dict(total["lang"])  # convert defaultdict to regular dict
+    for row in by_sex.itertuples():
+        unitate, sex = row.Index
+        mean, std = mean_std(row)
+        bac_json[str(unitate)][sex] = {
+            "lang": langs_by_sex[row.Index],
+            "graduating": int(row.graduating),
+            "passed": int(row.passed),
+            "absent": int(row.absent),
+            "failed": int(row.failed),
+            "mean": mean,
+            "std": std,
+        }
 
 # Save to file
-bac_json_str_keys = {str(k): v for k, v in bac_json.items()}
-
-
-def convert_numpy(obj):
-    if isinstance(obj, dict):
-        return {k: convert_numpy(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy(v) for v in obj]
-    elif isinstance(obj, (np.integer, np.int64)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64)):
-        return float(obj)
-    else:
-        return obj
-
-
-cleaned_data = convert_numpy(bac_json_str_keys)
-with open("../data/bac.json", "w", encoding="utf-8") as f:
-    json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+with instrument.stage("write_json", rows_in=len(bac_json)):
+    with open("../data/bac.json", "w", encoding="utf-8") as f:
+        json.dump(bac_json, f, ensure_ascii=False, indent=2)
 
 # %%
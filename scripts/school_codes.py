@@ -0,0 +1,203 @@
+"""
+Resolution of SIIIR school codes found in the exam and enrollment data.
+
+school_code_lineage.csv records, for every code that is no longer in the
+school network, its successor (empty when the school closed), why it changed
+(merged, absorbed, recoded, closed) and the first year the old code is no
+longer valid. Chains (A merged into B, later absorbed by C) are followed to
+the last code, with path compression, so resolving a column is a single
+index lookup.
+
+The tables are keyed on a dense integer school id rather than on the
+10-character code: school_info.id, with the code kept as school_info.cod_siiir,
+and the school_id foreign key of the exam and enrollment tables. The ids are
+kept in ../data/school_ids.csv, so a school keeps its id across rebuilds and
+the exam years loaded earlier stay valid.
+
+CodeCheck maps resolved codes to their id. It collects the codes that still
+don't exist in school_info and reports them together, before they reach
+PostgreSQL, instead of failing the foreign key one load at a time. The lineage
+is also loaded into PostgreSQL as school_code_lineage (primary key old_code)
+for ad-hoc queries.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+LINEAGE_PATH = os.path.join(os.path.dirname(__file__), "school_code_lineage.csv")
+MISSING_CODES_PATH = "../data/missing_school_codes_{label}.csv"
+SCHOOL_NETWORK_CSV = "../data/retea-scolara-2024-2025.csv"
+SCHOOL_IDS_PATH = "../data/school_ids.csv"
+SCHOOL_INFO_PARQUET = "../data/school_info.parquet"
+
+
+def load_lineage(path=LINEAGE_PATH):
+    lineage = pd.read_csv(path, dtype={"old_code": str, "new_code": str})
+    duplicated = lineage["old_code"][lineage["old_code"].duplicated()]
+    if not duplicated.empty:
+        raise ValueError(f"Codes listed twice in {path}: {sorted(duplicated)}")
+    return lineage
+
+
+def compress_lineage(lineage, as_of=None):
+    """
+    Map every old code to the code it finally resolves to (None if the school
+    closed). With as_of, only changes valid by that year are followed;
+    without it, codes resolve to the current school network.
+    """
+    if as_of is not None:
+        lineage = lineage[lineage["valid_from"] <= as_of]
+    successors = dict(
+        zip(
+            lineage["old_code"],
+            lineage["new_code"].astype(object).where(lineage["new_code"].notna(), None),
+        )
+    )
+
+    final = {}
+    for code in successors:
+        path = []
+        current = code
+        while current in successors and current not in final:
+            if current in path:
+                raise ValueError(f"School code lineage has a cycle: {path}")
+            path.append(current)
+            current = successors[current]
+        target = final[current] if current in final else current
+        for old in path:
+            final[old] = target
+
+    return pd.Series(final, dtype=object)
+
+
+class SchoolCodeResolver:
+    def __init__(self, lineage=None, as_of=None):
+        if lineage is None:
+            lineage = load_lineage()
+        self.mapping = compress_lineage(lineage, as_of)
+
+    def resolve(self, codes):
+        """
+        Resolve a column of codes. Returns the resolved codes and a mask that
+        is False where the school closed without a successor.
+        """
+        if self.mapping.empty:
+            return codes, pd.Series(True, index=codes.index)
+        positions = self.mapping.index.get_indexer(codes)
+        found = positions >= 0
+        resolved = np.where(
+            found, self.mapping.to_numpy()[np.maximum(positions, 0)], codes
+        )
+        closed = found & pd.isna(resolved)
+        resolved = pd.Series(resolved, index=codes.index, dtype=object)
+        return resolved, pd.Series(~closed, index=codes.index)
+
+
+def load_lineage_table(engine, lineage=None):
+    from pg_loader import load_table
+
+    if lineage is None:
+        lineage = load_lineage()
+    load_table(engine, lineage, "school_code_lineage", primary_key="old_code")
+
+
+def assign_school_ids(codes, path=SCHOOL_IDS_PATH):
+    """
+    The school id of every code of a column. Codes seen for the first time
+    are numbered after the last id, in code order, and added to the file at
+    path; the ids of schools that left the network are not reused.
+    """
+    try:
+        ids = pd.read_csv(path, dtype={"cod_siiir": str, "id": "int32"})
+    except FileNotFoundError:
+        ids = pd.DataFrame(
+            {"cod_siiir": pd.Series(dtype=str), "id": pd.Series(dtype="int32")}
+        )
+
+    new = pd.Index(codes.dropna().unique()).difference(ids["cod_siiir"])
+    if len(new):
+        start = ids["id"].max() + 1 if len(ids) else 1
+        added = pd.DataFrame(
+            {
+                "cod_siiir": new.sort_values(),
+                "id": np.arange(start, start + len(new), dtype="int32"),
+            }
+        )
+        ids = pd.concat([ids, added], ignore_index=True)
+        tmp_path = path + ".tmp"
+        ids.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        print(f"Assigned ids to {len(new)} new school codes in {path}")
+
+    return codes.map(ids.set_index("cod_siiir")["id"]).astype("int32")
+
+
+def county_ids(codes):
+    """The county id that starts every SIIIR code, as a small integer."""
+    return pd.to_numeric(codes.str[:2]).astype("int16")
+
+
+def school_ids_from_parquet(path=SCHOOL_INFO_PARQUET):
+    """The school_info ids by code, from the table written with --no-db."""
+    ids = pd.read_parquet(path, columns=["cod_siiir", "id"])
+    return ids.set_index("cod_siiir")["id"]
+
+
+def school_ids_from_db(engine):
+    ids = pd.read_sql("SELECT cod_siiir, id FROM school_info", engine)
+    return ids.set_index("cod_siiir")["id"].astype("int32")
+
+
+class CodeCheck:
+    """
+    Looks up the school_info id of resolved school codes, counting the codes
+    that are not in school_info. On close the unknown codes are written to
+    missing_school_codes_<label>.csv and, if strict, a ValueError listing all
+    of them is raised, which rolls back the load that was consuming the batches.
+    """
+
+    def __init__(self, school_ids, label, strict=True):
+        self.school_ids = school_ids
+        self.label = label
+        self.strict = strict
+        self.missing = {}
+
+    def lookup(self, codes):
+        """
+        The ids of a column of codes (0 where unknown) and a mask that is
+        False for the unknown codes. Missing codes (closed schools) are not
+        counted as unknown.
+        """
+        positions = self.school_ids.index.get_indexer(codes)
+        found = positions >= 0
+        unknown = codes[~found & codes.notna()]
+        for code, count in unknown.value_counts().items():
+            self.missing[code] = self.missing.get(code, 0) + int(count)
+        ids = np.where(found, self.school_ids.to_numpy()[positions], 0)
+        return (
+            pd.Series(ids, index=codes.index, dtype="int32"),
+            pd.Series(found, index=codes.index),
+        )
+
+    def checked(self, batches):
+        """Pass the batches on, then close the check once they have all been read."""
+        yield from batches
+        self.close()
+
+    def close(self):
+        if not self.missing:
+            return
+        report = pd.DataFrame(
+            sorted(self.missing.items()), columns=["school_code", "rows"]
+        )
+        path = MISSING_CODES_PATH.format(label=self.label)
+        report.to_csv(path, index=False)
+        message = (
+            f"[{self.label}] {len(report)} school codes ({report['rows'].sum()} rows) "
+            f"are not in school_info, see {path}: " + ", ".join(report["school_code"])
+        )
+        if self.strict:
+            raise ValueError(message + ". Add them to school_code_lineage.csv.")
+        print(f"Warning: {message}. Their rows were skipped.")
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The scripts import each other as top-level modules, run from scripts/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrument  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def metrics(tmp_path):
+    # The stages append to ../data/stage_metrics.jsonl otherwise
+    instrument.configure(metrics_path=str(tmp_path / "stage_metrics.jsonl"))
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+import excel_cache
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "census.xlsx"
+    # Census-like sheet: counts with "-" placeholders, text with blanks
+    pd.DataFrame(
+        {
+            "Judet": ["Alba", "Arad", None, "Arges"],
+            "Total": [1200, "-", 310, 45.5],
+            2021: ["-", "-", 7, None],
+            "Barbati": [600, 150, 155, 20],
+        }
+    ).to_excel(path, index=False)
+    return path
+
+
+def test_read_excel_matches_pandas(workbook):
+    expected = pd.read_excel(workbook)
+
+    for _ in range(2):  # the parse, then the cache
+        df = excel_cache.read_excel(workbook)
+        pd.testing.assert_frame_equal(df, expected)
+        for col in expected.columns:
+            assert list(map(repr, df[col])) == list(map(repr, expected[col]))
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+
+import pytest
+
+import pg_loader
+
+
+class FakeCursor:
+    def __init__(self, copied):
+        self.copied = copied
+
+    def copy_expert(self, sql, stream, size):
+        self.copied.append(stream.read())
+
+    def close(self):
+        pass
+
+
+class FakeEngine:
+    """Records the statements and COPY input of a load, without a server."""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+
+    @contextmanager
+    def begin(self):
+        engine = self
+
+        class Connection:
+            class connection:
+                @staticmethod
+                def cursor():
+                    return FakeCursor(engine.copied)
+
+            @staticmethod
+            def execute(statement):
+                engine.statements.append(str(statement))
+
+        yield Connection
+
+
+def test_no_batches_without_column_types_raises():
+    with pytest.raises(ValueError, match="no rows"):
+        pg_loader.load_batches(FakeEngine(), iter([]), "bac_2024")
+
+
+def test_no_batches_creates_an_empty_typed_table():
+    engine = FakeEngine()
+    pg_loader.load_batches(
+        engine,
+        iter([]),
+        "bac_2024",
+        column_types={"school_id": "INTEGER", "mean_grade": "REAL"},
+        primary_key=None,
+    )
+
+    create = next(s for s in engine.statements if s.startswith("CREATE TABLE"))
+    assert '"school_id" INTEGER' in create
+    assert '"mean_grade" REAL' in create
+    assert not any(engine.copied)
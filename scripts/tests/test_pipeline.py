@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+
+import pipeline
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Run no script: record the order the stages start in, and no state."""
+    started = []
+    lock = threading.Lock()
+    failing = set()
+
+    def run_stage(name, stage, no_db=False):
+        with lock:
+            started.append(name)
+        return 1 if name in failing else 0
+
+    monkeypatch.setattr(pipeline, "run_stage", run_stage)
+    monkeypatch.setattr(pipeline, "load_state", lambda: {})
+    monkeypatch.setattr(pipeline, "save_state", lambda state: None)
+    return started, failing
+
+
+def test_no_db_runs_cubes_after_the_tables(runs):
+    started, _ = runs
+    failed = pipeline.run_pipeline(["cubes"], jobs=4, no_db=True)
+
+    assert failed == set()
+    assert "export" not in started
+    for name in pipeline.STAGES["export"]["deps"]:
+        assert started.index(name) < started.index("cubes")
+
+
+def test_no_db_skips_cubes_when_a_table_fails(runs):
+    started, failing = runs
+    failing.add("bac")
+    failed = pipeline.run_pipeline(["cubes"], jobs=4, no_db=True)
+
+    assert {"bac", "export", "cubes"} <= failed
+    assert "cubes" not in started
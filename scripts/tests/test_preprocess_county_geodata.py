@@ -0,0 +1,51 @@
+import json
+
+from shapely.geometry import shape
+from shapely.ops import unary_union
+
+from preprocess_county_geodata import write_county
+
+
+def feature(name, natcode, ring):
+    return {
+        "type": "Feature",
+        "properties": {"name": name, "countyMn": "AB", "natcode": natcode},
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+    }
+
+
+def read_features(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["features"]
+
+
+def test_neighbours_still_meet_after_simplification(tmp_path):
+    # Two UATs sharing a zigzag border at x ≈ 1, well within the tolerance
+    border = [[1 + (0.0001 if i % 2 else 0), i / 10] for i in range(11)]
+    west = [[0, 0]] + border + [[0, 1], [0, 0]]
+    east = [border[0], [2, 0], [2, 1]] + border[::-1]
+    features = [feature("Vest", "1017", west), feature("Est", "1018", east)]
+
+    report = write_county("AB", features, str(tmp_path), 0.001, 5, topojson=True)
+
+    assert report["vertices_out"] < report["vertices_in"]
+    geometries = [shape(f["geometry"]) for f in read_features(tmp_path / "AB.geojson")]
+    assert all(g.is_valid for g in geometries)
+    union = unary_union(geometries)
+    # no gap and no sliver between the two sides of the border
+    assert union.geom_type == "Polygon" and not union.interiors
+    assert union.area == sum(g.area for g in geometries)
+    assert (tmp_path / "AB.topojson").exists()
+
+
+def test_polygon_smaller_than_the_grid_loses_its_geometry(tmp_path):
+    tiny = [[0, 0], [0.000001, 0], [0.000001, 0.000001], [0, 0]]
+    square = [[1, 1], [2, 1], [2, 2], [1, 2], [1, 1]]
+    features = [feature("Mic", "1017", tiny), feature("Mare", "1018", square)]
+
+    write_county("AB", features, str(tmp_path), 0.001, 5)
+
+    written = read_features(tmp_path / "AB.geojson")
+    assert [f["properties"]["natcode"] for f in written] == ["1017", "1018"]
+    assert written[0]["geometry"] is None
+    assert written[1]["geometry"]["type"] == "Polygon"
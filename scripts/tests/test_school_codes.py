@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from create_bac_db import clean_batch, columns
+from school_codes import CodeCheck, SchoolCodeResolver
+
+CLOSED = "4061102635"  # building demolished, no successor
+
+
+def test_earlier_years_resolve_to_the_current_codes():
+    # every change in the lineage took effect in 2024, and a 2023 exam is
+    # still joined to the current school_info
+    codes, resolved = SchoolCodeResolver().resolve(
+        pd.Series(["0161103364", "0162101905", "1234567890"])
+    )
+    assert list(codes) == ["0162103364", "0161103269", "1234567890"]
+    assert resolved.all()
+
+
+def test_closed_school_is_not_resolved():
+    codes, resolved = SchoolCodeResolver().resolve(pd.Series([CLOSED]))
+    assert codes.isna().all()
+    assert not resolved.any()
+
+
+@pytest.mark.parametrize("year", [2023, 2024])
+def test_bac_drops_closed_schools_without_reporting_them(year):
+    school_codes = ["2161100953", CLOSED, "1234567890"]
+    df = pd.DataFrame({source: [None] * 3 for source in columns})
+    df["Unitate (SIIIR)"] = school_codes
+    df["Promoție"] = f"{year - 1}-{year}"
+    df["Subiect eb"] = "Limba română (Limba română)"
+    df["Medie"] = [8.5, 9.0, 7.25]
+    school_ids = pd.Series([1, 2], index=["2162100953", "1234567890"])
+    check = CodeCheck(school_ids, f"bac_{year}")
+
+    cleaned = clean_batch(df, year, SchoolCodeResolver(), check)
+
+    assert list(cleaned["school_id"]) == [1, 2]
+    assert check.missing == {}
@@ -0,0 +1,95 @@
+import copy
+
+import pytest
+from shapely.geometry import shape
+
+from topology import check_round_trip, from_topology, shared_arcs, to_topology
+
+
+def square(x, y, size=1.0):
+    ring = [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def collection(*geometries):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {
+                    "name": f"UAT {i}",
+                    "countyMn": "AB",
+                    "natcode": str(1017 + i),
+                },
+                "geometry": g,
+            }
+            for i, g in enumerate(geometries)
+        ],
+    }
+
+
+@pytest.fixture
+def neighbours():
+    # Two squares sharing the edge x = 1, and one on its own
+    return collection(square(0, 0), square(1, 0), square(5, 5, 0.5))
+
+
+def test_round_trip_keeps_geometries_and_properties(neighbours):
+    # the decoded features share their properties dicts with the source
+    expected = copy.deepcopy(neighbours)
+    topology = to_topology(neighbours, "uat", precision=5)
+    decoded = from_topology(topology, "uat")["features"]
+
+    assert len(decoded) == len(expected["features"])
+    for source, result in zip(expected["features"], decoded):
+        assert result["properties"] == source["properties"]
+        assert result["geometry"]["type"] == source["geometry"]["type"]
+        assert shape(result["geometry"]).equals(shape(source["geometry"]))
+    check_round_trip(neighbours, topology, "uat")
+
+
+def test_shared_edge_is_stored_once(neighbours):
+    topology = to_topology(neighbours, "uat", precision=5)
+    assert shared_arcs(topology) == 1
+
+
+def test_multipolygon_with_hole_round_trips():
+    outer = [[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]]
+    hole = [[1, 1], [1, 2], [2, 2], [2, 1], [1, 1]]
+    source = collection(
+        {
+            "type": "MultiPolygon",
+            "coordinates": [[outer, hole], square(6, 0)["coordinates"]],
+        }
+    )
+    topology = to_topology(source, "uat", precision=3)
+    decoded = from_topology(topology, "uat")["features"]
+
+    assert shape(decoded[0]["geometry"]).equals(
+        shape(source["features"][0]["geometry"])
+    )
+    check_round_trip(source, topology, "uat")
+
+
+def test_check_round_trip_reports_changed_properties(neighbours):
+    # the encoder shares the properties dicts with its source
+    topology = copy.deepcopy(to_topology(neighbours, "uat", precision=5))
+    topology["objects"]["uat"]["geometries"][1]["properties"]["name"] = "renamed"
+    with pytest.raises(ValueError, match="properties differ"):
+        check_round_trip(neighbours, topology, "uat")
+
+
+@pytest.mark.parametrize(
+    "source",
+    [collection(), collection(None, {"type": "Polygon", "coordinates": []})],
+    ids=["no features", "empty geometries"],
+)
+def test_empty_collection_gives_an_empty_topology(source):
+    topology = to_topology(source, "uat", precision=5)
+
+    assert topology["arcs"] == []
+    decoded = from_topology(topology, "uat")["features"]
+    assert [f["properties"] for f in decoded] == [
+        f["properties"] for f in source["features"]
+    ]
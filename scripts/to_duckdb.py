@@ -1,33 +1,122 @@
-import shutil
+"""
+Export the PostgreSQL tables to Parquet files in ../data for DuckDB-WASM.
+
+DuckDB-WASM reads the files over HTTP range requests and skips row groups
+whose min/max statistics cannot match a filter, so every table is written
+sorted on a clustering key (county, then school id), in row groups of
+16k rows, ZSTD compressed and with dictionary encoding for the
+string columns only (the layout is shared with parquet_loader.py). Tables
+are exported concurrently, each file is written next to its final path and
+renamed into place, and the row count, size and row groups of every file go
+to ../data/parquet_export.json.
+
+Usage (from scripts/):
+    python to_duckdb.py                    # every public table
+    python to_duckdb.py school_info bac_2024
+"""
+
+import argparse
+import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import duckdb
 
+import instrument
+from parquet_loader import cluster_key, write_parquet
 
 PG_CONN = "dbname=romania_edu host=localhost"
-con = duckdb.connect()
-con.execute("INSTALL postgres; LOAD postgres;")
-
-# Query pg_catalog.pg_tables via postgres_scan
-tables = con.execute(
-    f"""
-    SELECT tablename
-    FROM postgres_scan('{PG_CONN}', 'pg_catalog', 'pg_tables')
-    WHERE schemaname = 'public';
-"""
-).fetchall()
+DATA_DIR = "../data"
+REPORT_PATH = os.path.join(DATA_DIR, "parquet_export.json")
 
-# Export each table to Parquet
-for (table_name,) in tables:
-    filename = f"{table_name}.parquet"
-    print(f"Exporting {table_name} → {filename}...")
 
-    con.execute(
+def list_tables(con):
+    """The tables of the public schema, via postgres_scan of pg_tables."""
+    rows = con.execute(
         f"""
-        COPY (
-            SELECT * FROM postgres_scan('{PG_CONN}', 'public', '{table_name}')
-        ) TO '{filename}' (FORMAT PARQUET);
+        SELECT tablename
+        FROM postgres_scan('{PG_CONN}', 'pg_catalog', 'pg_tables')
+        WHERE schemaname = 'public'
+        ORDER BY tablename;
     """
-    )
-    dest_path = os.path.join("../data", filename)
-    shutil.move(filename, dest_path)
-    print(f"Moved to {dest_path}")
+    ).fetchall()
+    return [table for (table,) in rows]
+
+
+def source_query(table):
+    return f"SELECT * FROM postgres_scan('{PG_CONN}', 'public', '{table}')"
+
+
+def export_table(con, table, query=None, out_dir=DATA_DIR):
+    """Export one table sorted on its cluster key; returns its report entry."""
+    start = time.perf_counter()
+    with instrument.stage(f"export_{table}") as s:
+        # Each thread needs its own cursor on the shared database
+        cursor = con.cursor()
+        query = query or source_query(table)
+        key = cluster_key(table)
+        if key:
+            query += " ORDER BY " + ", ".join(f"{col} NULLS LAST" for col in key)
+        arrow_table = cursor.execute(query).fetch_arrow_table()
+        cursor.close()
+
+        path = os.path.join(out_dir, f"{table}.parquet")
+        row_groups = write_parquet(arrow_table, path)
+        s.rows_out = arrow_table.num_rows
+    return {
+        "table": table,
+        "path": path,
+        "rows": arrow_table.num_rows,
+        "bytes": os.path.getsize(path),
+        "row_groups": row_groups,
+        "cluster_key": key,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def export_tables(con, tables, queries=None, out_dir=DATA_DIR, jobs=None):
+    """Export tables in parallel; queries overrides the source of some tables."""
+    queries = queries or {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = [
+            pool.submit(export_table, con, table, queries.get(table), out_dir)
+            for table in tables
+        ]
+        return [future.result() for future in futures]
+
+
+def write_report(report, path=REPORT_PATH):
+    """Update the export report with these tables' entries."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = {entry["table"]: entry for entry in json.load(f)}
+    except FileNotFoundError:
+        entries = {}
+    entries.update((entry["table"], entry) for entry in report)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(sorted(entries.values(), key=lambda e: e["table"]), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("tables", nargs="*", help="default: every public table")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel exports")
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    instrument.configure(args)
+
+    con = duckdb.connect()
+    con.execute("INSTALL postgres; LOAD postgres;")
+
+    report = export_tables(con, args.tables or list_tables(con), jobs=args.jobs)
+    for entry in report:
+        print(
+            f"{entry['table']} → {entry['path']}: {entry['rows']} rows,"
+            f" {entry['bytes'] / 1024:.1f} KB in {entry['row_groups']} row groups"
+            f" ({entry['seconds']} s)"
+        )
+    write_report(report)
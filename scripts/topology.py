@@ -0,0 +1,359 @@
+"""
+Minimal TopoJSON encoder/decoder for the boundary layers.
+
+Neighbouring counties and communes share their borders, which GeoJSON stores
+once per polygon. to_topology quantizes the coordinates to an integer grid,
+cuts every ring at the junctions where borders meet, stores each distinct
+arc once (referenced as i, or ~i when walked backwards) and delta-encodes
+the arcs. Arcs can also be simplified (Douglas-Peucker), which keeps shared
+borders identical on both sides, unlike simplifying each polygon on its own.
+
+Only Polygon and MultiPolygon geometries are supported, which is all the
+ADM1/ADM2 layers contain. from_topology decodes back to GeoJSON and
+check_round_trip compares the two.
+"""
+
+import math
+from collections import defaultdict
+
+
+def _polygons(geometry):
+    """The geometry as a list of polygons, each a list of rings."""
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+
+def _transform(features, precision):
+    """
+    A grid of 10**-precision units anchored on a multiple of the step, so
+    coordinates already snapped to that many decimals quantize exactly.
+    """
+    k = 10**-precision
+    points = [
+        p
+        for feature in features
+        for polygon in _polygons(feature["geometry"])
+        for ring in polygon
+        for p in ring
+    ]
+    if not points:
+        # no features, or only empty geometries: an empty topology
+        return {"scale": [k, k], "translate": [0, 0]}
+    x0 = math.floor(round(min(p[0] for p in points) / k, 6))
+    y0 = math.floor(round(min(p[1] for p in points) / k, 6))
+    return {"scale": [k, k], "translate": [x0 * k, y0 * k]}
+
+
+def _quantize_ring(ring, transform):
+    k = transform["scale"][0]
+    ox = round(transform["translate"][0] / k)
+    oy = round(transform["translate"][1] / k)
+    points = []
+    for x, y in ring:
+        point = (round(x / k) - ox, round(y / k) - oy)
+        if not points or point != points[-1]:
+            points.append(point)
+    # open ring: the closing point is implied
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    return points
+
+
+def _find_junctions(rings):
+    """Points where the neighbours differ between the rings passing through them."""
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        n = len(ring)
+        for i, point in enumerate(ring):
+            a, b = ring[i - 1], ring[(i + 1) % n]
+            pair = (a, b) if a <= b else (b, a)
+            seen = neighbours.setdefault(point, pair)
+            if seen != pair:
+                junctions.add(point)
+    return junctions
+
+
+def _perpendicular_distance_sq(point, start, end):
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return (x - x1) ** 2 + (y - y1) ** 2
+    cross = dx * (y1 - y) - dy * (x1 - x)
+    return cross * cross / (dx * dx + dy * dy)
+
+
+def _douglas_peucker(points, tolerance):
+    """Simplify an open polyline, always keeping both ends."""
+    if len(points) < 3:
+        return points
+    tolerance_sq = tolerance * tolerance
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, max_distance = None, tolerance_sq
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance_sq(
+                points[i], points[first], points[last]
+            )
+            if distance > max_distance:
+                farthest, max_distance = i, distance
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _simplify_arc(arc, tolerance):
+    if arc[0] != arc[-1]:
+        return _douglas_peucker(arc, tolerance)
+    # A closed arc (a ring touching nothing else): split it at the point
+    # farthest from its start, and keep it a ring if it would collapse.
+    far = max(
+        range(len(arc)),
+        key=lambda i: _perpendicular_distance_sq(arc[i], arc[0], arc[0]),
+    )
+    simplified = _douglas_peucker(arc[: far + 1], tolerance)[:-1] + _douglas_peucker(
+        arc[far:], tolerance
+    )
+    return simplified if len(simplified) >= 4 else arc
+
+
+def _rotate_to_min(points):
+    start = points.index(min(points))
+    return points[start:] + points[:start]
+
+
+class _ArcIndex:
+    def __init__(self):
+        self.arcs = []
+        self.index = {}
+
+    def add(self, points):
+        """Register an arc; returns its reference (~i if stored reversed)."""
+        key = tuple(points)
+        if key in self.index:
+            return self.index[key]
+        reversed_key = key[::-1]
+        if reversed_key in self.index:
+            return ~self.index[reversed_key]
+        self.index[key] = len(self.arcs)
+        self.arcs.append(points)
+        return self.index[key]
+
+    def add_closed(self, ring):
+        """Register a ring without junctions, whatever its start and direction."""
+        forward = _rotate_to_min(ring)
+        backward = _rotate_to_min(ring[::-1])
+        key = tuple(forward + forward[:1])
+        reversed_key = tuple(backward + backward[:1])
+        if key in self.index:
+            return self.index[key]
+        if reversed_key in self.index:
+            return ~self.index[reversed_key]
+        return self.add(list(key))
+
+
+def _ring_arcs(ring, junctions, arc_index):
+    cuts = [i for i, point in enumerate(ring) if point in junctions]
+    if not cuts:
+        return [arc_index.add_closed(ring)]
+
+    # start at a junction and close the ring explicitly
+    ring = ring[cuts[0] :] + ring[: cuts[0]] + [ring[cuts[0]]]
+    refs = []
+    start = 0
+    for i in range(1, len(ring)):
+        if ring[i] in junctions:
+            refs.append(arc_index.add(ring[start : i + 1]))
+            start = i
+    return refs
+
+
+def _ring_points(arcs, refs):
+    points = []
+    for ref in refs:
+        arc = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+        points.extend(arc[1:] if points else arc)
+    return points
+
+
+def _grid_geometry(arcs, geometry):
+    """Rebuild a geometry object from already decoded arcs."""
+    if geometry["type"] == "Polygon":
+        rings = [_ring_points(arcs, r) for r in geometry["arcs"]]
+        return {"type": "Polygon", "coordinates": rings}
+    polygons = [[_ring_points(arcs, r) for r in p] for p in geometry["arcs"]]
+    return {"type": "MultiPolygon", "coordinates": polygons}
+
+
+def _arc_ids(arcs):
+    for item in arcs:
+        if isinstance(item, list):
+            yield from _arc_ids(item)
+        else:
+            yield item if item >= 0 else ~item
+
+
+def to_topology(
+    feature_collection, object_name, precision=5, tolerance=0, is_valid=None
+):
+    """
+    Encode a GeoJSON FeatureCollection as a TopoJSON Topology with a single
+    GeometryCollection named object_name, quantized to `precision` decimals.
+
+    tolerance (in degrees) simplifies the arcs. Simplifying arcs one at a
+    time can make a ring cross itself or its neighbour; if is_valid is given
+    it is called on every simplified geometry (a GeoJSON dict in grid units)
+    and the arcs of the features it rejects are put back unsimplified.
+    """
+    features = feature_collection["features"]
+    transform = _transform(features, precision)
+
+    quantized = [
+        [
+            [_quantize_ring(ring, transform) for ring in polygon]
+            for polygon in _polygons(feature["geometry"])
+        ]
+        for feature in features
+    ]
+    rings = [ring for polygons in quantized for polygon in polygons for ring in polygon]
+    junctions = _find_junctions(rings)
+
+    arc_index = _ArcIndex()
+    geometries = []
+    for feature, polygons in zip(features, quantized):
+        arcs = [
+            [_ring_arcs(ring, junctions, arc_index) for ring in p] for p in polygons
+        ]
+        geometry = {"properties": feature.get("properties") or {}}
+        if feature["geometry"] is None:
+            geometry["type"] = None
+        elif feature["geometry"]["type"] == "Polygon":
+            geometry.update(type="Polygon", arcs=arcs[0])
+        else:
+            geometry.update(type="MultiPolygon", arcs=arcs)
+        geometries.append(geometry)
+
+    arcs = arc_index.arcs
+    if tolerance > 0:
+        grid_tolerance = tolerance / transform["scale"][0]
+        arcs = [_simplify_arc(arc, grid_tolerance) for arc in arcs]
+
+        if is_valid is not None:
+            users = defaultdict(set)
+            for i, geometry in enumerate(geometries):
+                for arc_id in _arc_ids(geometry.get("arcs", [])):
+                    users[arc_id].add(i)
+
+            pending = [i for i, g in enumerate(geometries) if g["type"]]
+            while pending:
+                restored = set()
+                for i in pending:
+                    if not is_valid(_grid_geometry(arcs, geometries[i])):
+                        for arc_id in _arc_ids(geometries[i]["arcs"]):
+                            if arcs[arc_id] is not arc_index.arcs[arc_id]:
+                                arcs[arc_id] = arc_index.arcs[arc_id]
+                                restored.add(arc_id)
+                # the neighbours sharing a restored arc have to be checked again
+                pending = sorted({i for arc_id in restored for i in users[arc_id]})
+
+    encoded = []
+    for arc in arcs:
+        deltas = [list(arc[0])]
+        for (x1, y1), (x2, y2) in zip(arc, arc[1:]):
+            deltas.append([x2 - x1, y2 - y1])
+        encoded.append(deltas)
+
+    return {
+        "type": "Topology",
+        "transform": transform,
+        "objects": {
+            object_name: {"type": "GeometryCollection", "geometries": geometries}
+        },
+        "arcs": encoded,
+    }
+
+
+def from_topology(topology, object_name):
+    """Decode one object of a Topology back into a GeoJSON FeatureCollection."""
+    (kx, ky), (x0, y0) = (
+        topology["transform"]["scale"],
+        topology["transform"]["translate"],
+    )
+
+    arcs = []
+    for deltas in topology["arcs"]:
+        x = y = 0
+        points = []
+        for dx, dy in deltas:
+            x += dx
+            y += dy
+            points.append([round(x * kx + x0, 10), round(y * ky + y0, 10)])
+        arcs.append(points)
+
+    features = []
+    for geometry in topology["objects"][object_name]["geometries"]:
+        features.append(
+            {
+                "type": "Feature",
+                "properties": geometry.get("properties", {}),
+                "geometry": (
+                    _grid_geometry(arcs, geometry) if geometry["type"] else None
+                ),
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+def check_round_trip(feature_collection, topology, object_name):
+    """
+    Decode the topology and check it against the source features: same
+    features in the same order, identical properties, same geometry types
+    and ring counts, and closed rings. Raises ValueError on the first mismatch.
+    """
+    original = feature_collection["features"]
+    decoded = from_topology(topology, object_name)["features"]
+    if len(original) != len(decoded):
+        raise ValueError(f"{object_name}: {len(decoded)} of {len(original)} features")
+
+    for i, (a, b) in enumerate(zip(original, decoded)):
+        label = f"{object_name} feature {i} ({(a.get('properties') or {}).get('name')})"
+        if (a.get("properties") or {}) != b["properties"]:
+            raise ValueError(f"{label}: properties differ")
+        if a["geometry"] is None or b["geometry"] is None:
+            if a["geometry"] is not b["geometry"]:
+                raise ValueError(f"{label}: geometry lost")
+            continue
+        if a["geometry"]["type"] != b["geometry"]["type"]:
+            raise ValueError(f"{label}: geometry type differs")
+        rings_a = [len(p) for p in _polygons(a["geometry"])]
+        rings_b = [len(p) for p in _polygons(b["geometry"])]
+        if rings_a != rings_b:
+            raise ValueError(f"{label}: ring counts differ")
+        for polygon in _polygons(b["geometry"]):
+            for r in polygon:
+                if r[0] != r[-1]:
+                    raise ValueError(f"{label}: ring not closed")
+
+
+def arc_vertex_count(topology):
+    return sum(len(arc) for arc in topology["arcs"])
+
+
+def shared_arcs(topology):
+    """Number of arcs referenced by more than one ring."""
+    uses = defaultdict(int)
+    for obj in topology["objects"].values():
+        for geometry in obj["geometries"]:
+            for arc_id in _arc_ids(geometry.get("arcs", [])):
+                uses[arc_id] += 1
+    return sum(1 for count in uses.values() if count > 1)
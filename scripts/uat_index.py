@@ -0,0 +1,130 @@
+"""
+Spatial index over the UAT (ADM2) polygons.
+
+The school network gives every school the SIRUTA code of its locality and
+a town name. ro_localitati_punct has a point for every locality, so a
+locality is placed in its UAT by locating its point in the UAT polygons: one
+STRtree query for all the points instead of scanning the county's polygons
+for each of them.
+
+siruta_uats maps the SIRUTA code (natcode) of every locality to the natcode
+of its UAT, the key the schools, the census rows and the ADM2 features are
+joined on (read_uats lists the UATs themselves). locality_uats does the same
+by name, for the schools whose code is not in the table; localities that
+share a name inside a county (there are many "Valea Mare"s) are only used
+when all of their points land in the same UAT.
+"""
+
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+ADM2_DIR = "../data/adm2"
+
+
+def read_uats(adm2_dir=ADM2_DIR):
+    """The natcode, county and name of every UAT in the per-county ADM2 files."""
+    rows = []
+    for path in sorted(glob.glob(os.path.join(adm2_dir, "*.geojson"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for feature in json.load(f)["features"]:
+                props = feature["properties"]
+                rows.append((int(props["natcode"]), props["countyMn"], props["name"]))
+    return pd.DataFrame(rows, columns=["natcode", "countyMn", "name"])
+
+
+class UatIndex:
+    def __init__(self, uat_features):
+        self.geometries = np.array([shape(f["geometry"]) for f in uat_features])
+        self.natcodes = np.array(
+            [int(f["properties"]["natcode"]) for f in uat_features]
+        )
+        self.names = np.array([f["properties"]["name"] for f in uat_features])
+        self.counties = np.array([f["properties"]["countyMn"] for f in uat_features])
+        self.tree = shapely.STRtree(self.geometries)
+
+    def locate(self, points):
+        """Position of the UAT containing each point, -1 where none does."""
+        point_idx, uat_idx = self.tree.query(points, predicate="within")
+        located = np.full(len(points), -1)
+        located[point_idx] = uat_idx
+        return located
+
+
+def locality_uats(localitati_geojson, index):
+    """
+    Map (county mnemonic, locality name) to the name of the UAT containing
+    the locality, for localities placed unambiguously in a UAT of their own
+    county.
+    """
+    features = localitati_geojson["features"]
+    localities = pd.DataFrame(
+        {
+            "countyMn": [f["properties"].get("countyMn") for f in features],
+            "name": [f["properties"].get("name") for f in features],
+        }
+    )
+    # centroid also turns the odd MultiPoint into a single point
+    points = shapely.centroid([shape(f["geometry"]) for f in features])
+    located = index.locate(points)
+
+    localities["uat"] = np.where(located >= 0, index.names[located], None)
+    localities["uat_county"] = np.where(located >= 0, index.counties[located], None)
+    localities = localities[
+        localities["name"].notna()
+        & localities["uat"].notna()
+        & (localities["uat_county"] == localities["countyMn"])
+    ]
+
+    per_name = localities.groupby(["countyMn", "name"])["uat"].agg(["nunique", "first"])
+    unambiguous = per_name[per_name["nunique"] == 1]["first"]
+    return unambiguous.to_dict()
+
+
+def siruta_uats(localitati_geojson, index):
+    """
+    Map the natcode of every locality to the natcode of its UAT: the UAT its
+    nameSup names in its county, or else the UAT of its own county that
+    contains its point. The UATs map to themselves.
+    """
+    features = localitati_geojson["features"]
+    localities = pd.DataFrame(
+        {
+            "natcode": [f["properties"].get("natcode") for f in features],
+            "countyMn": [f["properties"].get("countyMn") for f in features],
+            "nameSup": [f["properties"].get("nameSup") for f in features],
+        }
+    )
+    localities["natcode"] = pd.to_numeric(localities["natcode"], errors="coerce")
+
+    uat_codes = pd.Series(
+        index.natcodes,
+        index=pd.MultiIndex.from_arrays([index.counties, index.names]),
+    )
+    uat_codes = uat_codes[~uat_codes.index.duplicated(keep=False)]
+    by_name = uat_codes.reindex(
+        pd.MultiIndex.from_frame(localities[["countyMn", "nameSup"]])
+    ).to_numpy()
+
+    points = shapely.centroid([shape(f["geometry"]) for f in features])
+    located = index.locate(points)
+    in_county = (located >= 0) & (
+        index.counties[np.maximum(located, 0)] == localities["countyMn"].to_numpy()
+    )
+    by_point = np.where(in_county, index.natcodes[np.maximum(located, 0)], np.nan)
+
+    localities["uat"] = np.where(pd.notna(by_name), by_name, by_point)
+    localities = localities.dropna(subset=["natcode", "uat"])
+    parents = dict(zip(index.natcodes.tolist(), index.natcodes.tolist()))
+    parents.update(
+        zip(
+            localities["natcode"].astype(int).tolist(),
+            localities["uat"].astype(int).tolist(),
+        )
+    )
+    return parents
@@ -1,6 +1,12 @@
 import os
 import json
 import glob
+import gzip
+
+try:
+    import brotli
+except ImportError:  # .br shards are only checked when brotli is installed
+    brotli = None
 
 # Define the path to the demographics data directory
 demographics_dir = os.path.join(
@@ -40,35 +46,75 @@ def extract_place_names(geojson_data):
     return place_names
 
 
-# Find all JSON files in the demographics directory
-json_files = glob.glob(os.path.join(demographics_dir, "*.json"))
+def read_shard(path):
+    """The raw bytes of a shard, checking that its .gz/.br copies match."""
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    compressed = [(path + ".gz", gzip.decompress)]
+    if brotli is not None:
+        compressed.append((path + ".br", brotli.decompress))
+    for compressed_path, decompress in compressed:
+        if os.path.exists(compressed_path):
+            with open(compressed_path, "rb") as f:
+                if decompress(f.read()) != raw:
+                    validation_results["shard_errors"].append(
+                        f"{os.path.basename(compressed_path)} does not match its shard"
+                    )
+    return raw
+
 
 validation_results = {
     "counties_processed": 0,
     "cities_validated": 0,
     "cities_missing": 0,
     "missing_details": [],
+    "shard_errors": [],
 }
 
-# Loop through each JSON file
-for json_file in json_files:
-    filename = os.path.basename(json_file)
-    county_name = filename.split(".")[0]
-
-    # Skip files that don't follow the two-letter county code pattern
-    if not (len(county_name) == 2 and filename.endswith(".json")) or filename in [
-        "ROU.json",
-        "B.json",
-    ]:
-        print(f"Skipping file: {filename}")
+# The manifest lists the county shards with the county populations
+with open(os.path.join(demographics_dir, "index.json"), "r", encoding="utf-8") as f:
+    manifest = json.load(f)
+
+shard_files = {
+    os.path.basename(p)
+    for p in glob.glob(os.path.join(demographics_dir, "*.json"))
+    if len(os.path.basename(p).split(".")[0]) <= 2
+}
+listed = {entry["shard"] for entry in manifest["cities"].values()}
+for filename in sorted(shard_files - listed):
+    validation_results["shard_errors"].append(f"{filename} is not in index.json")
+
+# Loop through each shard in the manifest
+for county_name, entry in sorted(manifest["cities"].items()):
+    json_file = os.path.join(demographics_dir, entry["shard"])
+    if not os.path.exists(json_file):
+        validation_results["shard_errors"].append(f"{entry['shard']} is missing")
         continue
 
     validation_results["counties_processed"] += 1
 
-    # Read the JSON file
     try:
-        with open(json_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        raw = read_shard(json_file)
+        if len(raw) != entry["bytes"]:
+            validation_results["shard_errors"].append(
+                f"{entry['shard']} is {len(raw)} bytes, index.json says {entry['bytes']}"
+            )
+        data = json.loads(raw)
+
+        if data.get("name") != county_name:
+            validation_results["shard_errors"].append(
+                f"{entry['shard']} is named {data.get('name')!r}"
+            )
+        if data.get("population") != entry["population"]:
+            validation_results["shard_errors"].append(
+                f"{entry['shard']} population differs from index.json"
+            )
+
+        cities = data.get("cities", {})
+        # Bucharest's sectors are not ADM2 units
+        if county_name == "B":
+            continue
 
         # Load the corresponding county GeoJSON
         county_geojson_path = os.path.join(adm2_dir, f"{county_name}.geojson")
@@ -82,19 +128,17 @@ for json_file in json_files:
         valid_places = extract_place_names(geojson_data)
 
         # Validate cities in demographic data
-        if "cities" in data:
-            for city in data["cities"]:
-                validation_results["cities_validated"] += 1
-                city_name = city.get("name", "")
-
-                if city_name not in valid_places:
-                    validation_results["cities_missing"] += 1
-                    validation_results["missing_details"].append(
-                        {"county": county_name, "city": city_name}
-                    )
-                    print(
-                        f"  Warning: City '{city_name}' not found in {county_name}.geojson"
-                    )
+        for city_name in cities:
+            validation_results["cities_validated"] += 1
+
+            if city_name not in valid_places:
+                validation_results["cities_missing"] += 1
+                validation_results["missing_details"].append(
+                    {"county": county_name, "city": city_name}
+                )
+                print(
+                    f"  Warning: City '{city_name}' not found in {county_name}.geojson"
+                )
 
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON in {json_file}: {e}")
@@ -105,6 +149,10 @@ print("\nValidation Summary:")
 print(f"Counties processed: {validation_results['counties_processed']}")
 print(f"Cities validated: {validation_results['cities_validated']}")
 print(f"Cities missing: {validation_results['cities_missing']}")
+print(f"Shard errors: {len(validation_results['shard_errors'])}")
+
+for error in validation_results["shard_errors"]:
+    print(f"  - {error}")
 
 if validation_results["missing_details"]:
     print("\nMissing cities by county:")
@@ -1,269 +1,288 @@
-import pandas as pd
-import json
-from pathlib import Path
-import re
+import argparse
 
+import numpy as np
+import pandas as pd
+import instrument
+from excel_cache import read_excel
+from normalize import normalize_columns, normalize_names
+from place_index import load_place_index
+from place_matcher import PlaceMatcher
+
+# Only towns that are not spelling variants of an ADM2 name belong here (the
+# spelling variants are resolved by place_matcher), e.g. a village name
+# standing in for its commune.
 manual_corrections = {
-    ("BH", "Mădăraș"): "Mădăras",
-    ("BT", "Flamânzi"): "Flămânzi",
-    ("CJ", "Ășchileu Mare"): "Așchileu Mare",
-    ("CJ", "Rișca"): "Râșca",
-    ("GL", "Vărlezi"): "Vârlezi",
-    ("IS", "Țigănăși"): "Țigănași",
-    ("NT", "Bârgauani"): "Bârgăuani",
-    ("NT", "Cândesti"): "Cândești",
-    ("NT", "Mânăstirea Neamț"): "Mănăstirea Neamț",
-    ("OT", "Pîrșcoveni"): "Pârșcoveni",
-    ("TR", "Rosiori de Vede"): "Roșiori de Vede",
-    ("DB", "Valea Voivozilor"): "Valea Voievozilor",
-    ("GR", "Neajlov"): "Neajlovu",
-    ("SJ", "Cristur Crișeni"): "Cristur-Crișeni",
-    ("CJ", "Ășchileu Mic"): "Așchileu Mic",
     ("DJ", "Răcarii de Jos"): "Răcari",
 }
 
 
-def normalize_names(text):
-    if not isinstance(text, str):
-        return text
-    # Replace common incorrect diacritics with proper Romanian ones
-    replacements = {
-        "ş": "ș",  # replace cedilla with comma
-        "Ş": "Ș",
-        "ţ": "ț",
-        "Ţ": "Ț",
-        "š": "ș",
-    }
-
-    for wrong, correct in replacements.items():
-        text = text.replace(wrong, correct)
-
-    text = text.title().strip()
-
-    # Fix prepositions to be lowercase when they're not at the beginning
-    prepositions = ["De", "La", "Din", "Lui", "Pe", "Cu", "În", "Sub", "Cel"]
-    for prep in prepositions:
-        # Replace only when not at the beginning of the text
-        text = re.sub(r"(?<!\A)(?<!\s\()(?<!\-)" + prep + r"\b", prep.lower(), text)
+def _lookup(mapping, counties, names):
+    """Values of a {(county, name): value} dict for parallel arrays of keys."""
+    keys = pd.MultiIndex.from_arrays([counties, names])
+    return pd.Series(mapping, dtype=object).reindex(keys).to_numpy()
 
-    return text
 
+def _is_place(place_index, counties, names):
+    """Whether each (county, name) pair is an ADM2 unit."""
+    adm2 = pd.MultiIndex.from_tuples(
+        [(c, n) for c, names in place_index.place_names.items() for n in names]
+    )
+    return pd.MultiIndex.from_arrays([counties, names]).isin(adm2)
 
-def load_geojson(filepath):
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data
-    except FileNotFoundError:
-        print(f"Warning: GeoJSON file not found: {filepath}")
-        return None
-    except Exception as e:
-        print(f"Error loading GeoJSON file {filepath}: {e}")
-        return None
 
+def siruta_table(place_index):
+    """The SIRUTA code of every locality with the code, county and name of its UAT."""
+    uats = pd.DataFrame(
+        [(code, c, n) for (c, n), code in place_index.uat_sirutas.items()],
+        columns=["uat_siruta", "county", "uat"],
+    )
+    parents = pd.DataFrame(
+        list(place_index.siruta_uats.items()), columns=["siruta", "uat_siruta"]
+    )
+    return parents.merge(uats, on="uat_siruta").astype(
+        {"siruta": "int32", "uat_siruta": "int32"}
+    )
 
-def extract_place_names(geojson_data):
-    place_names = set()
-    for feature in geojson_data["features"]:
-        if "properties" in feature and "name" in feature["properties"]:
-            name = feature["properties"]["name"]
-            if name:
-                place_names.add(name)
-        else:
-            print(f"Warning: Missing 'properties' or 'name' in feature: {feature}")
 
-    return place_names
-
-
-def extract_town_mappings(localitati_geojson, county_name):
+@instrument.stage("place_by_siruta")
+def place_by_siruta(df, sirutas):
     """
-    Extract mappings from small towns to their commune/municipality (nameSup)
-    for a specific county.
+    The UAT of every school from the SIRUTA code of its locality: one integer
+    join against the parent table. A school is only placed when its UAT is in
+    its own county; the others (codes missing from ro_localitati_punct) are
+    left to the name match.
     """
-    town_mappings = {}
-
-    for feature in localitati_geojson["features"]:
-        props = feature.get("properties", {})
-
-        # Skip if not in the target county
-        if props.get("countyMn") != county_name:
-            continue
-
-        name = props.get("name")
-        name_sup = props.get("nameSup")
-
-        if name and name_sup:
-            town_mappings[name] = name_sup
-
-    return town_mappings
-
-
-def validate_county_towns(df, localitati_geojson):
-    # Get unique counties
-    counties = df["Judet PJ"].unique()
-
-    results = {
-        "matched_adm2": 0,
-        "matched_via_localitati": 0,
-        "unmatched": 0,
-        "unmatched_towns": {},
-        "town_corrections": [],
+    codes = pd.to_numeric(df["Cod SIRUTA unitate"], errors="coerce")
+    placed = (
+        pd.DataFrame({"siruta": codes.astype("Int32"), "county": df["Judet PJ"]})
+        .reset_index()
+        .merge(sirutas, on=["siruta", "county"], how="left")
+        .set_index("index")
+    )
+    return placed["uat_siruta"].astype("Int32"), placed["uat"]
+
+
+@instrument.stage("validate_towns")
+def validate_county_towns(df, place_index):
+    """
+    Place every (county, town) pair of df in its ADM2 unit, all pairs at once.
+    Only used for the schools that place_by_siruta could not place.
+
+    The point-in-polygon result (place_index.town_uats) is used when there is
+    one. Otherwise, by name: a direct ADM2 match, then the parent commune
+    from localitati, then a fuzzy match on the spelling (place_matcher),
+    then manual_corrections (itself or its parent commune). The name match
+    is kept as a cross-check, its disagreements with the geometry are listed
+    in "name_mismatches".
+    """
+    towns = (
+        df[["Judet PJ", "Localitate unitate"]]
+        .dropna()
+        .drop_duplicates()
+        .rename(columns={"Judet PJ": "county", "Localitate unitate": "town"})
+    )
+    county, town = towns["county"].to_numpy(), towns["town"].to_numpy()
+
+    direct = _is_place(place_index, county, town)
+    parent = _lookup(place_index.town_mappings, county, town)
+    has_parent = _is_place(place_index, county, parent)
+
+    # Only the towns the exact lookups missed go through the fuzzy matcher
+    matcher = PlaceMatcher(place_index.place_names)
+    unresolved = ~(direct | has_parent)
+    fuzzy = np.full(len(towns), None, dtype=object)
+    fuzzy_scores = np.zeros(len(towns))
+    # towns holds distinct pairs, so the matches line up with the unresolved rows
+    matches = matcher.match_many(county[unresolved], town[unresolved])
+    fuzzy[unresolved] = matches["match"].to_numpy()
+    fuzzy_scores[unresolved] = matches["score"].to_numpy()
+
+    manual = _lookup(manual_corrections, county, town)
+    manual_parent = _lookup(place_index.town_mappings, county, manual)
+    name_steps = [
+        (direct, town, "adm2"),
+        (has_parent, parent, "localitati"),
+        (pd.notna(fuzzy), fuzzy, "fuzzy"),
+        (_is_place(place_index, county, manual), manual, "adm2"),
+        (_is_place(place_index, county, manual_parent), manual_parent, "localitati"),
+    ]
+    by_name = np.select(
+        [m for m, _, _ in name_steps], [v for _, v, _ in name_steps], None
+    )
+    how = np.select([m for m, _, _ in name_steps], [h for _, _, h in name_steps], "")
+
+    by_point = _lookup(place_index.town_uats, county, town)
+    has_point = pd.notna(by_point)
+    towns["by_point"] = by_point
+    towns["by_name"] = by_name
+    towns["corrected"] = np.where(has_point, by_point, by_name)
+    towns["score"] = fuzzy_scores
+    towns["status"] = np.select(
+        [has_point, how == "adm2", how == "localitati", how == "fuzzy"],
+        ["geometric", "adm2", "localitati", "fuzzy"],
+        "unmatched",
+    )
+
+    status_counts = towns["status"].value_counts()
+    corrections = towns[
+        (towns["status"] != "unmatched") & (towns["corrected"] != towns["town"])
+    ]
+    mismatches = towns[
+        has_point & pd.notna(by_name) & (towns["by_point"] != towns["by_name"])
+    ]
+    unmatched = towns[towns["status"] == "unmatched"]
+    fuzzy_matched = towns[towns["status"] == "fuzzy"]
+
+    return {
+        "matched_geometric": int(status_counts.get("geometric", 0)),
+        "matched_adm2": int(status_counts.get("adm2", 0)),
+        "matched_via_localitati": int(status_counts.get("localitati", 0)),
+        "matched_fuzzy": int(status_counts.get("fuzzy", 0)),
+        "unmatched": len(unmatched),
+        "unmatched_towns": unmatched.groupby("county", sort=False)["town"]
+        .agg(list)
+        .to_dict(),
+        "town_corrections": corrections[["county", "town", "corrected"]]
+        .set_axis(["County", "Original", "Corrected"], axis=1)
+        .to_dict("records"),
+        "fuzzy_matches": fuzzy_matched[["county", "town", "corrected", "score"]]
+        .set_axis(["County", "Original", "Corrected", "Score"], axis=1)
+        .to_dict("records"),
+        "name_mismatches": mismatches[["county", "town", "by_point", "by_name"]]
+        .set_axis(["County", "Town", "By point", "By name"], axis=1)
+        .to_dict("records"),
     }
 
-    for county in counties:
-        county_df = df[df["Judet PJ"] == county]
-
-        # Load GeoJSON data for this county
-        geojson_data = load_geojson(Path(f"../data/adm2/{county}.geojson"))
-
-        # Extract place names from GeoJSON
-        place_names = extract_place_names(geojson_data)
-
-        # Get village-to-commune mappings from localitati GeoJSON for this county
-        town_mappings = extract_town_mappings(localitati_geojson, county)
-
-        # Check each town/village in the county
-        towns = county_df["Localitate unitate"].unique()
-        unmatched_towns = []
-
-        for town in towns:
-            # First try direct match with ADM2
-            if town in place_names:
-                results["matched_adm2"] += 1
-            else:
-                # If not found in ADM2, check if it's in localitati and has a parent commune
-                parent_commune = town_mappings.get(town)
-
-                if parent_commune and parent_commune in place_names:
-                    results["matched_via_localitati"] += 1
-                    # Record the correction
-                    results["town_corrections"].append(
-                        {
-                            "County": county,
-                            "Original": town,
-                            "Corrected": parent_commune,
-                        }
-                    )
-                else:
-                    # Check if there's a manual correction for this town
-                    manual_correction_key = (county, town)
-                    if manual_correction_key in manual_corrections:
-                        corrected_town = manual_corrections[manual_correction_key]
-                        # Check if the corrected town is in place names
-                        if corrected_town in place_names:
-                            results["matched_adm2"] += 1
-                            results["town_corrections"].append(
-                                {
-                                    "County": county,
-                                    "Original": town,
-                                    "Corrected": corrected_town,
-                                }
-                            )
-                            continue
-                        # If not, check if it's in localitati
-                        corrected_parent_commune = town_mappings.get(corrected_town)
-                        if (
-                            corrected_parent_commune
-                            and corrected_parent_commune in place_names
-                        ):
-                            results["matched_via_localitati"] += 1
-                            results["town_corrections"].append(
-                                {
-                                    "County": county,
-                                    "Original": town,
-                                    "Corrected": corrected_parent_commune,
-                                }
-                            )
-                            continue
-                    results["unmatched"] += 1
-                    unmatched_towns.append(town)
-
-        if unmatched_towns:
-            results["unmatched_towns"][county] = unmatched_towns
-
-    return results
-
 
+@instrument.stage("normalize_names")
 def fix_diacritics_case(df):
     """Normalize diacritics and case in all string columns of the dataframe except 'Judet PJ'."""
-    str_columns = df.select_dtypes(include=["object"]).columns
-
-    for col in str_columns:
-        if col != "Judet PJ":  # Skip normalization for Judet PJ column
-            df[col] = df[col].apply(normalize_names)
-
-    return df
+    # Skip normalization for Judet PJ column
+    return normalize_columns(df, normalize_names, exclude=["Judet PJ"])
 
 
+@instrument.stage("apply_corrections")
 def apply_town_corrections(df, corrections):
     """
     Update town names in the dataframe based on corrections list.
 
     Each correction is a dict with County, Original, and Corrected fields.
     """
-    # Create a copy to avoid modifying during iteration
     df_copy = df.copy()
-
-    for correction in corrections:
-        county = correction["County"]
-        original = correction["Original"]
-        corrected = correction["Corrected"]
-
-        # Find rows matching this county and original town name
-        mask = (df_copy["Judet PJ"] == county) & (
-            df_copy["Localitate unitate"] == original
-        )
-
-        # Update the town name to the corrected version
-        df_copy.loc[mask, "Localitate unitate"] = corrected
-
+    if not corrections:
+        return df_copy
+
+    # One left join of all rows against the corrections, (County, Original)
+    # being unique in the list
+    fixes = pd.DataFrame(corrections)
+    merged = df_copy[["Judet PJ", "Localitate unitate"]].merge(
+        fixes,
+        how="left",
+        left_on=["Judet PJ", "Localitate unitate"],
+        right_on=["County", "Original"],
+    )
+    df_copy["Localitate unitate"] = (
+        merged["Corrected"].fillna(merged["Localitate unitate"]).to_numpy()
+    )
     return df_copy
 
 
+parser = argparse.ArgumentParser(description="Build the school_info table.")
+parser.add_argument(
+    "--no-db",
+    action="store_true",
+    help="write ../data/school_info.parquet instead of the PostgreSQL table",
+)
+instrument.add_arguments(parser)
+args = parser.parse_args()
+instrument.configure(args)
+
 # Load the school data
 print("Loading school data...")
-df = pd.read_excel(
-    "../data/retea-scolara-2024-2025.xlsx",
-    sheet_name=0,
-    skiprows=3,
-    dtype={"Cod SIIIR unitate": str},
-)
+with instrument.stage("read_workbook") as s:
+    df = read_excel(
+        "../data/retea-scolara-2024-2025.xlsx",
+        sheet_name=0,
+        skiprows=3,
+        dtype={"Cod SIIIR unitate": str},
+    )
+    s.rows_out = len(df)
 print(f"Loaded {len(df)} school entries.")
 
 # Fix diacritics in the dataframe
 print("Normalizing diacritics and case...")
 df = fix_diacritics_case(df)
 
-# Load the localitati GeoJSON data
-localitati_geojson = load_geojson(Path("../data/ro_localitati_punct.geojson"))
+# Town → commune mappings, ADM2 names and locality points placed in their
+# UAT, rebuilt only when the GeoJSON files change
+print("Loading the place index...")
+with instrument.stage("place_index"):
+    place_index = load_place_index()
 
-# Validate towns
-print("Validating towns against GeoJSON data...")
-results = validate_county_towns(df, localitati_geojson)
+# Place the schools by the SIRUTA code of their locality
+print("Placing schools by SIRUTA code...")
+sirutas = siruta_table(place_index)
+uat_siruta, uat_name = place_by_siruta(df, sirutas)
+placed = uat_siruta.notna().to_numpy()
 
-# Apply corrections to the dataframe
+# Validate the towns of the other schools
+print("Validating the remaining towns against GeoJSON data...")
+results = validate_county_towns(df[~placed], place_index)
+
+# Apply corrections to the dataframe, then the UAT names of the placed schools
 print("Applying town corrections...")
 corrected_df = apply_town_corrections(df, results["town_corrections"])
+corrected_df.loc[placed, "Localitate unitate"] = uat_name[placed]
+by_name = _lookup(
+    place_index.uat_sirutas,
+    corrected_df["Judet PJ"].to_numpy(),
+    corrected_df["Localitate unitate"].to_numpy(),
+)
+corrected_df["Cod SIRUTA UAT"] = uat_siruta.fillna(
+    pd.Series(by_name, index=corrected_df.index, dtype="Int32")
+)
 
-# remove Localitate PJ	Cod SIRUTA PJ	Mediu loc. PJ columns
+# remove Localitate PJ	Mediu loc. PJ columns
 corrected_df = corrected_df.drop(
-    columns=["Localitate PJ", "Cod SIRUTA PJ", "Mediu loc. PJ"], errors="ignore"
+    columns=["Localitate PJ", "Mediu loc. PJ"], errors="ignore"
 )
 
 # Save a CSV version for easier use with pandas
 csv_filepath = "../data/retea-scolara-2024-2025.csv"
 print(f"Saving CSV version to {csv_filepath}")
-corrected_df.to_csv(csv_filepath, index=False, encoding="utf-8")
+with instrument.stage("write_csv", rows_in=len(corrected_df)):
+    corrected_df.to_csv(csv_filepath, index=False, encoding="utf-8")
 
 # Print results
 print("\nValidation Results:")
+print(f"Schools placed by SIRUTA code: {placed.sum()} of {len(placed)}")
+print(f"Towns placed by point-in-polygon: {results['matched_geometric']}")
 print(f"Towns matched directly in ADM2: {results['matched_adm2']}")
 print(
     f"Towns matched via localitati parent commune: {results['matched_via_localitati']}"
 )
+print(f"Towns matched by spelling (fuzzy): {results['matched_fuzzy']}")
 print(f"Unmatched towns: {results['unmatched']}")
 print(f"Towns with corrections applied: {len(results['town_corrections'])}")
 
+if results["fuzzy_matches"]:
+    print("\nFuzzy matches (check these):")
+    for match in results["fuzzy_matches"]:
+        print(
+            f" - {match['County']} {match['Original']} → {match['Corrected']}"
+            f" ({match['Score']:.2f})"
+        )
+
+if results["name_mismatches"]:
+    print("\nTowns where the name match disagrees with the point-in-polygon UAT:")
+    for mismatch in results["name_mismatches"][:20]:
+        print(
+            f" - {mismatch['County']} {mismatch['Town']}: in {mismatch['By point']},"
+            f" name match gave {mismatch['By name']}"
+        )
+    if len(results["name_mismatches"]) > 20:
+        print(f" ... and {len(results['name_mismatches']) - 20} more")
+
 if results["unmatched_towns"]:
     print("\nUnmatched towns by county:")
     for county, towns in results["unmatched_towns"].items():
@@ -273,18 +292,20 @@ if results["unmatched_towns"]:
         if len(towns) > 10:
             print(f" ... and {len(towns) - 10} more")
 
-from sqlalchemy import create_engine, text
-from sqlalchemy import String
-
-
-# DB connection
-engine = create_engine("postgresql://postgres:@localhost:5432/romania_edu")
+from school_codes import (
+    assign_school_ids,
+    county_ids,
+    load_lineage,
+    load_lineage_table,
+)
 
 corrected_df = corrected_df[
     [
         "Cod SIIIR unitate",
         "Denumire lunga unitate",
         "Localitate unitate",
+        "Cod SIRUTA unitate",
+        "Cod SIRUTA UAT",
         "Judet PJ",
         "Mediu loc. unitate",
         "Forma finantare",
@@ -297,9 +318,11 @@ corrected_df = corrected_df[
     ]
 ].rename(
     columns={
-        "Cod SIIIR unitate": "id",
+        "Cod SIIIR unitate": "cod_siiir",
         "Denumire lunga unitate": "nume",
         "Localitate unitate": "localitate",
+        "Cod SIRUTA unitate": "siruta",
+        "Cod SIRUTA UAT": "uat_siruta",
         "Judet PJ": "judet",
         "Mediu loc. unitate": "mediu",
         "Forma finantare": "finantare",
@@ -334,15 +357,28 @@ corrected_df["mediu"] = corrected_df["mediu"].map(mediu_map)
 corrected_df["finantare"] = corrected_df["finantare"].map(finantare_map)
 corrected_df["proprietate"] = corrected_df["proprietate"].map(proprietate_map)
 corrected_df["email"] = corrected_df["email"].str.strip().str.lower()
-corrected_df["id"] = corrected_df["id"].astype(str)
-
-corrected_df.to_sql(
-    "school_info",
-    engine,
-    if_exists="replace",
-    index=False,
-)
-
-# Step 2: Set PK
-with engine.connect() as conn:
-    conn.execute(text("ALTER TABLE school_info ADD PRIMARY KEY (id);"))
+corrected_df["cod_siiir"] = corrected_df["cod_siiir"].astype(str)
+corrected_df["siruta"] = pd.to_numeric(corrected_df["siruta"]).astype("Int32")
+
+# The tables reference schools by a dense integer id, kept across rebuilds in
+# ../data/school_ids.csv; the SIIIR code stays as an attribute
+corrected_df.insert(0, "id", assign_school_ids(corrected_df["cod_siiir"]))
+corrected_df.insert(2, "county_id", county_ids(corrected_df["cod_siiir"]))
+
+if args.no_db:
+    from parquet_loader import load_table
+
+    load_table(corrected_df, "school_info", primary_key="id")
+    load_table(load_lineage(), "school_code_lineage", primary_key="old_code")
+    load_table(sirutas[["siruta", "uat_siruta"]], "siruta_uat", primary_key="siruta")
+else:
+    from sqlalchemy import create_engine
+    from pg_loader import load_table
+
+    # DB connection
+    engine = create_engine("postgresql://postgres:@localhost:5432/romania_edu")
+    load_table(engine, corrected_df, "school_info", primary_key="id")
+    load_lineage_table(engine)
+    load_table(
+        engine, sirutas[["siruta", "uat_siruta"]], "siruta_uat", primary_key="siruta"
+    )
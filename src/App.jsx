@@ -65,7 +65,7 @@ const MapTypePicker = () => {
 };
 
 function App() {
-  const { countryGeoData, demographics } = useDataLoader();
+  const { countryGeoData, demographics, loadCountyDemographics } = useDataLoader();
   const { dbConn, dbReady } = useDuckDB();
   const {
     token: { colorBgContainer, borderRadiusLG },
@@ -75,7 +75,7 @@ function App() {
   const { t } = useTranslation();
 
   return (
-    <DataContext.Provider value={{ countryGeoData, dbConn, dbReady, demographics }}>
+    <DataContext.Provider value={{ countryGeoData, dbConn, dbReady, demographics, loadCountyDemographics }}>
       <MapStateProvider>
         <Layout style={{ height: '100vh', background: colorBgContainer, display: 'flex', flexDirection: 'column' }}>
           <Header
@@ -11,6 +11,10 @@ const { Title } = Typography;
 
 const DetailedTownView = () => {
     const [chartKey, setChartKey] = useState(0);
+    const { demographics } = useContext(DataContext);
+    const { filters } = useContext(MapStateContext);
+    // the town's population comes from the county shard, loaded on drill-down
+    const countyLoaded = Boolean(demographics?.cities[filters.county]?.cities);
 
     return (
         <ConfigProvider
@@ -25,7 +29,7 @@ const DetailedTownView = () => {
                     setChartKey((prevKey) => prevKey + 1);
                 }}>
                     <Splitter.Panel defaultSize="40%" min="20%" max="70%">
-                        <TownDemographicsView chartKey={chartKey} />
+                        {countyLoaded && <TownDemographicsView chartKey={chartKey} />}
                     </Splitter.Panel>
                     <Splitter.Panel>
                         <TownSchoolsView />
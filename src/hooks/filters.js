@@ -11,6 +11,8 @@ export function useCounts(filters, mapType) {
 
     useEffect(() => {
         if (!dbReady || !dbConn || !filters || !mapType) return;
+        // per-capita town counts wait for the county's demographics shard
+        if (filters.perCapita && filters.county && !demographics?.cities[filters.county]?.cities) return;
 
         const fetch = async () => {
             console.log(mapType);
@@ -39,7 +41,7 @@ export function useCounts(filters, mapType) {
         };
 
         fetch();
-    }, [filters, dbConn, dbReady, mapType]);
+    }, [filters, dbConn, dbReady, mapType, demographics]);
 
 
     return counts;
@@ -87,10 +89,10 @@ function buildStudentStatsQuery(
         const rowFilter = [levelCond, langCond].filter(Boolean).join(' AND ');
         joins.push(`
       JOIN (
-        SELECT cod_siiir_unitate, numar_elevi
+        SELECT school_id, numar_elevi
         FROM student_stats
         ${rowFilter ? `WHERE ${rowFilter}` : ''}
-      ) fs ON fs.cod_siiir_unitate = si.id
+      ) fs ON fs.school_id = si.id
     `);
     } else {
         // school counting
@@ -98,7 +100,7 @@ function buildStudentStatsQuery(
             levelKeys.forEach(level => conditions.push(`
         EXISTS (
           SELECT 1 FROM student_stats
-          WHERE cod_siiir_unitate = si.id
+          WHERE school_id = si.id
             AND nivel = '${level}'
             AND limba_de_predare IN (${sqlList(langKeys)})
         )
@@ -106,15 +108,15 @@ function buildStudentStatsQuery(
         } else {
             if (levelCond) joins.push(`
         JOIN (
-          SELECT DISTINCT cod_siiir_unitate
+          SELECT DISTINCT school_id
           FROM student_stats WHERE ${levelCond}
-        ) lvl ON lvl.cod_siiir_unitate = si.id
+        ) lvl ON lvl.school_id = si.id
       `);
             if (langCond) joins.push(`
         JOIN (
-          SELECT DISTINCT cod_siiir_unitate
+          SELECT DISTINCT school_id
           FROM student_stats WHERE ${langCond}
-        ) lng ON lng.cod_siiir_unitate = si.id
+        ) lng ON lng.school_id = si.id
       `);
         }
     }
@@ -162,7 +164,7 @@ function buildBacQuery(
             SELECT *
             FROM bac_2024
             ${whereClause}
-          ) b ON b.school_code = si.id
+          ) b ON b.school_id = si.id
         `);
 
 
@@ -172,10 +174,10 @@ function buildBacQuery(
 
         joins.push(`
       JOIN (
-        SELECT DISTINCT school_code
+        SELECT DISTINCT school_id
         FROM bac_2024
         ${whereClause}
-      ) bac ON bac.school_code = si.id
+      ) bac ON bac.school_id = si.id
     `);
     }
 
@@ -199,14 +201,14 @@ function buildEvalQuery(
             JOIN (
                 SELECT *
                 FROM en_2024
-            ) e ON e.school_code = si.id
+            ) e ON e.school_id = si.id
         `);
     } else {
         joins.push(`
             JOIN (
-                SELECT DISTINCT school_code
+                SELECT DISTINCT school_id
                 FROM en_2024
-            ) e ON e.school_code = si.id
+            ) e ON e.school_id = si.id
         `);
     }
 
@@ -273,21 +275,21 @@ export function buildSchoolListQuery(filters) {
     joins.push(`
         LEFT JOIN (
             SELECT
-                cod_siiir_unitate,
+                school_id,
                 SUM(numar_elevi) AS total_elevi,
                 ARRAY_AGG(DISTINCT nivel) AS nivele,
                 ARRAY_AGG(DISTINCT limba_de_predare) AS limbi
             FROM student_stats
-            GROUP BY cod_siiir_unitate
-        ) stats ON stats.cod_siiir_unitate = si.id
+            GROUP BY school_id
+        ) stats ON stats.school_id = si.id
     `);
 
     if (inEvaluareData) {
         joins.push(`
             JOIN (
-                SELECT DISTINCT school_code
+                SELECT DISTINCT school_id
                 FROM en_2024
-            ) e ON e.school_code = si.id
+            ) e ON e.school_id = si.id
         `);
     } else if (inBacData) {
         const pickedMinority = bacLangs.filter(l => l !== 'română');
@@ -305,17 +307,17 @@ export function buildSchoolListQuery(filters) {
 
         joins.push(`
             JOIN (
-                SELECT DISTINCT school_code
+                SELECT DISTINCT school_id
                 FROM bac_2024
                 ${where ? `WHERE ${where}` : ''}
-            ) b ON b.school_code = si.id
+            ) b ON b.school_id = si.id
         `);
     } else {
         if (strictLevelLanguage && levelKeys.length && langKeys.length) {
             levelKeys.forEach(level => baseConditions.push(`
                 EXISTS (
                     SELECT 1 FROM student_stats
-                    WHERE cod_siiir_unitate = si.id
+                    WHERE school_id = si.id
                     AND nivel = '${level}'
                     AND limba_de_predare IN (${sqlList(langKeys)})
                 )
@@ -324,17 +326,17 @@ export function buildSchoolListQuery(filters) {
             if (levelKeys.length) {
                 joins.push(`
                     JOIN (
-                        SELECT DISTINCT cod_siiir_unitate
+                        SELECT DISTINCT school_id
                         FROM student_stats WHERE nivel IN (${sqlList(levelKeys)})
-                    ) lvl ON lvl.cod_siiir_unitate = si.id
+                    ) lvl ON lvl.school_id = si.id
                 `);
             }
             if (langKeys.length) {
                 joins.push(`
                     JOIN (
-                        SELECT DISTINCT cod_siiir_unitate
+                        SELECT DISTINCT school_id
                         FROM student_stats WHERE limba_de_predare IN (${sqlList(langKeys)})
-                    ) lng ON lng.cod_siiir_unitate = si.id
+                    ) lng ON lng.school_id = si.id
                 `);
             }
         }
@@ -366,7 +368,7 @@ export function useSchoolList(filters) {
             const result = await dbConn.query(query);
             const data = result.toArray().map(row => {
                 const json = row.toJSON();
-                json.key = json.id;
+                json.key = json.cod_siiir;
                 json.limbi = json.limbi?.toArray?.() ?? [];
                 json.nivele = json.nivele?.toArray?.() ?? [];
                 json.total_elevi = Number(json.total_elevi);
@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react';
+import { useCallback, useEffect, useState } from 'react';
 
 export default function useDataLoader() {
     const [countryGeoData, setCountryGeoData] = useState(null);
@@ -7,9 +7,11 @@ export default function useDataLoader() {
     useEffect(() => {
         async function loadCountryGeoData() {
             try {
+                // index.json has the national and county populations; the
+                // localities of a county come from its shard, on drill-down
                 const [countryGeoRes, demoRes] = await Promise.all([
                     fetch('data/ROU.geojson'),
-                    fetch('data/demographics/total.json'),
+                    fetch('data/demographics/index.json'),
                 ]);
                 const [geo, demo] = await Promise.all([
                     countryGeoRes.json(),
@@ -25,7 +27,26 @@ export default function useDataLoader() {
         loadCountryGeoData();
     }, []);
 
-    return { countryGeoData, demographics };
+    const loadCountyDemographics = useCallback(async (countyCode) => {
+        const entry = demographics?.cities[countyCode];
+        if (!entry || entry.cities) return;
+        try {
+            const shard = await fetchCountyDemographics(entry.shard);
+            // merging the shard into its manifest entry gives the same entry
+            // as total.json, so the consumers read demographics.cities[county].cities
+            setDemographics(prev => ({
+                ...prev,
+                cities: {
+                    ...prev.cities,
+                    [countyCode]: { ...prev.cities[countyCode], ...shard },
+                },
+            }));
+        } catch (error) {
+            console.error(`Error loading demographics for ${countyCode}:`, error);
+        }
+    }, [demographics]);
+
+    return { countryGeoData, demographics, loadCountyDemographics };
 }
 
 export function fetchCountyGeoJSON(countyCode) {
@@ -35,3 +56,11 @@ export function fetchCountyGeoJSON(countyCode) {
             return res.json();
         });
 }
+
+export function fetchCountyDemographics(shard) {
+    return fetch(`data/demographics/${shard}`)
+        .then(res => {
+            if (!res.ok) throw new Error(`Failed to fetch county demographics: ${res.status}`);
+            return res.json();
+        });
+}
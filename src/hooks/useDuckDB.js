@@ -70,7 +70,7 @@ async function createViews(dbConn) {
     CREATE VIEW school_with_student_stats AS
     SELECT si.*, ss.*
     FROM school_info si
-    LEFT JOIN student_stats ss ON ss.cod_siiir_unitate = si.id;
+    LEFT JOIN student_stats ss ON ss.school_id = si.id;
     `;
     return await dbConn.query(createStudentSummaryView);
 }
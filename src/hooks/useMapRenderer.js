@@ -3,6 +3,7 @@ import maplibregl from 'maplibre-gl';
 import * as turf from '@turf/turf';
 import { useContext } from 'react';
 import MapStateContext from '../MapStateContext';
+import DataContext from '../DataContext';
 import { getInterpolatedColorRampMatch } from '../colorInterpolate';
 import { fetchCountyGeoJSON } from './useDataLoader';
 import { useCounts } from './filters';
@@ -15,6 +16,7 @@ export default function useMapRenderer(mapRef, countryGeoJson, {
     const mapInitializedRef = useRef(false);
     const [map, setMap] = useState(null);
     const { filters, updateFilter, typeOfMap } = useContext(MapStateContext);
+    const { loadCountyDemographics } = useContext(DataContext);
     const counts = useCounts(filters, typeOfMap);
 
     // initialize map
@@ -181,6 +183,7 @@ export default function useMapRenderer(mapRef, countryGeoJson, {
         if (!map || !countryGeoJson) return;
 
         if (filters.county) {
+            loadCountyDemographics(filters.county);
             // fetch and set the town data
             fetchCountyGeoJSON(filters.county).then((countyGeoJSON) => {
                 map.getSource('adm2-towns').setData(countyGeoJSON);
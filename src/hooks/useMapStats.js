@@ -31,7 +31,8 @@ export default function useMapStats(filteredSchools, perCapita, schoolAgeOnly, t
                     }
                     cityCounts[city]++;
                 }
-                if (perCapita) {
+                // town populations come from the county shard, once it is loaded
+                if (perCapita && demographics.cities[countyName].cities) {
                     for (const town in cityCounts) {
                         const demUnit = demographics.cities[countyName].cities[town];
                         const townPopulation = schoolAgeOnly
@@ -76,5 +77,5 @@ export default function useMapStats(filteredSchools, perCapita, schoolAgeOnly, t
         console.log(counts);
 
         return counts;
-    }, [filteredSchools, perCapita, schoolAgeOnly, typeOfMap]);
+    }, [filteredSchools, perCapita, schoolAgeOnly, typeOfMap, demographics]);
 }